@@ -1,44 +1,91 @@
 # app.py (Definitive Final Version)
 
 import pandas as pd
-from flask import Flask, request, render_template, jsonify
-import joblib
+from flask import Flask, request, render_template, jsonify, g, send_file, url_for
 import os
+import time
+from concurrent.futures import TimeoutError as RenderTimeout
 from datetime import datetime
 import numpy as np
 
-from src.utils.satellite_data import get_ndvi_for_location
+from src.utils.ndvi_cache import build_ndvi_cache
+from src.utils.model_registry import ActiveModel
+from src.utils.yield_stats import YieldStatsIndex
+from src.utils.ndvi_anomaly import load_or_build_climatology
+from src.utils.data_store import load_satellite_data, load_yield_data
+from src.utils.district_index import DistrictIndex, parse_point
+from src.utils.explain import ExplanationCache, ExplanationUnavailable, FEATURE_LABELS
+from src.utils.ndvi_forecast import NDVIForecasts, MAX_HORIZON_DAYS
+from src.utils.prediction_grid import PredictionGrid
+from src.utils.reports import ReportRenderer, WAIT_SECONDS as REPORT_WAIT_SECONDS
+from src.utils.metrics import Metrics, RequestProfiler, server_timing, PROFILING_ENABLED
+from src.utils.ndvi_features import (
+    current_window_mean, default_features, features_at_mean, live_fetch_start, live_seasonal_features,
+    season_year, serving_season, typical_season_features
+)
 
 app = Flask(__name__)
+ndvi_cache = build_ndvi_cache()
+ndvi_forecasts = NDVIForecasts()
+explanations = ExplanationCache()
+report_renderer = ReportRenderer()
+metrics = Metrics()
 
 # --- LOAD ALL FILES AT STARTUP ---
 try:
-    model = joblib.load("models/yield_prediction_model.joblib")
-    model_columns = joblib.load("models/model_columns.pkl")
+    # Follows models/registry/CURRENT, so activating another version needs no restart
+    active_model = ActiveModel()
     districts_df = pd.read_csv("data/karnataka_districts.csv")
-    yield_df = pd.read_csv("data/yield_data_tidy.csv")
+    yield_df = load_yield_data(columns=['District', 'Crop', 'Season', 'Yield'])
 
-    yield_df['District'] = yield_df['District'].str.strip().str.upper()
     districts_df['District'] = districts_df['District'].str.split('. ').str[-1].str.strip().str.upper()
     districts_to_remove = ["URBAN", "RURAL"]
     districts_list = sorted([d for d in yield_df['District'].unique() if d not in districts_to_remove])
+    yield_stats = YieldStatsIndex(yield_df)
+    # Resolves field agents' GPS points to the districts the app can predict for
+    district_index = DistrictIndex.from_frame(districts_df[districts_df['District'].isin(districts_list)])
+    ndvi_climatology = load_or_build_climatology()
+    # Stand-in NDVI inputs for a season with no complete window in the live series
+    typical_features = typical_season_features(load_satellite_data(columns=['date', 'District', 'ndvi']))
+    # Forest export and baseline expectation, so the first explained request doesn't pay for them
+    explanations.warm(active_model.get())
     
     print("✅✅✅ Model and data files loaded successfully!")
 except Exception as e:
     print(f"❌ CRITICAL ERROR during startup: {e}")
-    model, districts_list = None, []
+    active_model, districts_list = None, []
 
 # --- Helper functions ---
+HIGH_RISK_YIELD_RATIO = 0.85  # Predicted yields below this fraction of the average are High risk
+STRESSED_NDVI = 0.35  # Below this, vegetation is stressed and the risk goes up a level
+
 def calculate_risk_level(predicted_yield, avg_yield, current_ndvi):
     if pd.isna(avg_yield) or avg_yield == 0: return "Medium"
     risk = "Low"
-    if predicted_yield < avg_yield * 0.85: risk = "High"
+    if predicted_yield < avg_yield * HIGH_RISK_YIELD_RATIO: risk = "High"
     elif predicted_yield < avg_yield: risk = "Medium"
-    if current_ndvi < 0.35:
+    if current_ndvi < STRESSED_NDVI:
         if risk == "Medium": risk = "High"
         if risk == "Low": risk = "Medium"
     return risk
 
+def risk_breakdown(predicted_yield, avg_yield, current_ndvi):
+    """calculate_risk_level's result with the thresholds it compared against and the reasons, for reports."""
+    level = calculate_risk_level(predicted_yield, avg_yield, current_ndvi)
+    factors = []
+    if pd.isna(avg_yield) or avg_yield == 0:
+        factors.append("No historical average to compare against.")
+    else:
+        change = predicted_yield / avg_yield - 1
+        factors.append(f"Predicted yield is {abs(change):.0%} {'below' if change < 0 else 'above'} the historical average.")
+        if predicted_yield < avg_yield * HIGH_RISK_YIELD_RATIO:
+            factors.append(f"That is more than {1 - HIGH_RISK_YIELD_RATIO:.0%} below average, the High risk threshold.")
+    if current_ndvi < STRESSED_NDVI:
+        factors.append(f"Current NDVI ({current_ndvi:.2f}) is below {STRESSED_NDVI}: vegetation is stressed, raising the risk a level.")
+    return {'level': level,
+            'thresholds': {'high_below': round(avg_yield * HIGH_RISK_YIELD_RATIO, 2), 'medium_below': round(avg_yield, 2)},
+            'ndvi_threshold': STRESSED_NDVI, 'factors': factors}
+
 # --- DEFINITIVE CREDIBILITY STATEMENT FUNCTION ---
 def generate_credibility_statement(p_data, s_data):
     ndvi = p_data['current_avg_ndvi']
@@ -47,7 +94,14 @@ def generate_credibility_statement(p_data, s_data):
     ndvi_health = "Excellent" if ndvi > 0.6 else "Fair to Good" if ndvi >= 0.3 else "Stressed"
 
     # --- THE NEW, MORE PRECISE EXPLANATION ---
-    base_statement = f"This report's credibility comes from combining historical knowledge with real-time data. The model was trained by correlating **10 years of historical yield data** with **10 years of historical satellite imagery (NDVI)**. It now applies that deep knowledge to **new, real-time satellite data** from the current growing season to make its forecast.\n\n"
+    explanation = p_data.get('explanation')
+    if explanation:
+        # What actually moved this forecast away from the model's average, largest effect first
+        drivers = ", ".join(f"**{FEATURE_LABELS.get(a['feature'], a['feature'])}** ({a['contribution']:+.2f} Kg/Ha)"
+                            for a in explanation['attributions'][:3])
+        base_statement = f"The model starts from its average forecast of **{explanation['expected_value']:.2f} Kg/Ha** and adjusts it for this district, crop and season. The inputs that moved this forecast the most were {drivers}.\n\n"
+    else:
+        base_statement = f"This report's credibility comes from combining historical knowledge with real-time data. The model was trained by correlating **10 years of historical yield data** with **10 years of historical satellite imagery (NDVI)**. It now applies that deep knowledge to **new, real-time satellite data** from the current growing season to make its forecast.\n\n"
     
     analysis = ""
     recommendation = ""
@@ -72,49 +126,634 @@ def generate_credibility_statement(p_data, s_data):
 
     return base_statement + analysis + recommendation
 
-# --- MAIN WEB PAGE ROUTE ---
-@app.route('/', methods=['GET', 'POST'])
-def home():
-    if model is None: return "<h1>Error: Model not loaded.</h1>", 500
-    prediction_data, summary_data, credibility_statement = None, None, None
-    selected_district = request.form.get('district', '')
-    selected_crop = request.form.get('crop', '')
-    if request.method == 'POST' and selected_district and selected_crop:
+# --- PREDICTION HELPERS (shared by the dashboard and the JSON API) ---
+DEFAULT_NDVI = 0.4  # Only for districts with neither live readings nor any satellite history
+MAX_BATCH_ITEMS = 1000
+
+def ndvi_query(district):
+    """
+    (lat, lon, start_date, end_date) of a district's live NDVI series: from the
+    previous agricultural year's June to today, which covers every season window
+    a request can be scored against.
+    """
+    today = datetime.now()
+    district_info = districts_df[districts_df['District'] == district]
+    if district_info.empty: raise ValueError(f"Coordinates for '{district}' not found.")
+    lat, lon = district_info.iloc[0]['Latitude'], district_info.iloc[0]['Longitude']
+    return lat, lon, live_fetch_start(today).strftime("%Y-%m-%d"), today.strftime("%Y-%m-%d")
+
+def get_current_ndvi(district):
+    """Returns (live NDVI series, z-score of the latest readings vs. the district's climatology)."""
+    with metrics.span('ndvi_fetch'):
+        ndvi_data = ndvi_cache.get_ndvi(*ndvi_query(district))
+    with metrics.span('aggregation'):
+        return ndvi_data, ndvi_climatology.recent_z_score(district, ndvi_data)
+
+async def get_current_ndvi_async(district):
+    """get_current_ndvi for the ASGI app (asgi.py): waits for the fetch without holding a thread."""
+    with metrics.span('ndvi_fetch'):
+        ndvi_data = await ndvi_cache.get_ndvi_async(*ndvi_query(district))
+    with metrics.span('aggregation'):
+        return ndvi_data, ndvi_climatology.recent_z_score(district, ndvi_data)
+
+def get_season_features(district, crop, ndvi_data=None, ndvi=None):
+    """
+    Returns (season, model inputs) for a crop: the season it is scored against
+    (see ndvi_features.serving_season), that season's agricultural Year and the
+    NDVI features of its latest complete window in `ndvi_data`, computed exactly
+    as in training (the model never saw partial windows; see ndvi_features).
+    A caller-supplied `ndvi`, or a series without that window, gets the
+    district's typical features for the season, moved to `ndvi` if given.
+    'current_ndvi' is the mean of the window in progress (or `ndvi`), which the
+    risk level uses; it is not a model input.
+    """
+    today = datetime.now()
+    season = serving_season(yield_stats.seasons_for(district, crop), today)
+    features, current = None, ndvi
+    if ndvi is None and ndvi_data is not None and not ndvi_data.empty:
+        with metrics.span('aggregation'):
+            features = live_seasonal_features(district, ndvi_data, season, today)
+            current = current_window_mean(ndvi_data, season, today)
+    if features is None:
+        typical = typical_features.get((district, season))
+        if typical is None:
+            features = default_features(DEFAULT_NDVI if ndvi is None else ndvi)
+        else:
+            features = typical if ndvi is None else features_at_mean(typical, ndvi)
+    return season, {'Year': season_year(season, today), **features,
+                    'current_ndvi': features['ndvi'] if current is None else current}
+
+def format_z_score(z):
+    return None if pd.isna(z) else round(z, 2)
+
+def get_historical_summary(district, crop):
+    stats = yield_stats.get(district, crop)
+    if stats is None: raise ValueError(f"No historical yield data for '{crop}' in '{district}'.")
+    return {'avg_yield': round(stats.mean, 2), 'min_yield': round(stats.min, 2), 'max_yield': round(stats.max, 2)}
+
+def encode_features(feature_encoder, rows):
+    """
+    Encodes a list of dicts holding District, Crop and every numeric feature the
+    encoder was fitted with (extra keys are ignored) into the model's feature matrix.
+    """
+    if len(rows) == 1:
+        row = rows[0]
+        return feature_encoder.transform_row(row, row['District'], row['Crop']).reshape(1, -1)
+    numeric = {name: [r[name] for r in rows] for name in feature_encoder.numeric_features}
+    return feature_encoder.transform(numeric, [r['District'] for r in rows], [r['Crop'] for r in rows])
+
+def parse_batch_item(item):
+    """Validates one batch item and returns (district, crop, ndvi-or-None)."""
+    if not isinstance(item, dict): raise ValueError("Each item must be an object with 'district' and 'crop'.")
+    district = str(item.get('district') or '').strip().upper()
+    crop = str(item.get('crop') or '').strip()
+    if not district and ('lat' in item or 'lon' in item):
+        # resolve_item_locations found no district for this point
+        lat, lon = parse_point(item.get('lat'), item.get('lon'))
+        raise ValueError(f"No district within {district_index.max_distance_km:g} km of ({lat}, {lon}).")
+    if not district or not crop: raise ValueError("Both 'district' and 'crop' are required.")
+    if district not in districts_list: raise ValueError(f"Unknown district '{district}'.")
+    ndvi = item.get('ndvi')
+    if ndvi is not None:
+        try:
+            ndvi = float(ndvi)
+        except (TypeError, ValueError):
+            raise ValueError(f"'ndvi' must be a number, got {ndvi!r}.")
+        if not -1.0 <= ndvi <= 1.0: raise ValueError(f"'ndvi' must be between -1 and 1, got {ndvi}.")
+    return district, crop, ndvi
+
+def explanation_entry(explainer, row, attributions):
+    """A result's 'explanation': the model's expected value and each input's contribution, largest first."""
+    entries = [{'feature': feature,
+                'value': row[feature] if feature in ('District', 'Crop') else round(float(row[feature]), 4),
+                'contribution': round(float(contribution), 2)}
+               for feature, contribution in zip(explainer.features, attributions)]
+    entries.sort(key=lambda e: -abs(e['contribution']))
+    return {'expected_value': round(explainer.expected_value, 2), 'attributions': entries}
+
+def predict_items(current, items, ndvi_by_district=None, explain=False):
+    """
+    Predicts a list of batch items ({'district', 'crop', optional 'ndvi'}) with a single
+    model.predict call. Returns one result dict per item, in order; invalid items get
+    an 'error' entry in place of a prediction and the rest are still served.
+    `ndvi_by_district` holds get_current_ndvi results (or the exception it raised)
+    fetched beforehand by the ASGI app; districts missing from it are fetched here.
+    With `explain`, each prediction also gets its feature attributions, computed for
+    the whole batch in one pass (and cached per model version and input).
+    """
+    results = [None] * len(items)
+    rows, pending = [], []
+    ndvi_by_district, features_by_season = dict(ndvi_by_district or {}), {}
+    for i, item in enumerate(items):
+        try:
+            district, crop, ndvi = parse_batch_item(item)
+            current.encoder.check(district, crop)
+            with metrics.span('stats_lookup'):
+                summary = get_historical_summary(district, crop)
+            if ndvi is None:
+                if district not in ndvi_by_district:
+                    try:
+                        ndvi_by_district[district] = get_current_ndvi(district)
+                    except Exception as e:
+                        ndvi_by_district[district] = e  # Report it for every item of the district
+                if isinstance(ndvi_by_district[district], Exception):
+                    raise ndvi_by_district[district]
+                ndvi_data, ndvi_z = ndvi_by_district[district]
+                season = serving_season(yield_stats.seasons_for(district, crop), datetime.now())
+                # Crops of a district that share a season share its features
+                if (district, season) not in features_by_season:
+                    features_by_season[district, season] = get_season_features(district, crop, ndvi_data)
+                season, features = features_by_season[district, season]
+            else:
+                season, features = get_season_features(district, crop, ndvi=ndvi)
+                ndvi_z = float('nan')  # Only known when the NDVI comes from our own fetch
+        except Exception as e:
+            results[i] = {'index': i, 'item': item, 'error': str(e)}
+            continue
+        rows.append({'District': district, 'Crop': crop, 'season': season, 'ndvi_z': ndvi_z, **features})
+        pending.append((i, summary))
+
+    if rows:
+        with metrics.span('encoding'):
+            X = encode_features(current.encoder, rows)
+        with metrics.span('predict'):
+            predictions = current.model.predict(X)
+        explainer, attributions = None, None
+        if explain:
+            with metrics.span('explain'):
+                try:
+                    explainer, attributions = explanations.explain(current, X)
+                except ExplanationUnavailable:
+                    pass  # Served without explanations; /api/explain reports why
+        for k, ((i, summary), row, prediction) in enumerate(zip(pending, rows, predictions)):
+            with metrics.span('risk'):
+                risk = calculate_risk_level(prediction, summary['avg_yield'], row['current_ndvi'])
+            results[i] = {
+                'index': i,
+                'district': row['District'],
+                'crop': row['Crop'],
+                'predicted_yield': round(float(prediction), 2),
+                'season': row['season'],
+                'risk_level': risk,
+                'current_avg_ndvi': round(row['current_ndvi'], 4),
+                'ndvi_z_score': format_z_score(row['ndvi_z']),
+                **summary,
+            }
+            if explainer is not None:
+                results[i]['explanation'] = explanation_entry(explainer, row, attributions[k])
+    return results
+
+def build_prediction_grid():
+    """Predicts every district x crop pair the dashboard offers, for the prediction grid."""
+    current = active_model.get()
+    items = [{'district': d, 'crop': c} for d in districts_list for c in yield_stats.crops_for(d)]
+    with metrics.source('grid'):
+        results = predict_items(current, items, explain=True)
+    return current.version, {(item['district'], item['crop']): {k: v for k, v in r.items() if k not in ('index', 'item')}
+                             for item, r in zip(items, results)}
+
+def districts_to_fetch(items):
+    """Districts whose NDVI series predict_items would fetch for these items."""
+    districts = {str(item.get('district') or '').strip().upper() for item in items
+                 if isinstance(item, dict) and item.get('ndvi') is None}
+    return sorted(d for d in districts if d in districts_list)
+
+def grid_result(current, item):
+    """(result, age) of a batch item from the prediction grid, or (None, None)."""
+    if not isinstance(item, dict) or item.get('ndvi') is not None: return None, None
+    return prediction_grid.lookup(str(item.get('district') or '').strip().upper(),
+                                  str(item.get('crop') or '').strip(), current.version)
+
+def resolve_item_locations(items):
+    """
+    Items that give a GPS point ('lat', 'lon') instead of a district get the
+    nearest district and its 'distance_km', all points in one index query.
+    Points that are invalid or too far from every district are left without one.
+    """
+    located = [i for i, item in enumerate(items)
+               if isinstance(item, dict) and not item.get('district') and 'lat' in item and 'lon' in item]
+    valid, points = [], []
+    for i in located:
         try:
-            year = datetime.now().year
-            district_info = districts_df[districts_df['District'] == selected_district]
-            if district_info.empty: raise ValueError(f"Coordinates for '{selected_district}' not found.")
-            lat, lon = district_info.iloc[0]['Latitude'], district_info.iloc[0]['Longitude']
-            ndvi_data = get_ndvi_for_location(lat, lon, f"{year}-01-01", datetime.now().strftime("%Y-%m-%d"))
-            avg_ndvi = pd.DataFrame(ndvi_data)['ndvi'].mean() if ndvi_data else 0.4
-            input_data = pd.DataFrame([{'Year': year, 'District': selected_district, 'Crop': selected_crop, 'ndvi': avg_ndvi}])
-            input_encoded = pd.get_dummies(input_data, columns=['District', 'Crop'])
-            final_input = input_encoded.reindex(columns=model_columns, fill_value=0)
-            prediction = model.predict(final_input)[0]
-            subset = yield_df[(yield_df['District'] == selected_district) & (yield_df['Crop'] == selected_crop)]
-            summary_data = {'avg_yield': round(subset['Yield'].mean(), 2), 'min_yield': round(subset['Yield'].min(), 2), 'max_yield': round(subset['Yield'].max(), 2)}
-            risk = calculate_risk_level(prediction, summary_data['avg_yield'], avg_ndvi)
-            prediction_data = {'predicted_yield': round(prediction, 2), 'risk_level': risk, 'current_avg_ndvi': round(avg_ndvi, 4)}
-            
+            points.append(parse_point(items[i]['lat'], items[i]['lon']))
+        except ValueError:
+            continue
+        valid.append(i)
+    if not valid:
+        return items
+    items = list(items)
+    districts, km = district_index.nearest(*zip(*points))
+    for i, district, distance in zip(valid, districts, km):
+        if district is not None:
+            items[i] = {**items[i], 'district': district, 'distance_km': round(float(distance), 2)}
+    return items
+
+def parse_batch_payload(payload):
+    """Returns the list of items in a batch request body (GPS points resolved to districts), or raises ValueError."""
+    items = payload.get('items') if isinstance(payload, dict) else payload
+    if not isinstance(items, list):
+        raise ValueError("Expected a JSON body of the form {'items': [...]}.")
+    if len(items) > MAX_BATCH_ITEMS:
+        raise ValueError(f"At most {MAX_BATCH_ITEMS} items are allowed per request.")
+    return resolve_item_locations(items)
+
+def serve_batch(current, items, ndvi_by_district=None, explain=False):
+    """
+    The batch API's response body: grid results where fresh, the rest predicted live.
+    Grid results carry their explanations already; they are only returned with `explain`.
+    """
+    results = [None] * len(items)
+    snapshot_age, live = None, []
+    for i, item in enumerate(items):
+        result, age = grid_result(current, item)
+        if result is not None:
+            if not explain:
+                result = {k: v for k, v in result.items() if k != 'explanation'}
+            results[i], snapshot_age = {'index': i, **result}, age
+        else:
+            live.append(i)
+    for i, result in zip(live, predict_items(current, [items[i] for i in live], ndvi_by_district, explain)):
+        results[i] = {**result, 'index': i}
+    for i, item in enumerate(items):
+        if isinstance(item, dict) and 'distance_km' in item and 'error' not in results[i]:
+            results[i]['distance_km'] = item['distance_km']
+
+    return {'year': datetime.now().year, 'model_version': current.version, 'count': len(results),
+            'errors': sum('error' in r for r in results), 'from_snapshot': len(items) - len(live),
+            'snapshot_age_seconds': None if snapshot_age is None else round(snapshot_age, 1),
+            'results': results}
+
+SUMMARY_KEYS = ('avg_yield', 'min_yield', 'max_yield')
+
+def render_home(current, selected_district='', selected_crop='', ndvi_by_district=None):
+    """Renders the dashboard, with a prediction when both a district and a crop are selected."""
+    prediction_data, summary_data, credibility_statement = None, None, None
+    if selected_district and selected_crop:
+        result, age = prediction_grid.lookup(selected_district, selected_crop, current.version)
+        if result is None:
+            item = {'district': selected_district, 'crop': selected_crop}
+            result = predict_items(current, [item], ndvi_by_district, explain=True)[0]
+        if 'error' in result:
+            print(f"Error during prediction: {result['error']}")
+            prediction_data = {'error': result['error']}
+        else:
+            summary_data = {k: result[k] for k in SUMMARY_KEYS}
+            prediction_data = {k: v for k, v in result.items() if k not in SUMMARY_KEYS}
+            prediction_data['snapshot_age_minutes'] = None if age is None else int(age // 60)
             credibility_statement = generate_credibility_statement(prediction_data, summary_data)
 
+    with metrics.span('render'):
+        return render_template('index.html', 
+                               districts=districts_list,
+                               selected_district=selected_district, selected_crop=selected_crop,
+                               prediction_data=prediction_data, summary_data=summary_data,
+                               credibility_statement=credibility_statement)
+
+# --- REPORTS ---
+def build_report_data(current, district, crop, ndvi_by_district=None):
+    """
+    Everything a district/crop report shows, as plain JSON-able values: the
+    prediction (from the grid where fresh) with its explanation, historical
+    statistics, the live NDVI series and the risk breakdown. Its hash is the
+    report's cache key (reports.report_key). Raises ValueError if the pair
+    can't be predicted.
+    """
+    ndvi_by_district = dict(ndvi_by_district or {})
+    result, _ = prediction_grid.lookup(district, crop, current.version)
+    if result is None:
+        result = predict_items(current, [{'district': district, 'crop': crop}], ndvi_by_district, explain=True)[0]
+        if 'error' in result: raise ValueError(result['error'])
+    if district not in ndvi_by_district:
+        try:
+            ndvi_by_district[district] = get_current_ndvi(district)
         except Exception as e:
-            print(f"Error during prediction: {e}")
-            prediction_data = {'error': str(e)}
-    
-    return render_template('index.html', 
-                           districts=districts_list,
-                           selected_district=selected_district, selected_crop=selected_crop,
-                           prediction_data=prediction_data, summary_data=summary_data,
-                           credibility_statement=credibility_statement)
+            ndvi_by_district[district] = e
+    ndvi = ndvi_by_district[district]
+    series = [] if isinstance(ndvi, Exception) or ndvi[0].empty else [
+        [d, round(float(v), 4)] for d, v in zip(ndvi[0]['date'].dt.strftime('%Y-%m-%d'), ndvi[0]['ndvi'])]
+
+    summary = {k: result[k] for k in SUMMARY_KEYS}
+    prediction = {k: v for k, v in result.items() if k not in SUMMARY_KEYS}
+    explanation = prediction.get('explanation')
+    if explanation:
+        prediction['explanation'] = {**explanation, 'attributions': [
+            {**a, 'label': FEATURE_LABELS.get(a['feature'], a['feature'])} for a in explanation['attributions']]}
+    return {
+        'district': district, 'crop': crop, 'model_version': current.version,
+        'as_of': datetime.now().strftime('%Y-%m-%d'),
+        'prediction': prediction,
+        'historical': {**summary, 'records': yield_stats.get(district, crop).count},
+        'ndvi_series': series,
+        'risk': risk_breakdown(result['predicted_yield'], summary['avg_yield'], result['current_avg_ndvi']),
+        'credibility_statement': generate_credibility_statement(prediction, summary),
+    }
+
+def all_report_data():
+    """(archive name, report data or the error) of every district x crop pair, for bulk exports."""
+    current = active_model.get()
+    with metrics.source('report_export'):
+        for district in districts_list:
+            ndvi_by_district = {}
+            try:
+                ndvi_by_district[district] = get_current_ndvi(district)  # Once for all of the district's crops
+            except Exception as e:
+                ndvi_by_district[district] = e
+            for crop in yield_stats.crops_for(district):
+                name = f"{district}/{crop.replace('/', '-')}.pdf"
+                try:
+                    yield name, build_report_data(current, district, crop, ndvi_by_district)
+                except ValueError as e:
+                    yield name, e
+
+# Served by the dashboard and the batch API; refreshed in the background once started
+prediction_grid = PredictionGrid(build_prediction_grid)
+
+# --- BACKGROUND SERVICES ---
+# Importing this module starts nothing (tests, benchmarks and tools import it freely).
+# The server starts the services once per serving process:
+#   python app.py           __main__ below, in the reloader's serving child only
+#   uvicorn asgi:app        the ASGI lifespan startup (asgi.py)
+#   gunicorn -c gunicorn.conf.py app:app   the post_worker_init hook
+def start_background_services():
+    """Starts the report workers and the prediction grid's refresh thread. Returns False if the model failed to load."""
+    if active_model is None: return False
+    report_renderer.start()  # Forks the render workers, so before any other thread starts
+    prediction_grid.start()
+    return True
+
+def stop_background_services():
+    prediction_grid.stop()
+    report_renderer.stop()
+
+# --- INSTRUMENTATION ---
+# Whole-request latency of the prediction routes, recorded as stages of their own
+TIMED_ENDPOINTS = {'home': 'dashboard', 'predict_batch_api': 'batch_api', 'explain_api': 'explain_api'}
+
+def app_metric_lines():
+    """NDVI and explanation cache counters, reports, prediction grid age and the served model version, for /metrics."""
+    stats = ndvi_cache.stats()
+    lines = ["# HELP agrisense_ndvi_cache_lookups_total NDVI cache lookups by outcome.",
+             "# TYPE agrisense_ndvi_cache_lookups_total counter"]
+    lines += [f'agrisense_ndvi_cache_lookups_total{{result="{k}"}} {stats[k]}'
+              for k in ('hits', 'misses', 'extensions', 'coalesced')]
+    stats = explanations.stats()
+    lines += ["# HELP agrisense_explanation_cache_lookups_total Cached feature attribution lookups by outcome.",
+              "# TYPE agrisense_explanation_cache_lookups_total counter"]
+    lines += [f'agrisense_explanation_cache_lookups_total{{result="{k}"}} {stats[k]}' for k in ('hits', 'misses')]
+    stats = report_renderer.stats()
+    lines += ["# HELP agrisense_reports_total Reports requested, by whether they were rendered or already on disk.",
+              "# TYPE agrisense_reports_total counter"]
+    lines += [f'agrisense_reports_total{{result="{k}"}} {stats[k]}' for k in ('rendered', 'served_from_disk')]
+    age = prediction_grid.age()
+    lines += ["# HELP agrisense_prediction_grid_age_seconds Age of the prediction grid snapshot.",
+              "# TYPE agrisense_prediction_grid_age_seconds gauge",
+              f"agrisense_prediction_grid_age_seconds {'NaN' if age is None else round(age, 3)}"]
+    if active_model is not None:
+        lines += ["# HELP agrisense_model_info The model version being served.",
+                  "# TYPE agrisense_model_info gauge",
+                  f'agrisense_model_info{{version="{active_model.get().version}"}} 1']
+    return lines
+
+metrics.add_collector(app_metric_lines)
+
+@app.before_request
+def start_request_metrics():
+    if request.endpoint not in TIMED_ENDPOINTS or not (metrics.enabled or PROFILING_ENABLED): return
+    g.request_start = time.perf_counter()
+    profile = request.args.get('profile') if PROFILING_ENABLED else None
+    if profile:
+        # ?profile=1 adds a Server-Timing header; ?profile=cprofile returns a cProfile report instead
+        g.trace_token = metrics.start_trace()
+        g.profiler = RequestProfiler().start() if profile == 'cprofile' else None
+
+@app.after_request
+def finish_request_metrics(response):
+    if 'request_start' not in g: return response
+    metrics.observe(TIMED_ENDPOINTS[request.endpoint], time.perf_counter() - g.request_start)
+    if 'trace_token' in g:
+        response.headers['Server-Timing'] = server_timing(metrics.end_trace(g.pop('trace_token')))
+        profiler = g.pop('profiler', None)
+        if profiler is not None:
+            response.set_data(profiler.stop())
+            response.mimetype = 'text/plain'
+    return response
+
+@app.teardown_request
+def reset_request_metrics(exc):
+    # after_request is skipped when the view raised; don't leak the trace or the profiler
+    if 'trace_token' in g:
+        metrics.end_trace(g.pop('trace_token'))
+    profiler = g.pop('profiler', None)
+    if profiler is not None:
+        profiler.stop()
+
+# --- MAIN WEB PAGE ROUTE ---
+@app.route('/', methods=['GET', 'POST'])
+def home():
+    if active_model is None: return "<h1>Error: Model not loaded.</h1>", 500
+    if request.method != 'POST':
+        return render_home(active_model.get())
+    return render_home(active_model.get(), request.form.get('district', ''), request.form.get('crop', ''))
+
+@app.route('/api/predict/batch', methods=['POST'])
+def predict_batch_api():
+    """
+    Predicts many (district, crop) pairs with a single model.predict call.
+    Body: {"items": [{"district": "MANDYA", "crop": "Rice", "ndvi": 0.52}, ...]}
+    ('ndvi' is optional; when omitted, the district's NDVI series is fetched once per district and
+    the crop's current season features are computed from it.)
+    An item can give a GPS point ("lat", "lon") instead of a district: the nearest district is used,
+    and its distance is returned as 'distance_km'.
+    Items without 'ndvi' are served from the prediction grid while it is fresh.
+    Invalid items get an 'error' entry in place of a prediction; the rest are still served.
+    """
+    if active_model is None: return jsonify({'error': 'Model not loaded.'}), 500
+    try:
+        items = parse_batch_payload(request.get_json(silent=True))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(serve_batch(active_model.get(), items))
+
+@app.route('/api/explain', methods=['GET', 'POST'])
+def explain_api():
+    """
+    Predictions with per-feature attributions: how far each input moved the forecast from the
+    model's expected value (tree-path attributions; they sum to predicted_yield - expected_value).
+    GET ?district=MANDYA&crop=Rice[&ndvi=0.52], or POST a batch body as for /api/predict/batch.
+    """
+    if active_model is None: return jsonify({'error': 'Model not loaded.'}), 500
+    current = active_model.get()
+    try:
+        explanations.explainer(current)
+    except ExplanationUnavailable as e:
+        return jsonify({'error': str(e)}), 501
+    if request.method == 'GET':
+        item = {k: request.args[k] for k in ('district', 'crop', 'ndvi', 'lat', 'lon') if k in request.args}
+        result = serve_batch(current, resolve_item_locations([item]), explain=True)['results'][0]
+        return jsonify({'model_version': current.version, **result}), 400 if 'error' in result else 200
+    try:
+        items = parse_batch_payload(request.get_json(silent=True))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(serve_batch(current, items, explain=True))
+
+@app.route('/api/report')
+def report_api():
+    """
+    A district/crop report as a PDF: ?district=MANDYA&crop=Rice. Rendered in the report worker pool
+    and kept on disk under a hash of its contents, so unchanged reports are served from the file.
+    Waits up to REPORT_WAIT_SECONDS for a render (?wait=0 doesn't wait); if it isn't done by then,
+    answers 202 and the same URL returns the PDF once it is.
+    """
+    if active_model is None: return jsonify({'error': 'Model not loaded.'}), 500
+    district = (request.args.get('district') or '').strip().upper()
+    crop = (request.args.get('crop') or '').strip()
+    if district not in districts_list or crop not in yield_stats.crops_for(district):
+        return jsonify({'error': f"No report for crop '{crop}' in district '{district}'."}), 404
+    try:
+        key, future = report_renderer.submit(build_report_data(active_model.get(), district, crop))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except RuntimeError as e:
+        return jsonify({'error': str(e)}), 503
+    wait = REPORT_WAIT_SECONDS if request.args.get('wait', '1').lower() not in ('0', 'false', 'no') else 0
+    try:
+        path = future.result(timeout=wait)
+    except RenderTimeout:
+        return jsonify({'status': 'rendering', 'report_id': key}), 202, {'Retry-After': '2'}
+    except Exception as e:
+        return jsonify({'error': f"Report rendering failed: {e}"}), 500
+    return send_file(path, mimetype='application/pdf', as_attachment=True,
+                     download_name=f"agrisense-{district}-{crop}.pdf".replace(' ', '_'), etag=key)
+
+@app.route('/api/reports/export', methods=['POST'])
+def start_report_export_api():
+    """
+    Starts rendering every district x crop report into one ZIP archive. Returns 202 with the job to poll;
+    while an export is already running, returns that job rather than starting another.
+    """
+    if active_model is None: return jsonify({'error': 'Model not loaded.'}), 500
+    try:
+        job = report_renderer.export(all_report_data)
+    except RuntimeError as e:
+        return jsonify({'error': str(e)}), 503
+    return jsonify({**job, 'status_url': url_for('report_export_status_api', job_id=job['job_id'])}), 202
+
+@app.route('/api/reports/export/<job_id>')
+def report_export_status_api(job_id):
+    job = report_renderer.job(job_id)
+    if job is None: return jsonify({'error': f"Unknown export job '{job_id}'."}), 404
+    if job['status'] == 'done':
+        job['download_url'] = url_for('download_report_export_api', job_id=job_id)
+    return jsonify(job)
+
+@app.route('/api/reports/export/<job_id>/download')
+def download_report_export_api(job_id):
+    job = report_renderer.job(job_id)
+    if job is None: return jsonify({'error': f"Unknown export job '{job_id}'."}), 404
+    if job['status'] != 'done': return jsonify({'error': f"Export job is {job['status']}.", **job}), 409
+    path = report_renderer.archive_path(job)
+    if path is None: return jsonify({'error': "This export has been replaced by newer ones; start a new export."}), 410
+    return send_file(path, mimetype='application/zip', as_attachment=True, download_name='agrisense-reports.zip')
+
+@app.route('/api/prediction_grid')
+def get_prediction_grid_status_api():
+    if active_model is None: return jsonify({'error': 'Model not loaded.'}), 500
+    return jsonify(prediction_grid.status(active_model.get().version))
+
+@app.route('/api/prediction_grid/refresh', methods=['POST'])
+def refresh_prediction_grid_api():
+    """Starts a grid rebuild (202), or waits for it with ?wait=1 (200)."""
+    if active_model is None: return jsonify({'error': 'Model not loaded.'}), 500
+    wait = request.args.get('wait', '').lower() in ('1', 'true', 'yes')
+    started = prediction_grid.refresh(wait=wait)
+    status = prediction_grid.status(active_model.get().version)
+    return jsonify({'started': started, **status}), 200 if wait else 202
 
 @app.route('/api/crops_for_district')
 def get_crops_for_district_api():
     district = request.args.get('district')
     if district:
-        crops = sorted(yield_df[yield_df['District'] == district.upper()]['Crop'].unique().tolist())
-        return jsonify(crops)
+        return jsonify(list(yield_stats.crops_for(district.upper())))
     return jsonify([])
 
+@app.route('/api/nearest_district', methods=['GET', 'POST'])
+def nearest_district_api():
+    """
+    The nearest district to each GPS point.
+    GET ?lat=12.30&lon=76.64[&radius_km=50], or POST {"points": [{"lat": .., "lon": ..}, ...], "radius_km": 50}.
+    'district' is null when no district is within DISTRICT_MATCH_MAX_KM. With radius_km, 'within'
+    also lists every district inside that radius, nearest first.
+    """
+    if active_model is None: return jsonify({'error': 'Model not loaded.'}), 500
+    if request.method == 'GET':
+        points, radius_km = [{'lat': request.args.get('lat'), 'lon': request.args.get('lon')}], request.args.get('radius_km')
+    else:
+        payload = request.get_json(silent=True)
+        points = payload.get('points') if isinstance(payload, dict) else None
+        radius_km = payload.get('radius_km') if isinstance(payload, dict) else None
+        if not isinstance(points, list) or not all(isinstance(p, dict) for p in points):
+            return jsonify({'error': "Expected a JSON body of the form {'points': [{'lat': ..., 'lon': ...}, ...]}."}), 400
+        if len(points) > MAX_BATCH_ITEMS:
+            return jsonify({'error': f"At most {MAX_BATCH_ITEMS} points are allowed per request."}), 400
+    try:
+        points = [parse_point(p.get('lat'), p.get('lon')) for p in points]
+        lats, lons = [lat for lat, _ in points], [lon for _, lon in points]
+        districts, km = district_index.nearest(lats, lons)
+        within = district_index.within(lats, lons, float(radius_km)) if radius_km is not None else None
+    except (TypeError, ValueError) as e:
+        return jsonify({'error': str(e)}), 400
+    results = []
+    for i, ((lat, lon), district, distance) in enumerate(zip(points, districts, km)):
+        result = {'lat': lat, 'lon': lon, 'district': district, 'distance_km': round(float(distance), 2)}
+        if within is not None:
+            result['within'] = [{'district': d, 'distance_km': round(k, 2)} for d, k in within[i]]
+        results.append(result)
+    if request.method == 'GET':
+        return jsonify(results[0])
+    return jsonify({'max_distance_km': district_index.max_distance_km, 'results': results})
+
+@app.route('/api/ndvi_forecast')
+def get_ndvi_forecast_api():
+    """
+    A district's NDVI forecast for the days after its last satellite reading: ?district=MYSORE&horizon=90
+    (default and maximum NDVI_FORECAST_MAX_HORIZON_DAYS). Served from the forecasts saved by
+    `python -m src.utils.ndvi_forecast`; nothing is fitted per request.
+    """
+    district = (request.args.get('district') or '').strip().upper()
+    try:
+        horizon = int(request.args.get('horizon', MAX_HORIZON_DAYS))
+    except ValueError:
+        return jsonify({'error': "'horizon' must be a whole number of days."}), 400
+    if not 1 <= horizon <= MAX_HORIZON_DAYS:
+        return jsonify({'error': f"'horizon' must be between 1 and {MAX_HORIZON_DAYS} days."}), 400
+    if not ndvi_forecasts.available():
+        return jsonify({'error': "No NDVI forecasts yet. Run: python -m src.utils.ndvi_forecast"}), 503
+    forecast = ndvi_forecasts.get(district, horizon)
+    if forecast is None:
+        return jsonify({'error': f"No NDVI forecast for district '{district}'."}), 404
+    return jsonify(forecast)
+
+@app.route('/api/model_version')
+def get_model_version_api():
+    if active_model is None: return jsonify({'error': 'Model not loaded.'}), 500
+    current = active_model.get()
+    return jsonify({'version': current.version,
+                    **{k: current.metadata[k] for k in ('created_at', 'mode', 'parent', 'n_estimators', 'metrics')
+                       if k in current.metadata}})
+
+@app.route('/api/ndvi_cache_stats')
+def get_ndvi_cache_stats_api():
+    return jsonify(ndvi_cache.stats())
+
+@app.route('/metrics')
+def metrics_api():
+    """Per-stage latency histograms and recent p50/p95/p99, in the Prometheus text format."""
+    return metrics.render_prometheus(), 200, {'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'}
+
 if __name__ == '__main__':
+    # With debug=True this file also runs in the reloader's watcher process, which never serves a request;
+    # only the child it spawns (WERKZEUG_RUN_MAIN=true) does
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        start_background_services()
     app.run(debug=True)
\ No newline at end of file
@@ -0,0 +1,150 @@
+# asgi.py (ASGI entry point)
+#
+# Serves the app from an event loop:
+#   uvicorn asgi:app --workers 2
+#
+# The routes that wait on NDVI fetches, the dashboard form (POST /),
+# POST /api/predict/batch and POST /api/explain, are handled natively here. They await every district's
+# NDVI series concurrently (coalesced with any identical fetch already in flight,
+# see NDVICache.get_ndvi_async), then run the same prediction code as app.py,
+# which by then has nothing left to fetch. A slow Earth Engine call therefore
+# holds a coroutine rather than a server thread. Every other route is the Flask
+# app, run through asgiref's WSGI adapter.
+
+import asyncio
+import json
+import time
+from urllib.parse import parse_qs
+
+from asgiref.wsgi import WsgiToAsgi
+
+import app as web
+from src.utils.metrics import server_timing, PROFILING_ENABLED
+
+flask_asgi = WsgiToAsgi(web.app)
+
+
+# --- HTTP HELPERS ---
+
+async def read_body(receive):
+    body = b''
+    while True:
+        message = await receive()
+        body += message.get('body', b'')
+        if not message.get('more_body'):
+            return body
+
+
+async def send_response(send, status, body, content_type):
+    await send({'type': 'http.response.start', 'status': status,
+                'headers': [(b'content-type', content_type.encode()),
+                            (b'content-length', str(len(body)).encode())]})
+    await send({'type': 'http.response.body', 'body': body})
+
+
+async def send_json(send, payload, status=200):
+    await send_response(send, status, json.dumps(payload).encode(), 'application/json')
+
+
+async def prefetch_ndvi(districts):
+    """get_current_ndvi for each district, concurrently; a failed fetch is kept as its exception."""
+    results = await asyncio.gather(*(web.get_current_ndvi_async(d) for d in districts), return_exceptions=True)
+    return dict(zip(districts, results))
+
+
+# --- ROUTES ---
+
+async def home(scope, receive, send):
+    if web.active_model is None:
+        return await send_response(send, 500, b"<h1>Error: Model not loaded.</h1>", 'text/html; charset=utf-8')
+    form = parse_qs((await read_body(receive)).decode())
+    district, crop = form.get('district', [''])[0], form.get('crop', [''])[0]
+    current = web.active_model.get()
+    ndvi_by_district = {}
+    if district and crop and web.prediction_grid.lookup(district, crop, current.version)[0] is None:
+        ndvi_by_district = await prefetch_ndvi(web.districts_to_fetch([{'district': district, 'crop': crop}]))
+    with web.app.app_context():
+        html = web.render_home(current, district, crop, ndvi_by_district)
+    await send_response(send, 200, html.encode(), 'text/html; charset=utf-8')
+
+
+async def predict_batch(scope, receive, send, explain=False):
+    if web.active_model is None:
+        return await send_json(send, {'error': 'Model not loaded.'}, 500)
+    try:
+        payload = json.loads(await read_body(receive) or b'null')
+    except ValueError:
+        payload = None
+    try:
+        items = web.parse_batch_payload(payload)
+    except ValueError as e:
+        return await send_json(send, {'error': str(e)}, 400)
+    current = web.active_model.get()
+    missing = [item for item in items if web.grid_result(current, item)[0] is None]
+    ndvi_by_district = await prefetch_ndvi(web.districts_to_fetch(missing))
+    await send_json(send, web.serve_batch(current, items, ndvi_by_district, explain))
+
+
+async def explain_batch(scope, receive, send):
+    if web.active_model is not None:
+        try:
+            web.explanations.explainer(web.active_model.get())
+        except web.ExplanationUnavailable as e:
+            return await send_json(send, {'error': str(e)}, 501)
+    await predict_batch(scope, receive, send, explain=True)
+
+
+ROUTES = {
+    ('POST', '/'): (home, 'dashboard'),
+    ('POST', '/api/predict/batch'): (predict_batch, 'batch_api'),
+    ('POST', '/api/explain'): (explain_batch, 'explain_api'),
+}
+
+
+async def instrumented(handler, stage, scope, receive, send):
+    """
+    Records the request's latency as `stage`, and with ?profile=1 (when
+    PROFILING_ENABLED) adds a Server-Timing header. cProfile reports are only
+    available from the Flask app: coroutines of other requests would share
+    the profile.
+    """
+    start = time.perf_counter()
+    profile = PROFILING_ENABLED and 'profile' in parse_qs(scope.get('query_string', b'').decode())
+    token = web.metrics.start_trace() if profile else None
+
+    async def timed_send(message):
+        nonlocal token
+        if message['type'] == 'http.response.start':
+            web.metrics.observe(stage, time.perf_counter() - start)
+            if token is not None:
+                timing = server_timing(web.metrics.end_trace(token)).encode()
+                message = {**message, 'headers': [*message.get('headers', []), (b'server-timing', timing)]}
+                token = None
+        await send(message)
+
+    try:
+        await handler(scope, receive, timed_send)
+    finally:
+        if token is not None:
+            web.metrics.end_trace(token)
+
+
+async def lifespan(scope, receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            web.start_background_services()
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            web.stop_background_services()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def app(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        return await lifespan(scope, receive, send)
+    route = ROUTES.get((scope.get('method'), scope.get('path'))) if scope['type'] == 'http' else None
+    if route is not None:
+        return await instrumented(*route, scope, receive, send)
+    await flask_asgi(scope, receive, send)
@@ -0,0 +1,120 @@
+# bench_compact_forest.py
+#
+# Compares serving the active registry version from its joblib pickle against
+# the memory-mapped compact forest export: cold load time, memory per worker
+# process, single-row and batch latency, and that predictions are identical.
+#
+# Usage (from the project root, after training at least one version):
+#   python -m benchmarks.bench_compact_forest
+#   python -m benchmarks.bench_compact_forest --version v0002 --workers 4
+#
+# Memory is read from /proc/self/smaps_rollup (Linux). "Private" is what each
+# additional worker costs; mapped forest pages are shared, so they show up in
+# RSS but not in Private once another process has them in the page cache.
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+import numpy as np
+
+from src.utils.compact_forest import CompactForest
+from src.utils.model_registry import ModelRegistry, MODEL_FILE, FOREST_DIR
+
+NUMERIC_RANGES = {'Year': (2018, 2021), 'ndvi': (0.05, 0.8), 'ndvi_max': (0.1, 0.9), 'ndvi_std': (0.0, 0.15),
+                  'ndvi_count': (1, 60), 'ndvi_peak_day': (0, 365), 'ndvi_auc': (0, 250),
+                  'ndvi_greenup_slope': (-0.005, 0.01)}
+
+_WORKER_SNIPPET = """
+import json, time
+import numpy as np
+
+def memory_kb():
+    fields = {{}}
+    with open('/proc/self/smaps_rollup') as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == 'kB':
+                fields[parts[0].rstrip(':')] = int(parts[1])
+    return fields['Rss'], fields['Private_Clean'] + fields['Private_Dirty']
+
+import joblib
+from src.utils.compact_forest import CompactForest
+X = np.load({x_path!r})
+rss0, private0 = memory_kb()
+start = time.perf_counter()
+model = {load}
+load_s = time.perf_counter() - start
+model.predict(X)  # Touch every page a real workload would
+rss1, private1 = memory_kb()
+
+single = []
+for row in X[:{single_rows}]:
+    start = time.perf_counter()
+    model.predict(row.reshape(1, -1))
+    single.append(time.perf_counter() - start)
+start = time.perf_counter()
+model.predict(X[:1000])
+batch_s = time.perf_counter() - start
+print(json.dumps({{'load_s': load_s, 'rss_kb': rss1 - rss0, 'private_kb': private1 - private0,
+                  'single_ms_p50': float(np.median(single)) * 1e3, 'batch_1000_ms': batch_s * 1e3}}))
+"""
+
+
+def run_worker(load_expr, x_path, single_rows):
+    out = subprocess.run([sys.executable, '-c', _WORKER_SNIPPET.format(load=load_expr, x_path=x_path,
+                                                                       single_rows=single_rows)],
+                         capture_output=True, text=True, check=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--version', default=None, help="Registry version (default: the active one)")
+    parser.add_argument('--workers', type=int, default=3, help="Sequential worker processes per format")
+    parser.add_argument('--rows', type=int, default=2000, help="Random feature rows to predict")
+    parser.add_argument('--single-rows', type=int, default=200)
+    args = parser.parse_args()
+
+    registry = ModelRegistry()
+    version = args.version or registry.current_version()
+    if version is None:
+        sys.exit("No model version in the registry. Train one first: python -m src.utils.train_yield_model")
+    version_dir = os.path.join(registry.root, version)
+    if not os.path.isdir(os.path.join(version_dir, FOREST_DIR)):
+        registry.export_compact(version)
+
+    # Rows drawn from the training data's value ranges, one district and one crop switched on
+    reference, compact = registry.load(version), registry.load(version, compact=True)
+    encoder = reference.encoder
+    rng = np.random.default_rng(42)
+    districts, crops = encoder.categories['District'], encoder.categories['Crop']
+    numeric = {name: rng.uniform(*NUMERIC_RANGES.get(name, (0.0, 1.0)), args.rows)
+               for name in encoder.numeric_features}
+    X = encoder.transform(numeric, rng.choice(districts, args.rows), rng.choice(crops, args.rows))
+    assert isinstance(compact.model, CompactForest)
+    assert np.array_equal(reference.model.predict(X), compact.model.predict(X)), "Predictions differ"
+    print(f"--- {version}: {compact.model.n_estimators} trees, {compact.model.node_count:,} nodes ---")
+    print("✅ Compact forest predictions are identical to scikit-learn's.")
+
+    x_path = os.path.join(version_dir, '.bench_rows.npy')
+    np.save(x_path, X)
+    loads = {
+        'joblib': f"joblib.load({os.path.join(version_dir, MODEL_FILE)!r})",
+        'compact': f"CompactForest.load({os.path.join(version_dir, FOREST_DIR)!r})",
+    }
+    print(f"\n{'format':<8} {'load ms':>9} {'RSS KB':>9} {'private KB':>11} {'1-row p50 ms':>13} {'1000 rows ms':>13}")
+    try:
+        for name, load_expr in loads.items():
+            for _ in range(args.workers):
+                r = run_worker(load_expr, x_path, args.single_rows)
+                print(f"{name:<8} {r['load_s'] * 1e3:>9.1f} {r['rss_kb']:>9} {r['private_kb']:>11} "
+                      f"{r['single_ms_p50']:>13.3f} {r['batch_1000_ms']:>13.1f}")
+    finally:
+        os.remove(x_path)
+
+
+if __name__ == '__main__':
+    main()
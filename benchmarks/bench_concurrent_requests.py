@@ -0,0 +1,135 @@
+# bench_concurrent_requests.py
+#
+# Load test for a burst of identical dashboard requests (many users opening the
+# same few districts at once), against a synthetic NDVI provider that sleeps
+# --latency seconds per upstream call to stand in for Earth Engine.
+#
+# Scenarios, each starting from a cold NDVI cache:
+#   wsgi            Flask on a pool of --threads server threads (like gunicorn's gthread worker)
+#   asgi            asgi.py on one event loop, every client in flight at once
+# each with and without request coalescing. Requests are driven in-process (the
+# Flask test client and direct ASGI calls), so the numbers leave out HTTP parsing
+# and measure the serving paths themselves.
+#
+# Usage (from the project root, after training a model):
+#   python -m benchmarks.bench_concurrent_requests
+#   python -m benchmarks.bench_concurrent_requests --clients 100 --districts 5 --latency 1.0
+
+import argparse
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode
+
+import numpy as np
+
+# Configure the app before it is imported: no network, no persistent cache, and
+# no prediction grid (it would answer every request without fetching)
+os.environ['NDVI_PROVIDER'] = 'synthetic'
+os.environ['NDVI_CACHE_BACKEND'] = 'memory'
+os.environ['PREDICTION_GRID_REFRESH_SECONDS'] = '0'
+
+
+def make_requests(web, clients, n_districts):
+    """(district, crop) per client: the first n_districts districts, round robin, each with a crop the model knows."""
+    encoder = web.active_model.get().encoder
+    pairs = []
+    for district in web.districts_list:
+        known = [c for c in web.yield_stats.crops_for(district)
+                 if district in encoder.categories['District'] and c in encoder.categories['Crop']]
+        if known:
+            pairs.append((district, known[0]))
+    pairs = pairs[:n_districts]
+    return [pairs[i % len(pairs)] for i in range(clients)]
+
+
+def run_wsgi(web, requests, threads):
+    """Every request submitted at once to a pool of `threads` server threads. Returns per-request latencies."""
+    local = threading.local()
+
+    def handle(submitted, district, crop):
+        if not hasattr(local, 'client'):
+            local.client = web.app.test_client()
+        response = local.client.post('/', data={'district': district, 'crop': crop})
+        assert response.status_code == 200 and b'Predicted Yield' in response.data, response.data[:200]
+        return time.perf_counter() - submitted
+
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        futures = [pool.submit(handle, time.perf_counter(), d, c) for d, c in requests]
+        return [f.result() for f in futures]
+
+
+def run_asgi(asgi_app, requests):
+    """Every request in flight at once on one event loop. Returns per-request latencies."""
+
+    async def handle(district, crop):
+        start = time.perf_counter()
+        body = urlencode({'district': district, 'crop': crop}).encode()
+        sent = []
+
+        async def receive():
+            return {'type': 'http.request', 'body': body, 'more_body': False}
+
+        async def send(message):
+            sent.append(message)
+
+        scope = {'type': 'http', 'method': 'POST', 'path': '/', 'query_string': b'', 'root_path': '',
+                 'headers': [(b'content-type', b'application/x-www-form-urlencoded')]}
+        await asgi_app(scope, receive, send)
+        assert sent[0]['status'] == 200 and b'Predicted Yield' in sent[1]['body'], sent[1]['body'][:200]
+        return time.perf_counter() - start
+
+    async def burst():
+        return await asyncio.gather(*(handle(d, c) for d, c in requests))
+
+    return asyncio.run(burst())
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--clients', type=int, default=100, help="Concurrent requests per burst")
+    parser.add_argument('--districts', type=int, default=5, help="Distinct districts the clients ask for")
+    parser.add_argument('--latency', type=float, default=0.5, help="Seconds per upstream NDVI call")
+    parser.add_argument('--threads', type=int, default=8, help="WSGI server threads")
+    parser.add_argument('--rounds', type=int, default=3, help="Cold bursts per scenario")
+    args = parser.parse_args()
+
+    import app as web
+    import asgi
+    from src.utils.ndvi_providers import SyntheticProvider
+
+    if web.active_model is None:
+        raise SystemExit("The app failed to start (see above). Train a model first: python -m src.utils.train_yield_model")
+    provider = SyntheticProvider(latency_seconds=args.latency)
+    web.ndvi_cache.fetch_fn = provider
+    requests = make_requests(web, args.clients, args.districts)
+
+    print(f"--- {args.clients} concurrent dashboard requests over {args.districts} districts, "
+          f"{args.latency * 1e3:.0f} ms per upstream call, {args.rounds} cold rounds ---")
+    print(f"{'scenario':<28} {'req/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'max ms':>9} {'upstream calls':>15}")
+    scenarios = [
+        (f'wsgi, {args.threads} threads', False, lambda: run_wsgi(web, requests, args.threads)),
+        (f'wsgi, {args.threads} threads', True, lambda: run_wsgi(web, requests, args.threads)),
+        ('asgi', False, lambda: run_asgi(asgi.app, requests)),
+        ('asgi', True, lambda: run_asgi(asgi.app, requests)),
+    ]
+    for name, coalesce, run in scenarios:
+        web.ndvi_cache.coalesce = coalesce
+        latencies, wall, calls = [], 0.0, 0
+        for _ in range(args.rounds):
+            web.ndvi_cache.backend.clear()
+            provider.calls = 0
+            start = time.perf_counter()
+            latencies += run()
+            wall += time.perf_counter() - start
+            calls += provider.calls
+        ms = np.array(latencies) * 1e3
+        label = f"{name}, {'coalesced' if coalesce else 'no coalescing'}"
+        print(f"{label:<28} {len(latencies) / wall:>8.1f} {np.percentile(ms, 50):>9.0f} "
+              f"{np.percentile(ms, 95):>9.0f} {ms.max():>9.0f} {calls / args.rounds:>15.1f}")
+
+
+if __name__ == '__main__':
+    main()
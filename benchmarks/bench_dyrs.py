@@ -0,0 +1,62 @@
+# bench_dyrs.py
+#
+# Times scalar vs vectorized DYRS scoring over a synthetic portfolio. That both
+# produce identical numbers and labels is checked in tests/test_risk_calculator.py.
+#
+# Usage (from the project root):
+#   python -m benchmarks.bench_dyrs --rows 1000000
+
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from src.utils.risk_calculator import (
+    calculate_full_dyrs, score_to_risk_level, calculate_portfolio_dyrs
+)
+
+
+def make_portfolio(n_rows, seed=42):
+    """Random plots spanning every DYRS branch (yield clipping, both anomaly bands, score clipping)."""
+    rng = np.random.default_rng(seed)
+    avg = rng.uniform(0.5, 60.0, n_rows)
+    return pd.DataFrame({
+        'predicted_yield': avg * rng.uniform(0.6, 1.4, n_rows),
+        'historical_avg_yield': avg,
+        'historical_yield_cv': rng.uniform(0.0, 0.8, n_rows),
+        'ndvi_z_score': rng.normal(-0.5, 1.2, n_rows),
+    })
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--scalar-rows', type=int, default=50_000, help='rows timed with the scalar loop')
+    args = parser.parse_args()
+
+    portfolio = make_portfolio(args.rows)
+    print(f"--- DYRS scoring benchmark: {args.rows:,} rows ---")
+
+    start = time.perf_counter()
+    vectorized = calculate_portfolio_dyrs(portfolio)
+    vectorized_s = time.perf_counter() - start
+    print(f"Vectorized: {vectorized_s:.3f} s ({args.rows / vectorized_s:,.0f} rows/s)")
+
+    sample = portfolio.iloc[:args.scalar_rows]
+    start = time.perf_counter()
+    scalar = []
+    for row in sample.itertuples(index=False):
+        result = calculate_full_dyrs(row.predicted_yield, row.historical_avg_yield,
+                                     row.historical_yield_cv, row.ndvi_z_score)
+        result['Risk_Level'] = score_to_risk_level(result['Final_DYRS'])
+        scalar.append(result)
+    scalar_s = time.perf_counter() - start
+    scalar_full_s = scalar_s * args.rows / len(sample)
+    print(f"Scalar loop: {scalar_s:.3f} s for {len(sample):,} rows "
+          f"(~{scalar_full_s:.1f} s extrapolated to {args.rows:,})")
+    print(f"Speed-up: {scalar_full_s / vectorized_s:,.0f}x")
+
+
+if __name__ == '__main__':
+    main()
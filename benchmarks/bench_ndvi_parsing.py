@@ -0,0 +1,84 @@
+# bench_ndvi_parsing.py
+#
+# Compares the old per-row ee.Date(...).getInfo() parsing loop against the local,
+# vectorized parse_region_response() on a getRegion() payload.
+#
+# Usage (from the project root):
+#   python -m benchmarks.bench_ndvi_parsing
+#   python -m benchmarks.bench_ndvi_parsing --payload recorded_getregion.json --rtt-ms 150
+#
+# --payload takes a JSON dump of a real `getRegion(...).getInfo()` response. Without
+# it, a payload of the same shape is rebuilt from the observations recorded in
+# data/satellite_data_all_districts.csv.
+
+import argparse
+import json
+import os
+import time
+
+import pandas as pd
+
+from src.utils.satellite_data import parse_region_response
+
+DATA_DIR = 'data'
+SATELLITE_DATA_PATH = os.path.join(DATA_DIR, 'satellite_data_all_districts.csv')
+REGION_HEADER = ['id', 'longitude', 'latitude', 'time', 'NDVI']
+
+
+def build_region_payload(path=SATELLITE_DATA_PATH, repeat=1):
+    """Rebuilds a getRegion-shaped payload (header + rows, epoch-ms times) from the CSV."""
+    df = pd.read_csv(path)
+    times = pd.to_datetime(df['date']).to_numpy().astype('datetime64[ms]').astype('int64').tolist()
+    rows = [[f"S2_{i}", 77.5946, 12.9716, t, v] for i, (t, v) in enumerate(zip(times, df['ndvi'].tolist()))]
+    return [REGION_HEADER] + rows * repeat
+
+
+def legacy_parse(ndvi_values, rtt_seconds):
+    """The original loop, with each ee.Date(...).getInfo() replaced by a sleep of one round trip."""
+    header = ndvi_values[0]
+    time_index, ndvi_index = header.index('time'), header.index('NDVI')
+    ndvi_list = []
+    for row in ndvi_values[1:]:
+        time.sleep(rtt_seconds)
+        date = pd.to_datetime(row[time_index], unit='ms').strftime('%Y-%m-%d')
+        if row[ndvi_index] is not None:
+            ndvi_list.append({'date': date, 'ndvi': round(row[ndvi_index], 4)})
+    return ndvi_list
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--payload', help='JSON file holding a recorded getRegion().getInfo() response')
+    parser.add_argument('--rtt-ms', type=float, default=100.0, help='simulated Earth Engine round trip')
+    parser.add_argument('--legacy-rows', type=int, default=50, help='rows to time with the legacy loop')
+    args = parser.parse_args()
+
+    if args.payload:
+        with open(args.payload) as f:
+            payload = json.load(f)
+    else:
+        payload = build_region_payload()
+    n_rows = len(payload) - 1
+    print(f"--- getRegion payload: {n_rows} rows ---")
+
+    start = time.perf_counter()
+    df = parse_region_response(payload)
+    vectorized_s = time.perf_counter() - start
+    print(f"Vectorized parse: {vectorized_s * 1000:.1f} ms for {len(df)} observations")
+
+    # The legacy loop is dominated by network latency, so time a sample and extrapolate.
+    sample = payload[:args.legacy_rows + 1]
+    start = time.perf_counter()
+    legacy = legacy_parse(sample, args.rtt_ms / 1000)
+    legacy_s = (time.perf_counter() - start) * n_rows / max(len(sample) - 1, 1)
+    print(f"Legacy per-row parse (extrapolated at {args.rtt_ms:.0f} ms RTT): {legacy_s:.1f} s")
+    print(f"Speed-up: {legacy_s / vectorized_s:,.0f}x")
+
+    # Both parsers must agree on the sampled rows
+    expected = pd.DataFrame(legacy)
+    got = parse_region_response(sample)
+    assert got['date'].dt.strftime('%Y-%m-%d').tolist() == sorted(expected['date'].tolist())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+# bench_weather_ingest.py
+#
+# Runs the weather ingester offline against a local mock of the archive API and
+# compares it with the old pattern (one un-pooled requests.get per day, one
+# location at a time). The mock answers every request after --latency seconds
+# with deterministic synthetic weather, and fails a --fail-rate fraction of
+# requests with HTTP 503 so that the retries are exercised.
+#
+# Scenarios:
+#   per-day        requests.get per day, serially (measured on one district-year)
+#   bulk, cold     run_weather_fetch into an empty store
+#   bulk, rerun    the same run again: every district-year is already stored
+#   bulk, partial  after deleting one partition and truncating another
+#
+# Usage (from the project root):
+#   python -m benchmarks.bench_weather_ingest
+#   python -m benchmarks.bench_weather_ingest --years 3 --latency 0.2 --workers 16
+
+import argparse
+import contextlib
+import io
+import os
+import shutil
+import tempfile
+import time
+
+import pandas as pd
+import pyarrow.parquet as pq
+import requests
+
+from tests.mock_weather import MockWeatherServer
+
+
+def per_day_fetch(url, lat, lon, days):
+    """The old access pattern: a fresh requests.get per day, one after another."""
+    rows = 0
+    for day in days:
+        response = requests.get(url, params={'lat': lat, 'lon': lon, 'dt': int(day.timestamp())}, timeout=30)
+        if response.status_code == 200:
+            rows += 1
+    return rows
+
+
+def stored_days(store_path):
+    from src.utils.data_store import load_weather_data
+    if not os.path.exists(store_path):
+        return 0
+    return len(load_weather_data(store_path, columns=['date']))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--years', type=int, default=2, help="Years per district, ending in 2020")
+    parser.add_argument('--latency', type=float, default=0.05, help="Seconds the mock takes per request")
+    parser.add_argument('--fail-rate', type=float, default=0.05, help="Fraction of requests answered with 503")
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--rps', type=float, default=50.0)
+    args = parser.parse_args()
+
+    from src.utils.data_store import weather_partition_path
+    from src.utils.fetch_satellite_data_all import TokenBucket
+    from src.utils.fetch_weather_data_all import run_weather_fetch, BURST
+
+    start_date, end_date = f"{2021 - args.years}-01-01", '2020-12-31'
+    districts = pd.read_csv('data/karnataka_districts.csv')
+    store_path = os.path.join(tempfile.mkdtemp(prefix='agrisense-weather-'), 'weather')
+    n_days = len(pd.date_range(start_date, end_date))
+
+    print(f"--- {len(districts)} districts x {args.years} years ({n_days} days each), mock API at "
+          f"{args.latency * 1e3:.0f} ms per request, {args.fail_rate:.0%} failures ---")
+    print(f"{'scenario':<16} {'seconds':>9} {'requests':>9} {'days stored':>12}")
+    try:
+        with MockWeatherServer(latency=args.latency, fail_rate=args.fail_rate) as server:
+            lat, lon = districts.loc[0, 'Latitude'], districts.loc[0, 'Longitude']
+            one_year = pd.date_range('2020-01-01', '2020-12-31')
+            start = time.perf_counter()
+            per_day_fetch(server.url, lat, lon, one_year)
+            seconds = time.perf_counter() - start
+            estimate = seconds * len(districts) * args.years
+            print(f"{'per-day':<16} {seconds:>9.2f} {server.requests:>9} {'-':>12}"
+                  f"   (1 district-year; ~{estimate / 60:.0f} min for all)")
+
+            def run(name):
+                server.reset()
+                with contextlib.redirect_stdout(io.StringIO()):  # The ingester logs every district-year
+                    summary = run_weather_fetch(districts_path='data/karnataka_districts.csv', store_path=store_path,
+                                                start_date=start_date, end_date=end_date, max_workers=args.workers,
+                                                limiter=TokenBucket(args.rps, BURST), backoff_base=0.05,
+                                                base_url=server.url)
+                print(f"{name:<16} {summary['seconds']:>9.2f} {server.requests:>9} {stored_days(store_path):>12}"
+                      + (f"   ({summary['failed']} district-years failed)" if summary['failed'] else ''))
+
+            run('bulk, cold')
+            run('bulk, rerun')
+            district = str(districts.loc[1, 'District']).split('. ')[-1].strip().upper()
+            os.remove(weather_partition_path(district, 2020, store_path))
+            district = str(districts.loc[2, 'District']).split('. ')[-1].strip().upper()
+            truncated = weather_partition_path(district, 2020, store_path)
+            pq.write_table(pq.read_table(truncated).slice(0, 200), truncated)
+            run('bulk, partial')
+    finally:
+        shutil.rmtree(os.path.dirname(store_path), ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,282 @@
+# run_suite.py
+#
+# Reproducible benchmark suite for the serving, training and data-prep hot
+# paths. Runs offline: every fixture is derived from the CSVs in data/, inside a
+# throwaway working directory (data files are symlinked in; the model registry,
+# climatology and Parquet store are built there), so the repo's own models/ and
+# data/store/ are never touched. NDVI comes from the local file provider.
+#
+# Usage (from the project root):
+#   python -m benchmarks.run_suite                        # all cases -> benchmarks/results/<commit>.json
+#   python -m benchmarks.run_suite --only predict_single,predict_batch --quick
+#   python -m benchmarks.run_suite --compare benchmarks/results/abc1234.json --threshold 0.25
+#
+# Each case is timed `repeat` times after one warm-up call; the JSON holds the
+# median, p95, min and mean in milliseconds. With --compare, a case whose median
+# is more than `threshold` (a fraction) slower than in the baseline is a
+# regression, and the exit status is 1.
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(REPO_ROOT, 'benchmarks', 'results')
+DATA_FILES = ['historical_data_2010-2020.csv', 'karnataka_districts.csv',
+              'satellite_data_all_districts.csv', 'yield_data_tidy.csv']
+DEFAULT_THRESHOLD = 0.25
+
+BATCH_ITEMS = 100
+PORTFOLIO_ROWS = 100_000
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def make_workspace():
+    """A temporary project directory with data/ symlinked in and an empty models/."""
+    workdir = tempfile.mkdtemp(prefix='agrisense-bench-')
+    os.makedirs(os.path.join(workdir, 'data'))
+    os.makedirs(os.path.join(workdir, 'models'))
+    for name in DATA_FILES:
+        os.symlink(os.path.join(REPO_ROOT, 'data', name), os.path.join(workdir, 'data', name))
+    return workdir
+
+
+def time_case(fn, repeat):
+    samples = []
+    # The code under test prints progress; keep it out of the report
+    with contextlib.redirect_stdout(io.StringIO()):
+        fn()  # Warm-up: imports, caches, first-touch page faults
+        for _ in range(repeat):
+            start = time.perf_counter()
+            fn()
+            samples.append((time.perf_counter() - start) * 1e3)
+    samples = np.array(samples)
+    return {'median_ms': float(np.median(samples)), 'p95_ms': float(np.percentile(samples, 95)),
+            'min_ms': float(samples.min()), 'mean_ms': float(samples.mean()), 'repeat': int(repeat)}
+
+
+# --- CASES ---
+# Each builder sets up its fixture once and returns (callable, repeat, description).
+
+def case_predict_single(ctx):
+    client, (district, crop) = ctx['client'], ctx['pairs'][0]
+
+    def run():
+        r = client.post('/', data={'district': district, 'crop': crop})
+        assert r.status_code == 200 and b'Predicted Yield' in r.data
+    return run, 50, f"POST / for {district}/{crop} (live path, NDVI cached)"
+
+
+def case_predict_batch(ctx):
+    client = ctx['client']
+    items = [{'district': d, 'crop': c} for d, c in ctx['pairs'][:BATCH_ITEMS]]
+
+    def run():
+        r = client.post('/api/predict/batch', json={'items': items})
+        assert r.status_code == 200 and r.get_json()['errors'] == 0
+    return run, 20, f"POST /api/predict/batch with {len(items)} items"
+
+
+def case_explain_batch(ctx, explain=True):
+    # Items with an 'ndvi' value skip the prediction grid, so this times the live path
+    client = ctx['client']
+    items = [{'district': d, 'crop': c, 'ndvi': 0.3 + 0.01 * (i % 40)}
+             for i, (d, c) in enumerate(ctx['pairs'][:BATCH_ITEMS])]
+    url = '/api/explain' if explain else '/api/predict/batch'
+
+    def run():
+        r = client.post(url, json={'items': items})
+        assert r.status_code == 200 and r.get_json()['errors'] == 0
+    return run, 20, f"POST {url} with {len(items)} items, live (given NDVI; attributions cached after warm-up)"
+
+
+def case_crops_for_district(ctx):
+    client, district = ctx['client'], ctx['pairs'][0][0]
+
+    def run():
+        r = client.get(f'/api/crops_for_district?district={district}')
+        assert r.status_code == 200 and r.get_json()
+    return run, 500, f"GET /api/crops_for_district for {district}"
+
+
+def case_dyrs_portfolio(ctx):
+    from benchmarks.bench_dyrs import make_portfolio
+    from src.utils.risk_calculator import calculate_portfolio_dyrs
+    portfolio = make_portfolio(PORTFOLIO_ROWS)
+    return lambda: calculate_portfolio_dyrs(portfolio), 20, f"calculate_portfolio_dyrs, {PORTFOLIO_ROWS:,} rows"
+
+
+def case_ndvi_parsing(ctx):
+    from benchmarks.bench_ndvi_parsing import build_region_payload
+    from src.utils.satellite_data import parse_region_response
+    payload = build_region_payload()
+    return lambda: parse_region_response(payload), 20, f"parse_region_response, {len(payload) - 1:,} rows"
+
+
+def case_season_features(ctx):
+    from src.utils.data_store import load_satellite_data
+    from src.utils.ndvi_features import seasonal_ndvi_features
+    satellite_df = load_satellite_data(columns=['date', 'District', 'ndvi'])
+    return lambda: seasonal_ndvi_features(satellite_df), 20, f"seasonal_ndvi_features, {len(satellite_df):,} readings"
+
+
+def case_prepare_yield_data(ctx):
+    from src.utils.prepare_yield_data import tidy_yield_data
+    out_dir = tempfile.mkdtemp(dir=ctx['workdir'])
+    output, store = os.path.join(out_dir, 'yield_data_tidy.csv'), os.path.join(out_dir, 'yield.parquet')
+    return (lambda: tidy_yield_data(output_path=output, store_path=store), 5,
+            "tidy_yield_data on data/historical_data_2010-2020.csv, CSV and Parquet output")
+
+
+def case_train_fit(ctx):
+    from src.utils.train_yield_model import train_full
+    master_df = ctx['master_df']
+    return lambda: train_full(master_df), 3, f"train_full (RandomForest, default trees), {len(master_df):,} rows"
+
+
+CASES = {
+    'predict_single': case_predict_single,
+    'predict_batch': case_predict_batch,
+    'predict_batch_live': lambda ctx: case_explain_batch(ctx, explain=False),
+    'explain_batch_live': case_explain_batch,
+    'crops_for_district': case_crops_for_district,
+    'dyrs_portfolio': case_dyrs_portfolio,
+    'ndvi_parsing': case_ndvi_parsing,
+    'season_features': case_season_features,
+    'prepare_yield_data': case_prepare_yield_data,
+    'train_fit': case_train_fit,
+}
+SERVING_CASES = {'predict_single', 'predict_batch', 'predict_batch_live', 'explain_batch_live', 'crops_for_district'}
+
+
+def build_context(workdir, cases):
+    """Shared fixtures: the master training frame and, for serving cases, a registered model and the app."""
+    from src.utils.train_yield_model import load_master_frame, train_full, data_fingerprint
+    from src.utils.model_registry import ModelRegistry
+
+    ctx = {'workdir': workdir, 'master_df': load_master_frame()}
+    if SERVING_CASES & set(cases):
+        model, encoder, metadata = train_full(ctx['master_df'])
+        metadata['data_fingerprint'] = data_fingerprint(ctx['master_df'])
+        ModelRegistry().register(model, encoder, metadata)
+        import app as web
+        if web.active_model is None:
+            raise RuntimeError("The app failed to start in the benchmark workspace; run it directly to see why.")
+        known = set(encoder.categories['District']), set(encoder.categories['Crop'])
+        ctx['client'] = web.app.test_client()
+        ctx['pairs'] = [(d, c) for d in web.districts_list for c in web.yield_stats.crops_for(d)
+                        if d in known[0] and c in known[1]]
+    return ctx
+
+
+def compare(results, baseline, threshold):
+    """Prints median changes against the baseline; returns the names of regressed cases."""
+    regressions = []
+    print(f"\n{'case':<22} {'baseline ms':>12} {'now ms':>10} {'change':>9}")
+    for name, result in results.items():
+        old = baseline.get('results', {}).get(name)
+        if old is None:
+            print(f"{name:<22} {'-':>12} {result['median_ms']:>10.2f} {'new':>9}")
+            continue
+        change = result['median_ms'] / old['median_ms'] - 1
+        flag = ''
+        if change > threshold:
+            regressions.append(name)
+            flag = '  ❌ regression'
+        print(f"{name:<22} {old['median_ms']:>12.2f} {result['median_ms']:>10.2f} {change:>+9.1%}{flag}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark suite for the serving, training and data-prep paths.")
+    parser.add_argument('--only', help=f"Comma-separated cases to run (default: all of {', '.join(CASES)})")
+    parser.add_argument('--quick', action='store_true', help="A fifth of the repeats (at least 3)")
+    parser.add_argument('--output', help="JSON results path (default: benchmarks/results/<commit>.json)")
+    parser.add_argument('--compare', help="Baseline results JSON to check against")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help="Allowed median slowdown vs. the baseline, as a fraction (default 0.25)")
+    parser.add_argument('--keep-workspace', action='store_true')
+    args = parser.parse_args(argv)
+
+    cases = args.only.split(',') if args.only else list(CASES)
+    unknown = [c for c in cases if c not in CASES]
+    if unknown:
+        parser.error(f"Unknown case(s): {', '.join(unknown)}")
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    output = os.path.abspath(args.output or os.path.join(RESULTS_DIR, f"{git_commit()}.json"))
+
+    # Offline, in-memory and without background work, before anything imports the app
+    os.environ.update({'NDVI_PROVIDER': 'local', 'NDVI_CACHE_BACKEND': 'memory',
+                       'PREDICTION_GRID_REFRESH_SECONDS': '0', 'METRICS_ENABLED': '1'})
+    workdir = make_workspace()
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    sys.path.insert(0, REPO_ROOT)
+    results = {}
+    try:
+        print("Building fixtures (training the serving model)...")
+        with contextlib.redirect_stdout(io.StringIO()):
+            ctx = build_context(workdir, cases)
+        print(f"\n--- Benchmark suite ({git_commit()}) ---")
+        print(f"{'case':<22} {'median ms':>10} {'p95 ms':>10} {'min ms':>10} {'n':>5}  description")
+        for name in cases:
+            fn, repeat, description = CASES[name](ctx)
+            if args.quick:
+                repeat = max(3, repeat // 5)
+            result = time_case(fn, repeat)
+            results[name] = {**result, 'description': description}
+            print(f"{name:<22} {result['median_ms']:>10.2f} {result['p95_ms']:>10.2f} "
+                  f"{result['min_ms']:>10.2f} {repeat:>5}  {description}")
+    finally:
+        os.chdir(cwd)
+        if args.keep_workspace:
+            print(f"Workspace kept at {workdir}")
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    import sklearn
+    import pandas as pd
+    report = {
+        'meta': {'commit': git_commit(), 'created_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+                 'python': platform.python_version(), 'platform': platform.platform(),
+                 'cpu_count': os.cpu_count(), 'numpy': np.__version__, 'pandas': pd.__version__,
+                 'scikit_learn': sklearn.__version__, 'quick': args.quick},
+        'results': results,
+    }
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\n✅ Results saved to '{output}'")
+
+    if baseline is not None:
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"\n❌ {len(regressions)} case(s) more than {args.threshold:.0%} slower: {', '.join(regressions)}")
+            return 1
+        print(f"\n✅ No case more than {args.threshold:.0%} slower than the baseline.")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,15 @@
+# gunicorn.conf.py
+#
+#   gunicorn -c gunicorn.conf.py app:app
+#
+# Importing app starts no background threads or processes; each worker starts
+# its own once it has been forked.
+
+def post_worker_init(worker):
+    import app
+    app.start_background_services()
+
+
+def worker_exit(server, worker):
+    import app
+    app.stop_background_services()
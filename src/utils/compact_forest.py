@@ -0,0 +1,192 @@
+# compact_forest.py
+
+import json
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+FORMAT_VERSION = 2  # 2 added missing_left
+META_FILE = 'forest.json'
+ARRAYS = ('feature', 'threshold', 'children', 'missing_left', 'value', 'roots')
+
+
+class CompactForest:
+    """
+    A fitted tree ensemble flattened into a few NumPy arrays.
+
+    All trees' nodes are concatenated: node i splits on `feature[i]` at
+    `threshold[i]` and continues at `children[i, 0]` (x <= threshold) or
+    `children[i, 1]`; a missing (NaN) value goes left where `missing_left[i]`
+    is set, as scikit-learn's tree_.missing_go_to_left routes it, and right
+    otherwise. `value[i]` is the node's mean target and `roots[t]` is where
+    tree t starts. Leaves point to themselves. Prediction walks every
+    (row, tree) pair down one level per step as a single vectorized gather,
+    dropping pairs as they reach a leaf.
+
+    Each array is its own .npy file, loaded with mmap_mode='r': the pages are
+    shared read-only through the OS page cache, so several worker processes
+    serving the same version hold one copy, and loading reads no node data.
+    predict() matches RandomForestRegressor.predict exactly (same float32
+    feature comparisons and missing-value routing, trees summed in the same
+    order).
+    """
+
+    def __init__(self, feature, threshold, children, missing_left, value, roots, max_depth, n_features):
+        self.feature = feature
+        self.threshold = threshold
+        self.children = children
+        self.missing_left = missing_left
+        self.value = value
+        self.roots = roots
+        self.max_depth = max_depth
+        self.n_features_in_ = n_features
+
+    @property
+    def n_estimators(self):
+        return len(self.roots)
+
+    @property
+    def node_count(self):
+        return len(self.feature)
+
+    @classmethod
+    def from_sklearn(cls, model):
+        """Flattens a fitted RandomForestRegressor (or other averaging ensemble of regression trees)."""
+        features, thresholds, children, missing_left, values, roots = [], [], [], [], [], []
+        offset = 0
+        for estimator in model.estimators_:
+            tree = estimator.tree_
+            n = tree.node_count
+            own = np.arange(offset, offset + n, dtype=np.int32)
+            leaf = tree.children_left < 0
+            features.append(np.where(leaf, 0, tree.feature).astype(np.int32))
+            thresholds.append(np.where(leaf, 0.0, tree.threshold))
+            children.append(np.column_stack([np.where(leaf, own, tree.children_left + offset),
+                                             np.where(leaf, own, tree.children_right + offset)]).astype(np.int32))
+            # Set at fit time for every split, also when no value was missing then
+            # (NaN goes to the child that got more samples)
+            missing = getattr(tree, 'missing_go_to_left', None)
+            missing_left.append(np.zeros(n, dtype=bool) if missing is None else (missing.astype(bool) & ~leaf))
+            values.append(tree.value[:, 0, 0].astype(np.float64))
+            roots.append(offset)
+            offset += n
+        return cls(np.concatenate(features), np.concatenate(thresholds), np.concatenate(children),
+                   np.concatenate(missing_left), np.concatenate(values), np.array(roots, dtype=np.int32),
+                   max(e.tree_.max_depth for e in model.estimators_), int(model.n_features_in_))
+
+    # --- PREDICTION ---
+
+    def _go_right(self, x, nodes):
+        """Which way each value in x goes at the matching split node."""
+        go_right = x > self.threshold[nodes]
+        missing = np.isnan(x)
+        if missing.any():
+            go_right[missing] = ~self.missing_left[nodes[missing]]
+        return go_right
+
+    def leaves(self, X):
+        """(n_rows, n_trees) index of the leaf each row lands in, per tree."""
+        X = np.asarray(X, dtype=np.float32)  # sklearn compares float32 features
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        n_trees = self.n_estimators
+        # Offsets into the flattened X, so each step is a single 1-D gather
+        flat_X = np.ascontiguousarray(X).ravel()
+        row_offset = np.repeat(np.arange(len(X), dtype=np.intp) * X.shape[1], n_trees)
+        nodes = np.tile(self.roots, len(X))
+        left = self.children[:, 0]
+        active = np.flatnonzero(left[nodes] != nodes)
+        while active.size:
+            current = nodes[active]
+            go_right = self._go_right(flat_X[row_offset[active] + self.feature[current]], current)
+            current = self.children[current, go_right.view(np.int8)]
+            nodes[active] = current
+            active = active[left[current] != current]
+        return nodes.reshape(len(X), n_trees)
+
+    @property
+    def expected_value(self):
+        """Mean of the trees' root values: the forest's prediction before any split."""
+        return float(self.value[self.roots].mean())
+
+    def contributions(self, X):
+        """
+        (n_rows, n_features) tree-path attributions: every split on a row's
+        path credits its feature with the change in node value it causes,
+        averaged over the trees. Each row's contributions sum to its
+        prediction minus expected_value. Same walk as leaves().
+        """
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        n_rows, n_features = X.shape
+        n_trees = self.n_estimators
+        flat_X = np.ascontiguousarray(X).ravel()
+        row_offset = np.repeat(np.arange(n_rows, dtype=np.intp) * n_features, n_trees)
+        nodes = np.tile(self.roots, n_rows)
+        totals = np.zeros(n_rows * n_features)
+        left = self.children[:, 0]
+        active = np.flatnonzero(left[nodes] != nodes)
+        while active.size:
+            current = nodes[active]
+            split = self.feature[current]
+            go_right = self._go_right(flat_X[row_offset[active] + split], current)
+            child = self.children[current, go_right.view(np.int8)]
+            totals += np.bincount(row_offset[active] + split, weights=self.value[child] - self.value[current],
+                                  minlength=totals.size)
+            nodes[active] = child
+            active = active[left[child] != child]
+        return totals.reshape(n_rows, n_features) / n_trees
+
+    def predict(self, X):
+        leaf_values = self.value[self.leaves(X)]
+        out = np.zeros(len(leaf_values))
+        for t in range(self.n_estimators):  # Same summation order as sklearn
+            out += leaf_values[:, t]
+        out /= self.n_estimators
+        return out
+
+    # --- PERSISTENCE ---
+
+    def save(self, path):
+        """Writes the arrays and metadata to the directory `path`, replacing it atomically."""
+        parent = os.path.dirname(os.path.abspath(path))
+        os.makedirs(parent, exist_ok=True)
+        tmp_dir = tempfile.mkdtemp(prefix='.tmp-forest-', dir=parent)
+        try:
+            for name in ARRAYS:
+                np.save(os.path.join(tmp_dir, f"{name}.npy"), np.ascontiguousarray(getattr(self, name)))
+            with open(os.path.join(tmp_dir, META_FILE), 'w') as f:
+                json.dump({'format_version': FORMAT_VERSION, 'max_depth': int(self.max_depth),
+                           'n_features': self.n_features_in_, 'n_estimators': self.n_estimators,
+                           'node_count': self.node_count}, f, indent=2)
+            if os.path.exists(path):
+                shutil.rmtree(path)
+            os.rename(tmp_dir, path)
+        except BaseException:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            raise
+        return path
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        with open(os.path.join(path, META_FILE)) as f:
+            meta = json.load(f)
+        if meta['format_version'] != FORMAT_VERSION:
+            raise ValueError(f"Unsupported compact forest format {meta['format_version']} in '{path}'; "
+                             f"export it again with `python -m src.utils.model_registry export <version>`.")
+        # np.asarray drops the np.memmap subclass (and its per-operation overhead)
+        # while still viewing the mapped pages
+        arrays = {name: np.asarray(np.load(os.path.join(path, f"{name}.npy"), mmap_mode='r' if mmap else None))
+                  for name in ARRAYS}
+        return cls(**arrays, max_depth=meta['max_depth'], n_features=meta['n_features'])
+
+
+def is_exportable(model):
+    """True for fitted ensembles of single-output regression trees (e.g. RandomForestRegressor)."""
+    estimators = getattr(model, 'estimators_', None)
+    return (isinstance(estimators, list) and bool(estimators)
+            and all(hasattr(e, 'tree_') and e.tree_.value.shape[1:] == (1, 1) for e in estimators)
+            and type(model).__name__ in ('RandomForestRegressor', 'ExtraTreesRegressor'))
@@ -0,0 +1,173 @@
+# data_store.py
+
+import os
+import subprocess
+import sys
+from urllib.parse import quote
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# --- PATHS ---
+DATA_DIR = 'data'
+STORE_DIR = os.path.join(DATA_DIR, 'store')
+YIELD_CSV_PATH = os.path.join(DATA_DIR, 'yield_data_tidy.csv')
+SATELLITE_CSV_PATH = os.path.join(DATA_DIR, 'satellite_data_all_districts.csv')
+YIELD_STORE_PATH = os.path.join(STORE_DIR, 'yield.parquet')
+SATELLITE_STORE_PATH = os.path.join(STORE_DIR, 'satellite.parquet')
+# Daily weather is fetched and rewritten one (District, Year) at a time, so it is
+# kept Hive-partitioned: District=<name>/Year=<year>/part-0.parquet
+WEATHER_STORE_PATH = os.path.join(STORE_DIR, 'weather')
+
+# The pipeline tables are small (tens of thousands of rows), so the default
+# layout is one Parquet file per table, sorted by (District, Year). Reads touch
+# a single memory-mapped file. Hive partitioning on District/Year (one file per
+# pair) is available through `partition_cols`, but at this size opening hundreds
+# of tiny files is ~10x slower than parsing the CSV; splitting into per-district
+# row groups was also measured and made reads ~4x slower than a single group.
+DEFAULT_SORT = ['District', 'Year']
+
+
+# --- CLEANING (done once, when the store is written) ---
+
+def clean_yield_frame(df):
+    """Types and normalizes the tidy yield table (District upper-cased, Year as start year)."""
+    df = df.dropna(subset=['District', 'Year', 'Crop', 'Yield']).copy()
+    df['District'] = df['District'].astype(str).str.strip().str.upper()
+    # '2010 - 2011' -> 2010
+    df['Year'] = pd.to_numeric(df['Year'].astype(str).str.split('-').str[0].str.strip(), errors='coerce')
+    df = df.dropna(subset=['Year'])
+    df['Year'] = df['Year'].astype(np.int16)
+    df['Yield'] = df['Yield'].astype(np.float64)  # Kept exact: it is the training target
+    for col in ['State', 'District', 'Crop', 'Season']:
+        if col in df.columns:
+            df[col] = df[col].astype(str).str.strip().astype('category')
+    return df.reset_index(drop=True)
+
+
+def clean_satellite_frame(df):
+    """Types and normalizes the NDVI observations table."""
+    df = df.dropna(subset=['date', 'ndvi', 'District']).copy()
+    df['date'] = pd.to_datetime(df['date'])
+    df['Year'] = df['date'].dt.year.astype(np.int16)
+    df['District'] = df['District'].astype(str).str.split('. ').str[-1].str.strip().str.upper().astype('category')
+    df['ndvi'] = df['ndvi'].astype(np.float32)
+    return df.reset_index(drop=True)
+
+
+# --- WRITING & READING ---
+
+def write_store(df, path, sort_by=DEFAULT_SORT, partition_cols=None):
+    """
+    Writes a cleaned table to the columnar store. With `partition_cols` the
+    table is written as a Hive-partitioned dataset directory instead of a file.
+    """
+    df = df.sort_values(sort_by, kind='stable', ignore_index=True)
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    if partition_cols:
+        pq.write_to_dataset(table, path, partition_cols=partition_cols,
+                            existing_data_behavior='delete_matching')
+        return path
+
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    # Dot-prefixed, so a dataset read of the parent directory skips it
+    tmp_path = os.path.join(os.path.dirname(path), '.' + os.path.basename(path) + '.tmp')
+    pq.write_table(table, tmp_path)
+    os.replace(tmp_path, path)  # Readers never see a half-written file
+    return path
+
+
+def read_store(path, columns=None, filters=None):
+    """Memory-maps a store file (or partitioned directory) into a DataFrame, keeping categoricals."""
+    df = pq.read_table(path, columns=columns, filters=filters, memory_map=True).to_pandas()
+    if 'Year' in df.columns and isinstance(df['Year'].dtype, pd.CategoricalDtype):
+        # Partition keys come back as categoricals
+        df['Year'] = df['Year'].astype(np.int16)
+    return df
+
+
+def load_yield_data(store_path=YIELD_STORE_PATH, csv_path=YIELD_CSV_PATH, columns=None):
+    """Cleaned yield table, from the store when it exists or from the CSV otherwise."""
+    if os.path.exists(store_path):
+        return read_store(store_path, columns=columns)
+    df = clean_yield_frame(pd.read_csv(csv_path))
+    return df[columns] if columns else df
+
+
+def load_satellite_data(store_path=SATELLITE_STORE_PATH, csv_path=SATELLITE_CSV_PATH, columns=None):
+    """Cleaned NDVI observations, from the store when it exists or from the CSV otherwise."""
+    if os.path.exists(store_path):
+        return read_store(store_path, columns=columns)
+    df = clean_satellite_frame(pd.read_csv(csv_path))
+    return df[columns] if columns else df
+
+
+def weather_partition_path(district, year, store_path=WEATHER_STORE_PATH):
+    """The file holding one district's daily weather for one year (district names URI-encoded, as pyarrow expects)."""
+    return os.path.join(store_path, f"District={quote(str(district), safe='')}", f"Year={int(year)}", 'part-0.parquet')
+
+
+def load_weather_data(store_path=WEATHER_STORE_PATH, columns=None, filters=None):
+    """
+    Daily weather for every stored district-year, with District and Year
+    taken from the partition paths. `filters` (pyarrow syntax, e.g.
+    [('District', '=', 'MYSORE')]) skips the other partitions.
+    """
+    df = read_store(store_path, columns=columns, filters=filters)
+    if 'Year' in df.columns:
+        df['Year'] = df['Year'].astype(np.int16)
+    if 'District' in df.columns:
+        df['District'] = df['District'].astype('category')
+    return df
+
+
+def build_store():
+    """(Re)writes both store files from the pipeline CSVs."""
+    write_store(clean_yield_frame(pd.read_csv(YIELD_CSV_PATH)), YIELD_STORE_PATH)
+    write_store(clean_satellite_frame(pd.read_csv(SATELLITE_CSV_PATH)), SATELLITE_STORE_PATH)
+
+
+# --- MEASUREMENT ---
+
+_MEASURE_SNIPPET = """
+import os, time
+import pandas as pd
+from src.utils import data_store as ds
+def rss_kb():
+    with open('/proc/self/statm') as f:  # Linux only
+        return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') // 1024
+before = rss_kb()
+start = time.perf_counter()
+df = {load}
+seconds = time.perf_counter() - start
+print(seconds, rss_kb() - before, int(df.memory_usage(deep=True).sum()))
+"""
+
+
+def measure_load(load_expr):
+    """
+    Runs one load in a fresh interpreter (so caches and earlier allocations don't
+    interfere) and returns (seconds, RSS growth in KB, DataFrame size in bytes).
+    """
+    out = subprocess.run([sys.executable, '-c', _MEASURE_SNIPPET.format(load=load_expr)],
+                         capture_output=True, text=True, check=True).stdout.split()
+    return float(out[0]), int(out[1]), int(out[2])
+
+
+if __name__ == '__main__':
+    build_store()
+    print(f"✅ Columnar store written to '{STORE_DIR}'")
+
+    # What the trainer and web app did before (CSV + string cleanup) vs. now (memory-mapped store)
+    cases = [
+        ('yield', 'csv', 'ds.clean_yield_frame(pd.read_csv(ds.YIELD_CSV_PATH))'),
+        ('yield', 'store', 'ds.read_store(ds.YIELD_STORE_PATH)'),
+        ('satellite', 'csv', 'ds.clean_satellite_frame(pd.read_csv(ds.SATELLITE_CSV_PATH))'),
+        ('satellite', 'store', 'ds.read_store(ds.SATELLITE_STORE_PATH)'),
+    ]
+    print(f"\n{'table':<10} {'source':<8} {'load ms':>9} {'RSS growth KB':>14} {'frame KB':>9}")
+    for table, source, load_expr in cases:
+        seconds, rss_kb, frame_bytes = measure_load(load_expr)
+        print(f"{table:<10} {source:<8} {seconds * 1000:>9.1f} {rss_kb:>14} {frame_bytes / 1024:>9.0f}")
@@ -0,0 +1,139 @@
+# district_index.py
+
+import os
+
+import numpy as np
+import pandas as pd
+from sklearn.neighbors import BallTree
+
+# --- PATHS ---
+DATA_DIR = 'data'
+DISTRICTS_CSV_PATH = os.path.join(DATA_DIR, 'karnataka_districts.csv')
+
+# --- CONFIGURATION ---
+# A point farther than this from every district's reference point is treated as
+# outside the state. The largest districts are ~150 km across.
+MAX_DISTANCE_KM = float(os.getenv("DISTRICT_MATCH_MAX_KM", 100))
+EARTH_RADIUS_KM = 6371.0088
+
+
+def normalize_district(name):
+    """'1. BAGALKOT ' -> 'BAGALKOT', as the app and the stores name districts."""
+    return str(name).split('. ')[-1].strip().upper()
+
+
+def parse_point(lat, lon):
+    """(lat, lon) as floats, or ValueError when they are not valid coordinates."""
+    try:
+        lat, lon = float(lat), float(lon)
+    except (TypeError, ValueError):
+        raise ValueError(f"'lat' and 'lon' must be numbers, got {lat!r} and {lon!r}.")
+    if not (abs(lat) <= 90 and abs(lon) <= 180):  # Also rejects NaN
+        raise ValueError(f"({lat}, {lon}) is not a valid latitude and longitude.")
+    return lat, lon
+
+
+class DistrictIndex:
+    """
+    Maps GPS points to districts. Built once from the districts' reference
+    coordinates (the geocoded points in karnataka_districts.csv), so a point
+    belongs to the district whose reference point is nearest, not the one
+    whose boundary contains it.
+
+    A ball tree on the haversine metric answers a whole batch of points per
+    call:
+
+        index = DistrictIndex.from_csv()
+        districts, km = index.nearest([12.30, 15.85], [76.64, 74.50])
+
+    nearest() gives None for points more than `max_distance_km` from every
+    district. within() lists every district inside a radius.
+    """
+
+    def __init__(self, districts, lats, lons, max_distance_km=MAX_DISTANCE_KM):
+        self.districts = np.asarray(districts, dtype=object)
+        coords = np.column_stack([np.asarray(lats, dtype=np.float64), np.asarray(lons, dtype=np.float64)])
+        if not len(self.districts) or np.isnan(coords).any():
+            raise ValueError("A district index needs at least one district, each with coordinates.")
+        self.coords = coords
+        self.max_distance_km = max_distance_km
+        self.tree = BallTree(np.radians(coords), metric='haversine')
+
+    @classmethod
+    def from_frame(cls, districts_df, **kwargs):
+        """From a frame with District, Latitude and Longitude columns; rows without coordinates are left out."""
+        df = districts_df.dropna(subset=['Latitude', 'Longitude']).drop_duplicates('District')
+        return cls(df['District'].map(normalize_district), df['Latitude'], df['Longitude'], **kwargs)
+
+    @classmethod
+    def from_csv(cls, path=DISTRICTS_CSV_PATH, **kwargs):
+        return cls.from_frame(pd.read_csv(path), **kwargs)
+
+    def __len__(self):
+        return len(self.districts)
+
+    @staticmethod
+    def _points(lats, lons):
+        """(n, 2) array of points in radians, or ValueError for values that are not valid coordinates."""
+        try:
+            lats = np.atleast_1d(np.asarray(lats, dtype=np.float64))
+            lons = np.atleast_1d(np.asarray(lons, dtype=np.float64))
+        except (TypeError, ValueError):
+            raise ValueError("Latitudes and longitudes must be numbers.")
+        if lats.shape != lons.shape or lats.ndim != 1:
+            raise ValueError("Expected as many longitudes as latitudes.")
+        if not (np.all(np.abs(lats) <= 90) and np.all(np.abs(lons) <= 180)):  # Also rejects NaN
+            raise ValueError("Latitudes must be within ±90 and longitudes within ±180.")
+        return np.radians(np.column_stack([lats, lons]))
+
+    def nearest(self, lats, lons):
+        """
+        (districts, distances in km) for each point, as arrays. The district is
+        None where the nearest one is farther than max_distance_km.
+        """
+        points = self._points(lats, lons)
+        if not len(points):
+            return np.empty(0, dtype=object), np.empty(0)
+        distance, idx = self.tree.query(points, k=1)
+        km = distance[:, 0] * EARTH_RADIUS_KM
+        districts = self.districts[idx[:, 0]]
+        districts[km > self.max_distance_km] = None
+        return districts, km
+
+    def within(self, lats, lons, radius_km):
+        """For each point, [(district, km), ...] of every district within radius_km, nearest first."""
+        if not radius_km > 0:
+            raise ValueError("The radius must be a positive number of kilometres.")
+        points = self._points(lats, lons)
+        if not len(points):
+            return []
+        idx, distance = self.tree.query_radius(points, r=radius_km / EARTH_RADIUS_KM,
+                                               return_distance=True, sort_results=True)
+        return [list(zip(self.districts[i].tolist(), (d * EARTH_RADIUS_KM).tolist())) for i, d in zip(idx, distance)]
+
+
+if __name__ == '__main__':
+    import time
+
+    index = DistrictIndex.from_csv()
+    rng = np.random.default_rng(0)
+    n = 100_000
+    lats, lons = rng.uniform(11.5, 18.5, n), rng.uniform(74.0, 78.6, n)  # Karnataka's bounding box
+
+    start = time.perf_counter()
+    districts, km = index.nearest(lats, lons)
+    seconds = time.perf_counter() - start
+
+    # The brute-force alternative: haversine distance from every point to every district
+    lat1, lon1 = np.radians(lats[:, None]), np.radians(lons[:, None])
+    lat2, lon2 = np.radians(index.coords[:, 0]), np.radians(index.coords[:, 1])
+    start = time.perf_counter()
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    brute_km = 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(a)).min(axis=1)
+    brute_seconds = time.perf_counter() - start
+
+    print(f"{len(index)} districts, {n:,} random points in the state's bounding box")
+    print(f"  ball tree:   {seconds * 1e3:8.1f} ms  ({seconds / n * 1e6:.2f} µs per point)")
+    print(f"  brute force: {brute_seconds * 1e3:8.1f} ms")
+    print(f"  max distance difference: {np.abs(km - brute_km).max():.2e} km, "
+          f"{pd.isnull(districts).mean():.1%} of points farther than {index.max_distance_km:g} km")
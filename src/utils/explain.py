@@ -0,0 +1,138 @@
+# explain.py
+
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from src.utils.compact_forest import CompactForest, is_exportable
+
+# --- CONFIGURATION ---
+CACHE_SIZE = int(os.getenv("EXPLAIN_CACHE_SIZE", 4096))  # Explained rows kept, across model versions
+
+# Names shown on the dashboard; the API uses the feature names
+FEATURE_LABELS = {
+    'Year': 'Year (long-term trend)',
+    'ndvi': 'Season mean NDVI',
+    'ndvi_max': 'Peak NDVI',
+    'ndvi_std': 'NDVI variability',
+    'ndvi_count': 'Number of clear satellite readings',
+    'ndvi_peak_day': 'Timing of peak greenness',
+    'ndvi_auc': 'Cumulative greenness (NDVI area)',
+    'ndvi_greenup_slope': 'Green-up rate',
+    'District': 'District',
+    'Crop': 'Crop',
+}
+
+
+class ExplanationUnavailable(ValueError):
+    """Raised for models that tree-path attributions do not support."""
+
+
+class TreeExplainer:
+    """
+    Tree-path attributions for one model version (see
+    CompactForest.contributions). Everything that only depends on the model
+    is worked out here, once: the forest arrays (exported from a scikit-learn
+    forest if the version is served from joblib), the expected value every
+    explanation starts from, and the matrix summing the one-hot District_*
+    and Crop_* columns back into one attribution per input feature.
+    """
+
+    def __init__(self, model_version):
+        model = model_version.model
+        if not isinstance(model, CompactForest):
+            if not is_exportable(model):
+                raise ExplanationUnavailable(
+                    f"Attributions are only available for random forest models, not {type(model).__name__}.")
+            model = CompactForest.from_sklearn(model)
+        self.version = model_version.version
+        self.forest = model
+        self.expected_value = model.expected_value
+
+        encoder = model_version.encoder
+        self.features = list(encoder.numeric_features) + list(encoder.CATEGORICAL_FEATURES)
+        self.grouping = np.zeros((encoder.n_features, len(self.features)))
+        for j, column in enumerate(encoder.columns):
+            group = column if column in encoder.numeric_features else column.split('_', 1)[0]
+            self.grouping[j, self.features.index(group)] = 1.0
+
+    def attributions(self, X):
+        """(n_rows, n_input_features) attributions, computed in a single pass over the forest."""
+        return self.forest.contributions(X) @ self.grouping
+
+
+class ExplanationCache:
+    """
+    Attributions per (model version, encoded input row), least recently used
+    rows evicted first. explain() looks up every row of a batch and computes
+    all the misses in one forest pass. Explainers are built on first use of
+    a version (or ahead of time with warm()) and only the latest few are kept.
+    """
+
+    def __init__(self, size=CACHE_SIZE, max_versions=2):
+        self.size = size
+        self.max_versions = max_versions
+        self._explainers = OrderedDict()
+        self._rows = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def explainer(self, model_version):
+        """The TreeExplainer for a version, or ExplanationUnavailable."""
+        with self._lock:
+            explainer = self._explainers.get(model_version.version)
+            if explainer is not None:
+                self._explainers.move_to_end(model_version.version)
+                return explainer
+        explainer = TreeExplainer(model_version)  # Outside the lock: exporting a joblib forest takes a while
+        with self._lock:
+            self._explainers[model_version.version] = explainer
+            while len(self._explainers) > self.max_versions:
+                self._explainers.popitem(last=False)
+        return explainer
+
+    def warm(self, model_version):
+        """Builds the version's explainer now, so the first request doesn't; returns False if unsupported."""
+        try:
+            self.explainer(model_version)
+            return True
+        except ExplanationUnavailable:
+            return False
+
+    def explain(self, model_version, X):
+        """
+        (explainer, (n_rows, n_input_features) attributions) for the rows of
+        the encoded matrix X. Raises ExplanationUnavailable for unsupported models.
+        """
+        explainer = self.explainer(model_version)
+        X = np.ascontiguousarray(X, dtype=np.float64)
+        keys = [(explainer.version, row.tobytes()) for row in X]
+        out = np.empty((len(X), len(explainer.features)))
+        missing = []
+        with self._lock:
+            for i, key in enumerate(keys):
+                cached = self._rows.get(key)
+                if cached is None:
+                    missing.append(i)
+                else:
+                    self._rows.move_to_end(key)
+                    out[i] = cached
+            self.hits += len(X) - len(missing)
+            self.misses += len(missing)
+        if missing:
+            computed = explainer.attributions(X[missing])
+            out[missing] = computed
+            with self._lock:
+                for i, values in zip(missing, computed):
+                    self._rows[keys[i]] = values
+                while len(self._rows) > self.size:
+                    self._rows.popitem(last=False)
+        return explainer, out
+
+    def stats(self):
+        with self._lock:
+            return {'rows': len(self._rows), 'size': self.size, 'hits': self.hits, 'misses': self.misses,
+                    'versions': list(self._explainers)}
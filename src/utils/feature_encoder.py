@@ -0,0 +1,128 @@
+# feature_encoder.py
+
+import joblib
+import numpy as np
+
+
+class UnknownCategoryError(ValueError):
+    """Raised when a District or Crop was not seen while fitting the encoder."""
+
+
+class YieldFeatureEncoder:
+    """
+    One-hot encoder for the yield model's numeric, District and Crop features.
+
+    Produces exactly the columns of
+    `pd.get_dummies(df[numeric_features + ['District', 'Crop']], columns=['District', 'Crop'], drop_first=True)`:
+    the numeric columns first, then one column per category in sorted order, with
+    the first category of each group dropped (it is encoded as all zeros).
+    The numeric features default to ['Year', 'ndvi'], the original model inputs.
+
+    After fitting, each category maps straight to its column index, so encoding a
+    request is a few array writes into a preallocated NumPy row with no pandas
+    involved. Unknown categories raise UnknownCategoryError instead of silently
+    becoming an all-zero (i.e. baseline) vector.
+    """
+
+    NUMERIC_FEATURES = ['Year', 'ndvi']
+    CATEGORICAL_FEATURES = ['District', 'Crop']
+
+    def __init__(self, drop_first=True, numeric_features=None):
+        self.drop_first = drop_first
+        self.numeric_features = list(numeric_features or self.NUMERIC_FEATURES)
+        self.categories = {}
+        self.columns = []
+        self._index = {}
+
+    def fit(self, df):
+        """Learns the categories from a DataFrame holding the feature columns."""
+        categories = {col: sorted(df[col].dropna().astype(str).unique().tolist())
+                      for col in self.CATEGORICAL_FEATURES}
+        return self._build(categories)
+
+    def _build(self, categories):
+        self.categories = categories
+        self.columns = list(self.numeric_features)
+        self._index = {}
+        for col in self.CATEGORICAL_FEATURES:
+            lookup = {}
+            for j, category in enumerate(categories[col]):
+                if self.drop_first and j == 0:
+                    lookup[category] = None  # Baseline category: all zeros
+                else:
+                    lookup[category] = len(self.columns)
+                    self.columns.append(f"{col}_{category}")
+            self._index[col] = lookup
+        return self
+
+    @property
+    def n_features(self):
+        return len(self.columns)
+
+    def _column_index(self, col, value):
+        try:
+            return self._index[col][value]
+        except KeyError:
+            raise UnknownCategoryError(f"Unknown {col} '{value}': it was not in the model's training data.") from None
+
+    def check(self, district, crop):
+        """Raises UnknownCategoryError if either category was not seen during fitting."""
+        self._column_index('District', district)
+        self._column_index('Crop', crop)
+
+    def transform_row(self, numeric, district, crop, out=None):
+        """
+        Encodes one input into `out` (a zeroed row of length n_features), or a new
+        array. `numeric` maps each numeric feature name to its value.
+        """
+        if out is None:
+            out = np.zeros(self.n_features)
+        district_idx = self._column_index('District', district)
+        crop_idx = self._column_index('Crop', crop)
+        for j, name in enumerate(self.numeric_features):
+            out[j] = numeric[name]
+        if district_idx is not None:
+            out[district_idx] = 1.0
+        if crop_idx is not None:
+            out[crop_idx] = 1.0
+        return out
+
+    def transform(self, numeric, districts, crops):
+        """
+        Encodes equal-length columns into an (n, n_features) matrix. `numeric`
+        maps each numeric feature name to a sequence (a DataFrame works too).
+        """
+        n = len(districts)
+        X = np.zeros((n, self.n_features))
+        for j, name in enumerate(self.numeric_features):
+            X[:, j] = numeric[name]
+        for col, values in (('District', districts), ('Crop', crops)):
+            # -1 marks the dropped baseline category, which stays all zeros
+            idx = np.array([self._column_index(col, v) for v in values], dtype=object)
+            idx = np.where(idx == None, -1, idx).astype(np.intp)  # noqa: E711
+            hot = idx >= 0
+            X[np.flatnonzero(hot), idx[hot]] = 1.0
+        return X
+
+    def transform_df(self, df):
+        """Encodes a DataFrame with the numeric feature, District and Crop columns."""
+        return self.transform({name: df[name].to_numpy() for name in self.numeric_features},
+                              df['District'].astype(str).to_numpy(), df['Crop'].astype(str).to_numpy())
+
+    def fit_transform(self, df):
+        return self.fit(df).transform_df(df)
+
+    # --- PERSISTENCE ---
+    # Saved as plain data rather than a pickled instance so the artifact keeps
+    # loading if this class is refactored.
+
+    def save(self, path):
+        joblib.dump({'drop_first': self.drop_first, 'numeric_features': self.numeric_features,
+                     'categories': self.categories}, path)
+
+    @classmethod
+    def load(cls, path):
+        state = joblib.load(path)
+        # Encoders saved before numeric_features was stored use the defaults
+        return cls(drop_first=state['drop_first'],
+                   numeric_features=state.get('numeric_features'))._build(state['categories'])
@@ -1,72 +1,253 @@
-# fetch_satellite_data_all.py (Updated for 10-year range)
+# fetch_satellite_data_all.py (Concurrent, resumable 10-year fetch)
 
+import numpy as np
 import pandas as pd
 import os
 import time
+import json
+import random
+import threading
+from urllib.parse import quote
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
-# This assumes your original function is in the file below.
-from src.utils.satellite_data import get_ndvi_for_location
+from src.utils.ndvi_providers import get_provider, LocalFileProvider
+from src.utils.data_store import clean_satellite_frame, write_store, SATELLITE_STORE_PATH
+from src.utils.ndvi_anomaly import CLIMATOLOGY_PATH, extend_climatology, source_fingerprint
 
 # --- PATHS ---
 DATA_DIR = 'data'
 DISTRICTS_CSV_PATH = os.path.join(DATA_DIR, 'karnataka_districts.csv')
 OUTPUT_CSV_PATH = os.path.join(DATA_DIR, 'satellite_data_all_districts.csv')
+CHECKPOINT_PATH = os.path.join(DATA_DIR, 'satellite_fetch_checkpoint.jsonl')
+PARTS_DIR = os.path.join(DATA_DIR, 'satellite_fetch_parts')  # One CSV per fetched unit
 
-# --- CONFIGURATION (THE ONLY CHANGE IS HERE) ---
+# --- CONFIGURATION ---
 # Fetch data for the entire 2010-2020 period
 START_DATE = '2010-01-01'
 END_DATE = '2020-12-31'
 
+MAX_WORKERS = 4             # Concurrent Earth Engine requests
+REQUESTS_PER_SECOND = 2.0   # Sustained request rate across all workers
+BURST = 4                   # Requests allowed back-to-back before throttling
+MAX_RETRIES = 4
+BACKOFF_BASE_SECONDS = 2.0
 
-def run_batch_fetch():
+
+class TokenBucket:
+    """Thread-safe token bucket: `rate` tokens per second, holding at most `capacity`."""
+
+    def __init__(self, rate, capacity, clock=time.monotonic, sleep=time.sleep):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.clock = clock
+        self.sleep = sleep
+        self.updated = clock()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Blocks until a token is available, then consumes it."""
+        while True:
+            with self._lock:
+                now = self.clock()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            self.sleep(wait)
+
+
+def build_work_units(districts_df, start_date=START_DATE, end_date=END_DATE):
     """
-    Loops through districts and fetches satellite data for each one.
+    Splits the fetch into (district, year) units so a failure only costs one
+    year of one district. Each unit is a dict with a stable 'unit_id'.
     """
+    start, end = pd.Timestamp(start_date), pd.Timestamp(end_date)
+    units = []
+    for district, lat, lon in zip(districts_df['District'], districts_df['Latitude'], districts_df['Longitude']):
+        district_name = str(district).split('. ')[-1].strip()
+        for year in range(start.year, end.year + 1):
+            chunk_start = max(start, pd.Timestamp(year=year, month=1, day=1))
+            chunk_end = min(end, pd.Timestamp(year=year + 1, month=1, day=1))
+            if chunk_start >= chunk_end:
+                continue
+            units.append({
+                'unit_id': f"{district_name}|{chunk_start:%Y-%m-%d}|{chunk_end:%Y-%m-%d}",
+                'District': district_name,
+                'lat': lat,
+                'lon': lon,
+                'start': chunk_start.strftime('%Y-%m-%d'),
+                'end': chunk_end.strftime('%Y-%m-%d'),
+            })
+    return units
+
+
+def load_checkpoint(path=CHECKPOINT_PATH):
+    """Returns the set of unit ids already written to the output."""
+    if not os.path.exists(path):
+        return set()
+    done = set()
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                done.add(json.loads(line)['unit_id'])
+    return done
+
+
+def part_path(unit, parts_dir=PARTS_DIR):
+    return os.path.join(parts_dir, quote(unit['unit_id'], safe='') + '.csv')
+
+
+def write_part(unit, ndvi_data, parts_dir=PARTS_DIR):
+    """Writes one unit's records to its own part file, atomically: a rerun overwrites it, never appends."""
+    os.makedirs(parts_dir, exist_ok=True)
+    path = part_path(unit, parts_dir)
+    tmp_path = path + '.tmp'
+    out = ndvi_data.assign(District=unit['District'])[['date', 'ndvi', 'District']]
+    out.to_csv(tmp_path, index=False, date_format='%Y-%m-%d')
+    os.replace(tmp_path, path)
+
+
+def finalize_output(units, output_path, parts_dir=PARTS_DIR):
+    """
+    Combines the units' part files into the output CSV, one row per (District,
+    date), and swaps it in with os.replace: the previous output is only replaced
+    by a complete one. Returns the combined frame.
+    """
+    frames = [pd.read_csv(part_path(u, parts_dir)) for u in units]
+    combined = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=['date', 'ndvi', 'District'])
+    combined = (combined.drop_duplicates(['District', 'date'], keep='last')
+                .sort_values(['District', 'date'], ignore_index=True))
+    tmp_path = os.path.join(os.path.dirname(output_path) or '.', f".{os.path.basename(output_path)}.tmp")
+    combined.to_csv(tmp_path, index=False)
+    os.replace(tmp_path, output_path)
+    return combined
+
+
+def new_rows(previous, combined):
+    """(rows of `combined` whose (District, date) `previous` lacks, whether any previous row changed or went away)."""
+    if previous is None or previous.empty:
+        return combined, False
+    keys = ['District', 'date']
+    merged = previous.astype({'date': str}).merge(combined.astype({'date': str}), on=keys, how='outer',
+                                                  suffixes=('_old', ''), indicator=True)
+    kept = merged[merged['_merge'] == 'both']
+    changed = (previous.duplicated(keys).any() or (merged['_merge'] == 'left_only').any()
+               or not np.allclose(kept['ndvi_old'], kept['ndvi'], equal_nan=True))
+    return merged.loc[merged['_merge'] == 'right_only', ['date', 'ndvi', 'District']], bool(changed)
+
+
+def fetch_with_retry(unit, fetch_fn, limiter, max_retries=MAX_RETRIES,
+                     backoff_base=BACKOFF_BASE_SECONDS, sleep=time.sleep):
+    """Fetches one unit, retrying with exponential backoff and jitter."""
+    for attempt in range(max_retries + 1):
+        limiter.acquire()
+        try:
+            return fetch_fn(unit['lat'], unit['lon'], unit['start'], unit['end'])
+        except Exception:
+            if attempt == max_retries:
+                raise
+            sleep(backoff_base * (2 ** attempt) * (1 + random.random() * 0.25))
+
+
+def run_batch_fetch(fetch_fn=None,
+                    districts_path=DISTRICTS_CSV_PATH,
+                    output_path=OUTPUT_CSV_PATH,
+                    checkpoint_path=CHECKPOINT_PATH,
+                    start_date=START_DATE, end_date=END_DATE,
+                    max_workers=MAX_WORKERS,
+                    limiter=None,
+                    max_retries=MAX_RETRIES,
+                    backoff_base=BACKOFF_BASE_SECONDS,
+                    store_path=SATELLITE_STORE_PATH,
+                    parts_dir=PARTS_DIR,
+                    climatology_path=CLIMATOLOGY_PATH):
+    """
+    Fetches satellite data for every district concurrently and resumably.
+
+    Each completed (district, year) unit is written to its own part file under
+    `parts_dir` and then recorded in the checkpoint file, so a rerun skips
+    finished units (a unit interrupted between the two is simply fetched
+    again). Delete the checkpoint file to force a fresh fetch. The output CSV
+    is left alone until every unit has succeeded; only then are the parts
+    combined, deduplicated on (District, date) and swapped in. `fetch_fn`
+    defaults to the provider selected by NDVI_PROVIDER; any callable with the
+    signature of get_ndvi_for_location (e.g. a stub) works for offline runs.
+    The finished output is also written to the columnar store at `store_path`,
+    and the rows it didn't have before are merged into the NDVI climatology at
+    `climatology_path` (pass None to skip either). Returns a dict summarising
+    the run.
+    """
+    fetch_fn = fetch_fn or get_provider()
+    if isinstance(fetch_fn, LocalFileProvider) and os.path.abspath(fetch_fn.path) == os.path.abspath(output_path):
+        raise ValueError("The local NDVI provider cannot read from the file this fetch is writing to.")
+
     try:
-        districts_df = pd.read_csv(DISTRICTS_CSV_PATH)
+        districts_df = pd.read_csv(districts_path)
     except FileNotFoundError:
-        print(f"❌ Error: Could not find '{DISTRICTS_CSV_PATH}'.")
-        return
-
-    all_ndvi_data = []
-    print(f"--- Starting 10-YEAR satellite data fetch for {len(districts_df)} districts ---")
-    print(f"--- Period: {START_DATE} to {END_DATE} ---")
-
-    # Loop through each district from the CSV
-    for index, row in districts_df.iterrows():
-        district_name = str(row['District']).split('. ')[-1].strip()
-        lat = row['Latitude']
-        lon = row['Longitude']
-        
-        print(f"\nFetching data for: {district_name} ({lat:.4f}, {lon:.4f})")
-        
-        try:
-            # Call your existing function to get NDVI data
-            ndvi_data = get_ndvi_for_location(lat, lon, START_DATE, END_DATE)
-            
-            if ndvi_data:
-                # Add the district name to each result
-                for record in ndvi_data:
-                    record['District'] = district_name
-                
-                all_ndvi_data.extend(ndvi_data)
-                print(f"  ✅ Found {len(ndvi_data)} records.")
-            else:
-                print("  ⚠️ No data found for this district.")
-                
-        except Exception as e:
-            print(f"  ❌ An error occurred for {district_name}: {e}")
-        
-        time.sleep(1)
-
-    if all_ndvi_data:
-        final_df = pd.DataFrame(all_ndvi_data)
-        final_df.to_csv(OUTPUT_CSV_PATH, index=False)
-        print(f"\n\n✅✅✅ Success! All satellite data saved to '{OUTPUT_CSV_PATH}'")
-        print(f"Total records fetched: {len(final_df)}")
+        print(f"❌ Error: Could not find '{districts_path}'.")
+        return None
+
+    units = build_work_units(districts_df, start_date, end_date)
+    done = load_checkpoint(checkpoint_path)
+    # A unit only counts as done if its part is still there to be combined
+    pending = [u for u in units if u['unit_id'] not in done or not os.path.exists(part_path(u, parts_dir))]
+    limiter = limiter or TokenBucket(REQUESTS_PER_SECOND, BURST)
+
+    print(f"--- Starting satellite data fetch for {len(districts_df)} districts ---")
+    print(f"--- Period: {start_date} to {end_date} | {len(pending)} of {len(units)} units pending ---")
+
+    write_lock = threading.Lock()
+    summary = {'units': len(units), 'skipped': len(units) - len(pending),
+               'completed': 0, 'failed': 0, 'records': 0}
+
+    def record_unit(unit, ndvi_data):
+        write_part(unit, ndvi_data, parts_dir)
+        with write_lock:
+            with open(checkpoint_path, 'a') as f:
+                f.write(json.dumps({'unit_id': unit['unit_id'], 'records': len(ndvi_data)}) + '\n')
+            summary['completed'] += 1
+            summary['records'] += len(ndvi_data)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = {
+            pool.submit(fetch_with_retry, unit, fetch_fn, limiter, max_retries, backoff_base): unit
+            for unit in pending
+        }
+        for future in as_completed(futures):
+            unit = futures[future]
+            try:
+                ndvi_data = future.result()
+            except Exception as e:
+                summary['failed'] += 1
+                print(f"  ❌ {unit['District']} {unit['start']}..{unit['end']} failed: {e}")
+                continue
+            record_unit(unit, ndvi_data)
+            print(f"  ✅ {unit['District']} {unit['start']}..{unit['end']}: {len(ndvi_data)} records.")
+
+    if summary['failed']:
+        print(f"\n⚠️ {summary['failed']} units failed. Rerun to resume from the checkpoint.")
+        print(f"'{output_path}' was left unchanged.")
     else:
-        print("\n\n❌ No satellite data was fetched for any district.")
+        previous, previous_fingerprint = None, None
+        if os.path.exists(output_path):
+            previous_fingerprint = source_fingerprint(output_path)
+            previous = pd.read_csv(output_path)
+        combined = finalize_output(units, output_path, parts_dir)
+        print(f"\n\n✅✅✅ Success! All satellite data ({len(combined)} records) saved to '{output_path}'")
+        if store_path:
+            write_store(clean_satellite_frame(combined), store_path)
+            print(f"✅ Columnar copy saved to '{store_path}'")
+        if climatology_path:
+            added, changed = new_rows(previous, combined)
+            # Rows that changed or disappeared can't be merged in; extend_climatology rebuilds then
+            extend_climatology(added, None if changed else previous_fingerprint, output_path, climatology_path)
+    print(f"Records fetched this run: {summary['records']}")
+    return summary
 
 
 if __name__ == "__main__":
-    run_batch_fetch()
\ No newline at end of file
+    run_batch_fetch()
@@ -0,0 +1,175 @@
+# fetch_weather_data_all.py (Concurrent, incremental daily weather ingest)
+
+import argparse
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import partial
+
+import pandas as pd
+import pyarrow.parquet as pq
+
+from src.utils.data_store import WEATHER_STORE_PATH, weather_partition_path, write_store, load_weather_data
+from src.utils.fetch_satellite_data_all import TokenBucket, build_work_units, fetch_with_retry
+from src.utils.weather_data import WEATHER_API_URL, WEATHER_PATH, make_session, get_weather_range
+
+# --- PATHS ---
+DATA_DIR = 'data'
+DISTRICTS_CSV_PATH = os.path.join(DATA_DIR, 'karnataka_districts.csv')
+
+# --- CONFIGURATION ---
+# Same period as the satellite data
+START_DATE = '2010-01-01'
+END_DATE = '2020-12-31'
+
+# One request covers a district-year, so the whole state is ~350 requests.
+# The defaults stay well inside Open-Meteo's free limit of 600 calls a minute.
+MAX_WORKERS = int(os.getenv("WEATHER_FETCH_WORKERS", 8))
+REQUESTS_PER_SECOND = float(os.getenv("WEATHER_REQUESTS_PER_SECOND", 5))
+BURST = 10
+MAX_RETRIES = 4
+BACKOFF_BASE_SECONDS = 1.0
+
+# A day counts as stored once it has a temperature; days the archive had no
+# data for yet (e.g. the last few days) are fetched again on the next run.
+REQUIRED_COLUMN = 'temperature'
+
+
+def stored_dates(path):
+    """Dates already stored (with a value) in one partition file."""
+    if not os.path.exists(path):
+        return set()
+    df = pq.read_table(path, columns=['date', REQUIRED_COLUMN]).to_pandas()
+    return set(df.loc[df[REQUIRED_COLUMN].notna(), 'date'])
+
+
+def plan_units(units, store_path=WEATHER_STORE_PATH):
+    """
+    Narrows each (district, year) unit to the span of days its partition is
+    missing, dropping units that are already complete. Each returned unit
+    carries its partition 'path', 'Year' and the 'stored' dates.
+    """
+    pending = []
+    for unit in units:
+        year = pd.Timestamp(unit['start']).year
+        path = weather_partition_path(unit['District'].upper(), year, store_path)
+        stored = stored_dates(path)
+        missing = [d for d in pd.date_range(unit['start'], unit['end'], inclusive='left') if d not in stored]
+        if not missing:
+            continue
+        pending.append({**unit, 'path': path, 'Year': year, 'stored': stored,
+                        'start': missing[0].strftime('%Y-%m-%d'),
+                        'end': (missing[-1] + pd.Timedelta(days=1)).strftime('%Y-%m-%d')})
+    return pending
+
+
+def merge_partition(unit, fetched):
+    """
+    Writes the unit's partition: stored rows plus fetched rows for dates not
+    stored yet, one row per date. Returns the number of new days with data.
+    """
+    fetched = fetched.drop_duplicates('date', keep='last')
+    fetched = fetched[~fetched['date'].isin(unit['stored'])]
+    if os.path.exists(unit['path']):
+        existing = pq.read_table(unit['path']).to_pandas()
+        # A stored day without values is replaced if the fetch returned it again
+        existing = existing[~existing['date'].isin(fetched['date'])]
+        fetched = pd.concat([existing, fetched], ignore_index=True)
+    out = fetched.assign(lat=float(unit['lat']), lon=float(unit['lon']))
+    out = out[['date', 'lat', 'lon', *[c for c in fetched.columns if c not in ('date', 'lat', 'lon')]]]
+    write_store(out, unit['path'], sort_by=['date'])
+    return int(out[REQUIRED_COLUMN].notna().sum()) - len(unit['stored'])
+
+
+def run_weather_fetch(fetch_fn=None,
+                      districts_path=DISTRICTS_CSV_PATH,
+                      store_path=WEATHER_STORE_PATH,
+                      start_date=START_DATE, end_date=END_DATE,
+                      max_workers=MAX_WORKERS,
+                      limiter=None,
+                      max_retries=MAX_RETRIES,
+                      backoff_base=BACKOFF_BASE_SECONDS,
+                      base_url=WEATHER_API_URL):
+    """
+    Fetches daily weather for every district concurrently and incrementally.
+
+    The work is split into (district, year) units, each fetched with one
+    request over a pooled HTTP session and written to its own partition of
+    the weather store as soon as it arrives. Before fetching, every unit is
+    checked against its partition: complete district-years are skipped and
+    partial ones only fetch the days they are missing, so a rerun (or an
+    interrupted run) costs nothing for what is already stored. `fetch_fn`
+    defaults to the archive API at `base_url`; any callable with the
+    signature of get_weather_range(lat, lon, start, end) works offline.
+    Returns a dict summarising the run.
+    """
+    try:
+        districts_df = pd.read_csv(districts_path)
+    except FileNotFoundError:
+        print(f"❌ Error: Could not find '{districts_path}'.")
+        return None
+
+    units = build_work_units(districts_df, start_date, pd.Timestamp(end_date) + pd.Timedelta(days=1))
+    pending = plan_units(units, store_path)
+    limiter = limiter or TokenBucket(REQUESTS_PER_SECOND, BURST)
+    session = None
+    if fetch_fn is None:
+        session = make_session(pool_size=max_workers)
+        fetch_fn = partial(get_weather_range, session=session, base_url=base_url)
+
+    print(f"--- Starting weather fetch for {len(districts_df)} districts ---")
+    print(f"--- Period: {start_date} to {end_date} | {len(pending)} of {len(units)} district-years pending ---")
+
+    summary = {'units': len(units), 'skipped': len(units) - len(pending),
+               'completed': 0, 'failed': 0, 'records': 0}
+    start = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            futures = {
+                pool.submit(fetch_with_retry, unit, fetch_fn, limiter, max_retries, backoff_base): unit
+                for unit in pending
+            }
+            for future in as_completed(futures):
+                unit = futures[future]
+                try:
+                    added = merge_partition(unit, future.result())
+                except Exception as e:
+                    summary['failed'] += 1
+                    print(f"  ❌ {unit['District']} {unit['start']}..{unit['end']} failed: {e}")
+                    continue
+                summary['completed'] += 1
+                summary['records'] += added
+                print(f"  ✅ {unit['District']} {unit['start']}..{unit['end']}: {added} new days.")
+    finally:
+        if session is not None:
+            session.close()
+
+    summary['seconds'] = round(time.perf_counter() - start, 2)
+    if summary['failed']:
+        print(f"\n⚠️ {summary['failed']} district-years failed. Rerun to fetch only what is missing.")
+    else:
+        print(f"\n✅ Weather store up to date in '{store_path}'")
+    print(f"New days stored this run: {summary['records']} ({summary['seconds']}s)")
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fetch daily weather for every district into the weather store.")
+    parser.add_argument('--start', default=START_DATE)
+    parser.add_argument('--end', default=END_DATE, help="Last day to fetch (inclusive)")
+    parser.add_argument('--workers', type=int, default=MAX_WORKERS)
+    parser.add_argument('--rps', type=float, default=REQUESTS_PER_SECOND, help="Requests per second across all workers")
+    parser.add_argument('--base-url', default=WEATHER_API_URL, help="Archive API URL (e.g. a local mock server)")
+    parser.add_argument('--export-csv', action='store_true', help=f"Also write the whole store to {WEATHER_PATH}")
+    args = parser.parse_args(argv)
+
+    summary = run_weather_fetch(start_date=args.start, end_date=args.end, max_workers=args.workers,
+                                limiter=TokenBucket(args.rps, BURST), base_url=args.base_url)
+    if summary and args.export_csv and os.path.exists(WEATHER_STORE_PATH):
+        weather_df = load_weather_data().sort_values(['District', 'date'])
+        weather_df.to_csv(WEATHER_PATH, index=False, date_format='%Y-%m-%d')
+        print(f"✅ {len(weather_df)} weather records exported to '{WEATHER_PATH}'")
+
+
+if __name__ == "__main__":
+    main()
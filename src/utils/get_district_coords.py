@@ -4,7 +4,7 @@ import pandas as pd
 from geopy.geocoders import Nominatim
 from geopy.extra.rate_limiter import RateLimiter
 import os
-import time
+import json
 
 print("--- Starting District Geocoding ---")
 
@@ -12,6 +12,24 @@ print("--- Starting District Geocoding ---")
 DATA_DIR = 'data'
 YIELD_DATA_PATH = os.path.join(DATA_DIR, 'yield_data_tidy.csv')
 DISTRICTS_CSV_PATH = os.path.join(DATA_DIR, 'karnataka_districts.csv')
+# Every answer Nominatim has given, keyed by query ([lat, lon], or null when it found nothing),
+# so a rerun only geocodes districts it hasn't seen. Delete an entry to look it up again.
+GEOCODE_CACHE_PATH = os.path.join(DATA_DIR, 'geocode_cache.json')
+
+
+def load_geocode_cache(path=GEOCODE_CACHE_PATH):
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_geocode_cache(cache, path=GEOCODE_CACHE_PATH):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(cache, f, indent=1, sort_keys=True)
+    os.replace(tmp_path, path)  # An interrupted run never leaves a truncated cache
+
 
 try:
     # 1. Load the tidy yield data
@@ -25,29 +43,35 @@ try:
     unique_districts = sorted(yield_df['District'].unique())
     print(f"Found {len(unique_districts)} unique, clean districts.")
 
-    # 3. Geocode each district
-    geolocator = Nominatim(user_agent="karnataka-crop-yield-app")
-    geocode = RateLimiter(geolocator.geocode, min_delay_seconds=1)
-    
-    locations = []
-    print("\nFetching coordinates for each district (this may take a minute or two)...")
-    for district in unique_districts:
-        query = f"{district}, Karnataka, India"
+    # 3. Geocode each district not already in the cache
+    cache = load_geocode_cache()
+    queries = {district: f"{district}, Karnataka, India" for district in unique_districts}
+    to_fetch = [d for d in unique_districts if queries[d] not in cache]
+    print(f"{len(unique_districts) - len(to_fetch)} districts cached, {len(to_fetch)} to geocode.")
+
+    if to_fetch:
+        geolocator = Nominatim(user_agent="karnataka-crop-yield-app")
+        # Raise (rather than return None) on errors, so an outage isn't cached as 'not found'
+        geocode = RateLimiter(geolocator.geocode, min_delay_seconds=1, swallow_exceptions=False)
+        print("\nFetching coordinates for each district (this may take a minute or two)...")
+    for district in to_fetch:
         try:
-            location = geocode(query)
-            if location:
-                locations.append({
-                    'District': district,
-                    'Latitude': location.latitude,
-                    'Longitude': location.longitude
-                })
-                print(f"  ✅ Found: {district} -> ({location.latitude:.4f}, {location.longitude:.4f})")
-            else:
-                locations.append({ 'District': district, 'Latitude': None, 'Longitude': None })
-                print(f"  ❌ Not Found: {district}")
+            location = geocode(queries[district])
         except Exception as e:
+            # Not cached, so the next run tries again
             print(f"  An error occurred for {district}: {e}")
-            locations.append({ 'District': district, 'Latitude': None, 'Longitude': None })
+            continue
+        cache[queries[district]] = [location.latitude, location.longitude] if location else None
+        save_geocode_cache(cache)
+        if location:
+            print(f"  ✅ Found: {district} -> ({location.latitude:.4f}, {location.longitude:.4f})")
+        else:
+            print(f"  ❌ Not Found: {district}")
+
+    locations = []
+    for district in unique_districts:
+        lat, lon = cache.get(queries[district]) or (None, None)
+        locations.append({'District': district, 'Latitude': lat, 'Longitude': lon})
 
     # 4. Save to a new CSV file
     districts_df = pd.DataFrame(locations)
@@ -0,0 +1,260 @@
+# metrics.py
+
+import bisect
+import contextvars
+import cProfile
+import io
+import math
+import os
+import pstats
+import threading
+import time
+from contextlib import contextmanager
+
+# --- CONFIGURATION ---
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") == "1"
+# Lets a request ask for its own timings (?profile=1) or a cProfile report
+# (?profile=cprofile). Off by default: anyone who can reach the app could use it.
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "0") == "1"
+QUANTILE_WINDOW = int(os.getenv("METRICS_QUANTILE_WINDOW", 2048))  # Recent observations per series
+
+NAMESPACE = 'agrisense'
+BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+           0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+QUANTILES = (0.5, 0.95, 0.99)
+
+# Spans of the request being profiled (None when it isn't), and the label that
+# separates request work from background work such as grid refreshes
+_trace = contextvars.ContextVar('metrics_trace', default=None)
+_source = contextvars.ContextVar('metrics_source', default='request')
+
+
+class LatencyHistogram:
+    """
+    Cumulative bucket counts, sum and count of a latency series (the
+    Prometheus histogram model), plus a ring buffer of the latest
+    `window` observations for exact recent p50/p95/p99.
+    """
+
+    def __init__(self, buckets=BUCKETS, window=QUANTILE_WINDOW):
+        self.bounds = buckets
+        self.counts = [0] * (len(buckets) + 1)  # Last one is +Inf
+        self.sum = 0.0
+        self.count = 0
+        self._recent = [0.0] * window
+        self._lock = threading.Lock()
+
+    def observe(self, seconds):
+        i = bisect.bisect_left(self.bounds, seconds)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += seconds
+            self._recent[self.count % len(self._recent)] = seconds
+            self.count += 1
+
+    def snapshot(self):
+        """(cumulative bucket counts, sum, count, recent observations), read consistently."""
+        with self._lock:
+            counts, total, count = list(self.counts), self.sum, self.count
+            recent = self._recent[:min(count, len(self._recent))]
+        cumulative, running = [], 0
+        for c in counts:
+            running += c
+            cumulative.append(running)
+        return cumulative, total, count, recent
+
+
+def quantiles(samples, qs=QUANTILES):
+    """Linear-interpolated quantiles of a list (NaN when empty), like numpy's default."""
+    if not samples:
+        return [math.nan] * len(qs)
+    ordered = sorted(samples)
+    out = []
+    for q in qs:
+        pos = q * (len(ordered) - 1)
+        lo = int(pos)
+        hi = min(lo + 1, len(ordered) - 1)
+        out.append(ordered[lo] + (ordered[hi] - ordered[lo]) * (pos - lo))
+    return out
+
+
+class _Span:
+    __slots__ = ('metrics', 'stage', 'start')
+
+    def __init__(self, metrics, stage):
+        self.metrics = metrics
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.metrics.observe(self.stage, time.perf_counter() - self.start)
+        return False
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+NULL_SPAN = _NullSpan()
+
+
+class Metrics:
+    """
+    Per-stage latency histograms for the prediction path, exported in the
+    Prometheus text format.
+
+        with metrics.span('predict'):
+            model.predict(X)
+
+    Series are keyed by (stage, source): source is 'request' unless the code
+    runs inside `with metrics.source('grid')`, so background work does not
+    blur request latencies. While a request is traced (start_trace()), its
+    spans are also collected for the Server-Timing header. With
+    enabled=False, span() returns a shared no-op context manager outside
+    traced requests.
+    """
+
+    def __init__(self, enabled=METRICS_ENABLED):
+        self.enabled = enabled
+        self._series = {}
+        self._lock = threading.Lock()
+        self._collectors = []
+        self._traces = 0  # Requests being traced right now, so span() can skip the ContextVar lookup
+
+    def _histogram(self, key):
+        histogram = self._series.get(key)
+        if histogram is None:
+            with self._lock:
+                histogram = self._series.setdefault(key, LatencyHistogram())
+        return histogram
+
+    def observe(self, stage, seconds):
+        if self.enabled:
+            self._histogram((stage, _source.get())).observe(seconds)
+        spans = _trace.get()
+        if spans is not None:
+            spans.append((stage, seconds))
+
+    def span(self, stage):
+        # A traced request is timed even with the histograms disabled
+        if self.enabled or (self._traces and _trace.get() is not None):
+            return _Span(self, stage)
+        return NULL_SPAN
+
+    @contextmanager
+    def source(self, name):
+        token = _source.set(name)
+        try:
+            yield
+        finally:
+            _source.reset(token)
+
+    # --- PER-REQUEST TRACES ---
+
+    def start_trace(self):
+        """Starts collecting this request's spans. Returns a token for end_trace()."""
+        with self._lock:
+            self._traces += 1
+        return _trace.set([])
+
+    def end_trace(self, token):
+        """Stops collecting and returns the [(stage, seconds)] recorded since start_trace()."""
+        spans = _trace.get()
+        _trace.reset(token)
+        with self._lock:
+            self._traces -= 1
+        return spans or []
+
+    # --- EXPORT ---
+
+    def add_collector(self, fn):
+        """Registers fn() -> list of Prometheus text lines, rendered after the histograms on each scrape."""
+        self._collectors.append(fn)
+
+    def _sorted_series(self):
+        # Copied under the lock: observe() may add a series while a scrape iterates
+        with self._lock:
+            return sorted(self._series.items())
+
+    def summary(self):
+        """{(stage, source): {'count', 'sum', 'p50', 'p95', 'p99'}} over the recent window."""
+        out = {}
+        for key, histogram in self._sorted_series():
+            _, total, count, recent = histogram.snapshot()
+            p = quantiles(recent)
+            out[key] = {'count': count, 'sum': total, 'p50': p[0], 'p95': p[1], 'p99': p[2]}
+        return out
+
+    def render_prometheus(self):
+        name = f"{NAMESPACE}_stage_seconds"
+        lines = [f"# HELP {name} Time spent in each stage of the prediction path.",
+                 f"# TYPE {name} histogram"]
+        summary_lines = [f"# HELP {name}_recent Quantiles over the last {QUANTILE_WINDOW} observations of each stage.",
+                         f"# TYPE {name}_recent summary"]
+        for (stage, source), histogram in self._sorted_series():
+            labels = f'stage="{stage}",source="{source}"'
+            cumulative, total, count, recent = histogram.snapshot()
+            for bound, c in zip(self.bounds_labels(), cumulative):
+                lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {c}')
+            lines.append(f"{name}_sum{{{labels}}} {total!r}")
+            lines.append(f"{name}_count{{{labels}}} {count}")
+            for q, v in zip(QUANTILES, quantiles(recent)):
+                summary_lines.append(f'{name}_recent{{{labels},quantile="{q}"}} {_format(v)}')
+            summary_lines.append(f"{name}_recent_sum{{{labels}}} {sum(recent)!r}")
+            summary_lines.append(f"{name}_recent_count{{{labels}}} {len(recent)}")
+        lines += summary_lines
+        for collector in self._collectors:
+            lines += collector()
+        return '\n'.join(lines) + '\n'
+
+    @staticmethod
+    def bounds_labels():
+        return [repr(b) for b in BUCKETS] + ['+Inf']
+
+
+def _format(value):
+    return 'NaN' if math.isnan(value) else repr(value)
+
+
+def server_timing(spans):
+    """Server-Timing header value: one entry per stage, durations summed, in milliseconds."""
+    totals = {}
+    for stage, seconds in spans:
+        totals[stage] = totals.get(stage, 0.0) + seconds
+    return ', '.join(f"{stage};dur={seconds * 1e3:.2f}" for stage, seconds in totals.items())
+
+
+class RequestProfiler:
+    """
+    cProfile for a single request, reported as pstats text (top `limit`
+    functions by cumulative time). Only one request is profiled at a time;
+    start() returns None while another profile is running.
+    """
+
+    _running = threading.Lock()
+
+    def __init__(self, limit=40):
+        self.limit = limit
+        self.profile = cProfile.Profile()
+
+    def start(self):
+        if not self._running.acquire(blocking=False):
+            return None
+        self.profile.enable()
+        return self
+
+    def stop(self):
+        self.profile.disable()
+        self._running.release()
+        out = io.StringIO()
+        pstats.Stats(self.profile, stream=out).sort_stats('cumulative').print_stats(self.limit)
+        return out.getvalue()
@@ -0,0 +1,212 @@
+# model_registry.py
+
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+from typing import NamedTuple, Optional
+
+import joblib
+
+from src.utils.feature_encoder import YieldFeatureEncoder
+from src.utils.compact_forest import CompactForest, is_exportable
+
+# --- PATHS ---
+MODEL_DIR = 'models'
+REGISTRY_DIR = os.path.join(MODEL_DIR, 'registry')
+LEGACY_MODEL_PATH = os.path.join(MODEL_DIR, 'yield_prediction_model.joblib')
+LEGACY_ENCODER_PATH = os.path.join(MODEL_DIR, 'feature_encoder.joblib')
+
+CURRENT_FILE = 'CURRENT'
+MODEL_FILE = 'model.joblib'
+ENCODER_FILE = 'feature_encoder.joblib'
+METADATA_FILE = 'metadata.json'
+FOREST_DIR = 'forest'
+
+CHECK_INTERVAL_SECONDS = float(os.getenv("MODEL_CHECK_INTERVAL_SECONDS", 5))
+# 'compact' serves the memory-mapped array export of the forest when a version
+# has one; 'joblib' always unpickles the scikit-learn model.
+SERVING_FORMAT = os.getenv("MODEL_SERVING_FORMAT", "compact")
+
+
+class ModelVersion(NamedTuple):
+    """A loaded model together with the encoder it was trained with."""
+    version: str
+    model: object
+    encoder: YieldFeatureEncoder
+    metadata: dict
+
+
+class ModelRegistry:
+    """
+    Local, versioned store of trained yield models.
+
+    Each version is a directory (v0001, v0002, ...) holding the model, its
+    feature encoder, a metadata.json with the training metrics and data
+    fingerprint and, for random forests, the compact array export used for
+    serving (see compact_forest.py). A version directory is fully written under a temporary name
+    and then renamed into place, and the active version is a one-line CURRENT
+    file replaced with os.replace, so readers never see a partial version or a
+    half-written pointer.
+    """
+
+    def __init__(self, root=REGISTRY_DIR):
+        self.root = root
+
+    def _path(self, version, name=''):
+        return os.path.join(self.root, version, name)
+
+    def versions(self):
+        """Registered versions, oldest first."""
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(d for d in os.listdir(self.root)
+                      if d.startswith('v') and d[1:].isdigit() and os.path.isdir(self._path(d)))
+
+    def metadata(self, version):
+        with open(self._path(version, METADATA_FILE)) as f:
+            return json.load(f)
+
+    def current_version(self) -> Optional[str]:
+        try:
+            with open(os.path.join(self.root, CURRENT_FILE)) as f:
+                return f.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def register(self, model, encoder, metadata, activate=True):
+        """Stores a new version and (by default) makes it the active one. Returns its name."""
+        os.makedirs(self.root, exist_ok=True)
+        existing = self.versions()
+        version = f"v{int(existing[-1][1:]) + 1 if existing else 1:04d}"
+        metadata = {**metadata, 'version': version,
+                    'created_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+                    'feature_columns': list(encoder.columns)}
+
+        tmp_dir = tempfile.mkdtemp(prefix='.tmp-', dir=self.root)
+        try:
+            joblib.dump(model, os.path.join(tmp_dir, MODEL_FILE))
+            if is_exportable(model):
+                CompactForest.from_sklearn(model).save(os.path.join(tmp_dir, FOREST_DIR))
+            encoder.save(os.path.join(tmp_dir, ENCODER_FILE))
+            with open(os.path.join(tmp_dir, METADATA_FILE), 'w') as f:
+                json.dump(metadata, f, indent=2)
+            os.rename(tmp_dir, self._path(version))
+        except BaseException:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            raise
+        if activate:
+            self.activate(version)
+        return version
+
+    def activate(self, version):
+        """Points CURRENT at an existing version. Running apps pick it up on their next check."""
+        if version not in self.versions():
+            raise ValueError(f"Unknown model version '{version}'. Registered: {', '.join(self.versions()) or 'none'}.")
+        tmp_path = os.path.join(self.root, CURRENT_FILE + '.tmp')
+        with open(tmp_path, 'w') as f:
+            f.write(version + '\n')
+        os.replace(tmp_path, os.path.join(self.root, CURRENT_FILE))
+
+    def export_compact(self, version):
+        """Adds the compact forest export to a version registered before exports existed."""
+        model = joblib.load(self._path(version, MODEL_FILE))
+        if not is_exportable(model):
+            raise ValueError(f"Model version '{version}' ({type(model).__name__}) has no compact export.")
+        return CompactForest.from_sklearn(model).save(self._path(version, FOREST_DIR))
+
+    def load(self, version=None, compact=False) -> ModelVersion:
+        """
+        Loads a version (the active one by default). With `compact`, the model
+        is the memory-mapped CompactForest when the version has one; use the
+        default for anything that needs the scikit-learn object (e.g. warm_start).
+        """
+        version = version or self.current_version()
+        if version is None:
+            raise FileNotFoundError(f"No active model version in '{self.root}'.")
+        forest_path = self._path(version, FOREST_DIR)
+        model = None
+        if compact and os.path.isdir(forest_path):
+            try:
+                model = CompactForest.load(forest_path)
+            except ValueError as e:
+                print(f"⚠️ {e} Serving the scikit-learn model instead.")
+        if model is None:
+            model = joblib.load(self._path(version, MODEL_FILE))
+        return ModelVersion(version, model,
+                            YieldFeatureEncoder.load(self._path(version, ENCODER_FILE)),
+                            self.metadata(version))
+
+
+def load_legacy_model(model_path=LEGACY_MODEL_PATH, encoder_path=LEGACY_ENCODER_PATH):
+    """The pre-registry model files, wrapped as a ModelVersion named 'legacy'."""
+    return ModelVersion('legacy', joblib.load(model_path), YieldFeatureEncoder.load(encoder_path), {})
+
+
+class ActiveModel:
+    """
+    The model a running app serves, following the registry's CURRENT pointer.
+
+    get() returns one ModelVersion, so a request always sees a matching model
+    and encoder even while a switch happens. The pointer is re-read at most
+    every `check_interval` seconds; when it changes, the call that noticed
+    loads the new version (other requests keep getting the old one meanwhile)
+    and swaps it in with a single assignment.
+    Falls back to the legacy model files while the registry is empty.
+    """
+
+    def __init__(self, registry=None, check_interval=CHECK_INTERVAL_SECONDS, clock=time.monotonic):
+        self.registry = registry or ModelRegistry()
+        self.check_interval = check_interval
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._checked_at = None
+        self._current = self._load(self.registry.current_version())
+
+    def _load(self, version):
+        if not version:
+            return load_legacy_model()
+        return self.registry.load(version, compact=SERVING_FORMAT == 'compact')
+
+    def get(self) -> ModelVersion:
+        now = self.clock()
+        if self._checked_at is not None and now - self._checked_at < self.check_interval:
+            return self._current
+        with self._lock:
+            if self._checked_at is None or now - self._checked_at >= self.check_interval:
+                self._checked_at = now
+                version = self.registry.current_version()
+                if version and version != self._current.version:
+                    try:
+                        self._current = self._load(version)
+                        print(f"✅ Switched to model version {version}")
+                    except Exception as e:
+                        # Keep serving the old version rather than failing requests
+                        print(f"❌ Could not load model version {version}: {e}")
+        return self._current
+
+
+if __name__ == '__main__':
+    # python -m src.utils.model_registry [list | activate <version> | export <version>]
+    registry = ModelRegistry()
+    command = sys.argv[1] if len(sys.argv) > 1 else 'list'
+    if command == 'activate' and len(sys.argv) == 3:
+        registry.activate(sys.argv[2])
+        print(f"✅ Active model version is now {sys.argv[2]}")
+    elif command == 'export' and len(sys.argv) == 3:
+        path = registry.export_compact(sys.argv[2])
+        print(f"✅ Compact forest for {sys.argv[2]} written to '{path}'")
+    elif command == 'list':
+        current = registry.current_version()
+        for version in registry.versions():
+            meta = registry.metadata(version)
+            metrics = meta.get('metrics', {})
+            print(f"{'*' if version == current else ' '} {version}  {meta.get('created_at', '')}  "
+                  f"{meta.get('mode', ''):<12} trees={meta.get('n_estimators', '?'):<4} "
+                  f"R2={metrics.get('r2', float('nan')):.3f} MAE={metrics.get('mae', float('nan')):.3f}")
+    else:
+        print("Usage: python -m src.utils.model_registry [list | activate <version> | export <version>]")
@@ -0,0 +1,227 @@
+# model_search.py (Hyperparameter search with year-based forward-chaining CV)
+
+import argparse
+import hashlib
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.metrics import mean_absolute_error, r2_score
+from sklearn.model_selection import ParameterGrid
+
+from src.utils import data_store, feature_encoder, ndvi_features, train_yield_model
+from src.utils.data_store import SATELLITE_CSV_PATH, SATELLITE_STORE_PATH, YIELD_CSV_PATH, YIELD_STORE_PATH
+from src.utils.feature_encoder import YieldFeatureEncoder
+from src.utils.train_yield_model import (
+    load_master_frame, data_fingerprint, FEATURES, NUMERIC_FEATURES, TARGET, RANDOM_STATE
+)
+
+# --- PATHS ---
+MODEL_DIR = 'models'
+SEARCH_CACHE_DIR = os.path.join(MODEL_DIR, 'search_cache')
+LEADERBOARD_PATH = os.path.join(MODEL_DIR, 'search_leaderboard.csv')
+
+# --- CONFIGURATION ---
+N_JOBS = max(1, (os.cpu_count() or 1) - 1)
+MIN_TRAIN_YEARS = 1  # Years of history before the first validation year
+
+SEARCH_SPACES = {
+    'random_forest': {
+        'n_estimators': [100, 300],
+        'max_depth': [None, 20],
+        'min_samples_leaf': [1, 3],
+        'max_features': [1.0, 0.5],
+    },
+    'xgboost': {
+        'n_estimators': [300, 600],
+        'max_depth': [4, 8],
+        'learning_rate': [0.05, 0.1],
+        'subsample': [0.8, 1.0],
+    },
+}
+
+
+def make_estimator(family, params):
+    """Builds a single-threaded estimator; parallelism comes from running folds side by side."""
+    if family == 'random_forest':
+        return RandomForestRegressor(random_state=RANDOM_STATE, n_jobs=1, **params)
+    if family == 'xgboost':
+        from xgboost import XGBRegressor
+        return XGBRegressor(random_state=RANDOM_STATE, n_jobs=1, **params)
+    raise ValueError(f"Unknown model family '{family}'.")
+
+
+def available_families(families):
+    """Drops families whose library isn't installed (XGBoost is optional)."""
+    usable = []
+    for family in families:
+        if family == 'xgboost':
+            try:
+                import xgboost  # noqa: F401
+            except ImportError:
+                print("⚠️ xgboost is not installed; skipping its configurations.")
+                continue
+        usable.append(family)
+    return usable
+
+
+def forward_chaining_folds(years, min_train_years=MIN_TRAIN_YEARS):
+    """
+    Year-grouped forward-chaining splits: each fold trains on every year before
+    a validation year and tests on that year alone, so no fold ever sees the
+    future. Returns a list of (validation_year, train_idx, test_idx).
+    """
+    years = np.asarray(years)
+    unique = np.unique(years)
+    folds = []
+    for k in range(min_train_years, len(unique)):
+        folds.append((int(unique[k]), np.flatnonzero(years < unique[k]), np.flatnonzero(years == unique[k])))
+    return folds
+
+
+def source_fingerprint():
+    """
+    SHA-1 of everything load_master_frame's result depends on, taken before
+    anything is merged: the yield and satellite files it will read (the store,
+    or the CSV if the store hasn't been built) and the code that cleans,
+    merges and encodes them.
+    """
+    h = hashlib.sha1()
+    for store_path, csv_path in ((YIELD_STORE_PATH, YIELD_CSV_PATH), (SATELLITE_STORE_PATH, SATELLITE_CSV_PATH)):
+        path = store_path if os.path.exists(store_path) else csv_path
+        h.update(path.encode())
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                h.update(chunk)
+    for module in (data_store, ndvi_features, train_yield_model, feature_encoder):
+        with open(module.__file__, 'rb') as f:
+            h.update(f.read())
+    return h.hexdigest()
+
+
+def feature_cache_path(fingerprint, cache_dir=SEARCH_CACHE_DIR):
+    return os.path.join(cache_dir, f"features_{fingerprint[:16]}.npz")
+
+
+def build_feature_cache(master_df, cache_dir=SEARCH_CACHE_DIR, fingerprint=None):
+    """
+    Encodes the merged training data once and saves it as an uncompressed .npz
+    named after `fingerprint` (by default the data fingerprint of master_df).
+    Worker processes load this file once and reuse it for all their trials.
+    """
+    fingerprint = fingerprint or data_fingerprint(master_df)['sha1']
+    path = feature_cache_path(fingerprint, cache_dir)
+    if not os.path.exists(path):
+        os.makedirs(cache_dir, exist_ok=True)
+        encoder = YieldFeatureEncoder(drop_first=True, numeric_features=NUMERIC_FEATURES)
+        X = encoder.fit_transform(master_df[FEATURES])
+        tmp_path = path + '.tmp.npz'
+        np.savez(tmp_path, X=X, y=master_df[TARGET].to_numpy(dtype=np.float64),
+                 years=master_df['Year'].to_numpy(dtype=np.int64))
+        os.replace(tmp_path, path)
+    return path
+
+
+_matrix = {}
+
+
+def _load_matrix(path):
+    # One load per worker process, shared by every trial that worker runs
+    if path not in _matrix:
+        with np.load(path) as data:
+            _matrix[path] = (data['X'], data['y'], data['years'])
+    return _matrix[path]
+
+
+def run_trial(cache_path, family, params, fold):
+    """Fits one configuration on one fold. Returns a dict of scores and timings."""
+    X, y, years = _load_matrix(cache_path)
+    validation_year, train_idx, test_idx = fold
+    model = make_estimator(family, params)
+    start = time.perf_counter()
+    model.fit(X[train_idx], y[train_idx])
+    fit_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    y_pred = model.predict(X[test_idx])
+    predict_seconds = time.perf_counter() - start
+    return {'family': family, 'params': params, 'validation_year': validation_year,
+            'mae': mean_absolute_error(y[test_idx], y_pred), 'r2': r2_score(y[test_idx], y_pred),
+            'fit_seconds': fit_seconds, 'predict_seconds': predict_seconds,
+            'predict_us_per_row': predict_seconds / len(test_idx) * 1e6}
+
+
+def run_search(master_df=None, families=tuple(SEARCH_SPACES), search_spaces=SEARCH_SPACES,
+               n_jobs=N_JOBS, min_train_years=MIN_TRAIN_YEARS, max_configs=None,
+               cache_dir=SEARCH_CACHE_DIR):
+    """
+    Evaluates every configuration of every family on year-grouped
+    forward-chaining folds and returns the leaderboard (one row per
+    configuration, best mean MAE first) plus the per-fold results.
+
+    Without `master_df`, the feature cache is keyed by source_fingerprint():
+    a later run on unchanged files and code finds it before merging, and
+    skips both the merge (load_master_frame) and the encoding.
+    """
+    if master_df is None:
+        fingerprint = source_fingerprint()
+        cache_path = feature_cache_path(fingerprint, cache_dir)
+        if os.path.exists(cache_path):
+            print("✅ Inputs unchanged; using the cached feature matrix.")
+        else:
+            cache_path = build_feature_cache(load_master_frame(), cache_dir, fingerprint)
+    else:
+        cache_path = build_feature_cache(master_df, cache_dir)
+    with np.load(cache_path) as data:
+        years = data['years']
+    folds = forward_chaining_folds(years, min_train_years)
+    if not folds:
+        raise ValueError(f"Need more than {min_train_years} distinct years for forward-chaining CV.")
+
+    configs = [(family, params) for family in available_families(families)
+               for params in ParameterGrid(search_spaces[family])]
+    if max_configs:
+        configs = configs[:max_configs]
+    tasks = [(cache_path, family, params, fold) for family, params in configs for fold in folds]
+    print(f"--- {len(configs)} configurations x {len(folds)} folds "
+          f"(validation years {', '.join(str(f[0]) for f in folds)}) on {n_jobs} worker(s) ---")
+
+    if n_jobs == 1:
+        results = [run_trial(*task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=n_jobs) as pool:
+            results = list(pool.map(run_trial, *zip(*tasks)))
+
+    folds_df = pd.DataFrame(results)
+    folds_df['params'] = folds_df['params'].map(lambda p: ', '.join(f"{k}={v}" for k, v in sorted(p.items())))
+    leaderboard = folds_df.groupby(['family', 'params'], sort=False).agg(
+        mae=('mae', 'mean'), mae_std=('mae', 'std'), r2=('r2', 'mean'),
+        fit_seconds=('fit_seconds', 'mean'), predict_us_per_row=('predict_us_per_row', 'mean'),
+    ).reset_index().sort_values('mae', ignore_index=True)
+    return leaderboard, folds_df
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Hyperparameter search with year-based forward-chaining CV.")
+    parser.add_argument('--families', nargs='+', default=list(SEARCH_SPACES), choices=list(SEARCH_SPACES))
+    parser.add_argument('--n-jobs', type=int, default=N_JOBS)
+    parser.add_argument('--min-train-years', type=int, default=MIN_TRAIN_YEARS)
+    parser.add_argument('--max-configs', type=int, default=None, help="Only try the first N configurations.")
+    parser.add_argument('--output', default=LEADERBOARD_PATH)
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    leaderboard, _ = run_search(families=args.families, n_jobs=args.n_jobs,
+                                min_train_years=args.min_train_years, max_configs=args.max_configs)
+    leaderboard.to_csv(args.output, index=False)
+
+    with pd.option_context('display.width', 250, 'display.max_columns', None, 'display.max_colwidth', 80):
+        print(leaderboard.round({'mae': 3, 'mae_std': 3, 'r2': 3, 'fit_seconds': 2, 'predict_us_per_row': 1}))
+    print(f"\n✅ Leaderboard saved to '{args.output}' ({time.perf_counter() - start:.1f}s)")
+    return leaderboard
+
+
+if __name__ == '__main__':
+    main()
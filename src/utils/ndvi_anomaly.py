@@ -0,0 +1,227 @@
+# ndvi_anomaly.py
+
+import hashlib
+import os
+
+import numpy as np
+import pandas as pd
+
+# --- PATHS ---
+DATA_DIR = 'data'
+SATELLITE_DATA_PATH = os.path.join(DATA_DIR, 'satellite_data_all_districts.csv')
+MODEL_DIR = 'models'
+CLIMATOLOGY_PATH = os.path.join(MODEL_DIR, 'ndvi_climatology.npz')
+
+# 16-day bins match the standard NDVI composite period and leave enough
+# Sentinel-2 observations per bin for a stable mean/std.
+DEFAULT_BIN_DAYS = 16
+MIN_OBSERVATIONS = 3  # Fewer observations than this in a bin gives no z-score
+
+
+class NDVIClimatology:
+    """
+    Per-district, per-composite-period NDVI mean and standard deviation.
+
+    The climatology is stored as running sufficient statistics (count, mean and
+    sum of squared deviations) in (n_districts, n_bins) float64 arrays, so:
+      - scoring an observation is one dictionary lookup plus array indexing, and
+      - new observations are merged in with update() without touching the
+        history (Chan et al.'s parallel variance combination).
+    """
+
+    def __init__(self, bin_days=DEFAULT_BIN_DAYS, min_observations=MIN_OBSERVATIONS):
+        self.bin_days = bin_days
+        self.min_observations = min_observations
+        self.n_bins = int(np.ceil(366 / bin_days))
+        self.districts = []
+        self._row = {}
+        self.count = np.zeros((0, self.n_bins))
+        self.mean = np.zeros((0, self.n_bins))
+        self.m2 = np.zeros((0, self.n_bins))
+        self.source_fingerprint = None  # source_fingerprint() of the file the statistics cover
+
+    # --- BUILDING & UPDATING ---
+
+    def date_to_bin(self, dates):
+        """Maps dates (anything pd.to_datetime accepts) to composite-period indices."""
+        doy = pd.DatetimeIndex(pd.to_datetime(dates)).dayofyear.to_numpy()
+        return np.minimum((doy - 1) // self.bin_days, self.n_bins - 1)
+
+    def _ensure_district(self, district):
+        row = self._row.get(district)
+        if row is None:
+            row = len(self.districts)
+            self.districts.append(district)
+            self._row[district] = row
+            empty = np.zeros((1, self.n_bins))
+            self.count = np.vstack([self.count, empty])
+            self.mean = np.vstack([self.mean, empty])
+            self.m2 = np.vstack([self.m2, empty])
+        return row
+
+    def update(self, df):
+        """
+        Merges new observations into the climatology.
+        `df` needs 'District', 'date' and 'ndvi' columns. Returns self.
+        """
+        df = df.dropna(subset=['District', 'date', 'ndvi'])
+        if df.empty:
+            return self
+        districts = df['District'].astype(str).str.strip().str.upper().to_numpy()
+        rows = np.array([self._ensure_district(d) for d in districts])
+        cells = rows * self.n_bins + self.date_to_bin(df['date'])
+        values = df['ndvi'].to_numpy(dtype=np.float64)
+
+        # Per-cell statistics of the new batch
+        size = len(self.districts) * self.n_bins
+        n_b = np.bincount(cells, minlength=size)
+        sum_b = np.bincount(cells, weights=values, minlength=size)
+        touched = n_b > 0
+        mean_b = np.zeros(size)
+        mean_b[touched] = sum_b[touched] / n_b[touched]
+        m2_b = np.bincount(cells, weights=(values - mean_b[cells]) ** 2, minlength=size)
+
+        # Combine with the existing statistics
+        n_a, mean_a, m2_a = self.count.ravel(), self.mean.ravel(), self.m2.ravel()
+        n = n_a + n_b
+        delta = mean_b - mean_a
+        with np.errstate(divide='ignore', invalid='ignore'):
+            mean = np.where(touched, mean_a + delta * n_b / n, mean_a)
+            m2 = np.where(touched, m2_a + m2_b + delta ** 2 * n_a * n_b / n, m2_a)
+
+        shape = (len(self.districts), self.n_bins)
+        self.count, self.mean, self.m2 = n.reshape(shape), mean.reshape(shape), m2.reshape(shape)
+        return self
+
+    @classmethod
+    def from_csv(cls, path=SATELLITE_DATA_PATH, **kwargs):
+        """Builds the climatology from the batch-fetched satellite CSV."""
+        clim = cls(**kwargs).update(pd.read_csv(path))
+        clim.source_fingerprint = source_fingerprint(path)
+        return clim
+
+    # --- SCORING ---
+
+    @property
+    def std(self):
+        """Sample standard deviation per cell (NaN where there are too few observations)."""
+        with np.errstate(divide='ignore', invalid='ignore'):
+            std = np.sqrt(self.m2 / (self.count - 1))
+        return np.where(self.count >= self.min_observations, std, np.nan)
+
+    def z_score(self, district, date, ndvi):
+        """Z-score of one observation, or NaN if the district/period has no usable baseline."""
+        row = self._row.get(str(district).strip().upper())
+        if row is None:
+            return float('nan')
+        b = int(self.date_to_bin([date])[0])
+        count = self.count[row, b]
+        if count < self.min_observations:
+            return float('nan')
+        std = np.sqrt(self.m2[row, b] / (count - 1))
+        if std == 0:
+            return float('nan')
+        return float((ndvi - self.mean[row, b]) / std)
+
+    def z_scores(self, district, dates, ndvis):
+        """Vectorized z_score for a series of observations from one district."""
+        ndvis = np.asarray(ndvis, dtype=np.float64)
+        row = self._row.get(str(district).strip().upper())
+        if row is None:
+            return np.full(ndvis.shape, np.nan)
+        bins = self.date_to_bin(dates)
+        std = self.std[row, bins]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            z = (ndvis - self.mean[row, bins]) / std
+        return np.where(std > 0, z, np.nan)
+
+    def recent_z_score(self, district, ndvi_data, last_n=3):
+        """
+        Mean z-score of the `last_n` most recent observations in an NDVI series
+        (a DataFrame with 'date' and 'ndvi'). Averaging a few readings damps
+        single-image cloud or haze artifacts. Returns NaN if none can be scored.
+        """
+        if ndvi_data is None or ndvi_data.empty:
+            return float('nan')
+        recent = ndvi_data.sort_values('date').tail(last_n)
+        z = self.z_scores(district, recent['date'], recent['ndvi'])
+        z = z[~np.isnan(z)]
+        return float(z.mean()) if len(z) else float('nan')
+
+    # --- PERSISTENCE ---
+
+    def save(self, path=CLIMATOLOGY_PATH):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        np.savez_compressed(path, districts=np.array(self.districts, dtype=str),
+                            count=self.count, mean=self.mean, m2=self.m2,
+                            bin_days=self.bin_days, min_observations=self.min_observations,
+                            source_fingerprint=self.source_fingerprint or '')
+
+    @classmethod
+    def load(cls, path=CLIMATOLOGY_PATH):
+        with np.load(path) as data:
+            clim = cls(bin_days=int(data['bin_days']), min_observations=int(data['min_observations']))
+            clim.districts = data['districts'].tolist()
+            clim._row = {d: i for i, d in enumerate(clim.districts)}
+            clim.count, clim.mean, clim.m2 = data['count'], data['mean'], data['m2']
+            # Files saved before fingerprints were stored have none, and are rebuilt
+            clim.source_fingerprint = str(data['source_fingerprint']) if 'source_fingerprint' in data else None
+        return clim
+
+
+def source_fingerprint(path):
+    """SHA-1 of a file's contents (not its mtime, which a git checkout changes)."""
+    h = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def load_or_build_climatology(path=CLIMATOLOGY_PATH, source_path=SATELLITE_DATA_PATH):
+    """
+    Loads the saved climatology, building and saving it from the CSV on first
+    use, and rebuilding it whenever the CSV no longer matches the fingerprint
+    it was built from.
+    """
+    if os.path.exists(path):
+        clim = NDVIClimatology.load(path)
+        if not os.path.exists(source_path) or clim.source_fingerprint == source_fingerprint(source_path):
+            return clim
+        print(f"⚠️ '{source_path}' changed since the NDVI climatology was built; rebuilding it.")
+    clim = NDVIClimatology.from_csv(source_path)
+    clim.save(path)
+    return clim
+
+
+def extend_climatology(new_df, previous_fingerprint, source_path=SATELLITE_DATA_PATH, path=CLIMATOLOGY_PATH):
+    """
+    Merges newly fetched observations into the saved climatology with update(),
+    after the satellite CSV at `source_path` has been rewritten with them.
+    This is only valid if the saved climatology covered exactly the previous CSV
+    (`previous_fingerprint`) and `new_df` holds only the rows added since; in any
+    other case the climatology is rebuilt from the new CSV. Returns it.
+    """
+    if previous_fingerprint is not None and os.path.exists(path):
+        clim = NDVIClimatology.load(path)
+        if clim.source_fingerprint == previous_fingerprint:
+            clim.update(new_df)
+            clim.source_fingerprint = source_fingerprint(source_path)
+            clim.save(path)
+            print(f"✅ NDVI climatology updated with {len(new_df)} new records ('{path}')")
+            return clim
+    clim = NDVIClimatology.from_csv(source_path)
+    clim.save(path)
+    print(f"✅ NDVI climatology rebuilt from '{source_path}' ('{path}')")
+    return clim
+
+
+if __name__ == '__main__':
+    # Rebuild the climatology from the satellite CSV
+    clim = NDVIClimatology.from_csv(SATELLITE_DATA_PATH)
+    clim.save(CLIMATOLOGY_PATH)
+    usable = int((clim.count >= clim.min_observations).sum())
+    print(f"✅ NDVI climatology saved to '{CLIMATOLOGY_PATH}'")
+    print(f"   {len(clim.districts)} districts x {clim.n_bins} periods of {clim.bin_days} days "
+          f"({usable} periods with a usable baseline)")
@@ -0,0 +1,352 @@
+# ndvi_cache.py
+
+import asyncio
+import contextlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from functools import partial
+
+import numpy as np
+import pandas as pd
+
+from src.utils.satellite_data import get_ndvi_for_location, DEFAULT_COLLECTION, DEFAULT_MAX_CLOUD_PCT
+from src.utils.ndvi_providers import get_provider
+
+# --- CONFIGURATION ---
+DATA_DIR = 'data'
+CACHE_BACKEND = os.getenv("NDVI_CACHE_BACKEND", "sqlite")  # 'memory' or 'sqlite'
+CACHE_DB_PATH = os.getenv("NDVI_CACHE_PATH", os.path.join(DATA_DIR, 'ndvi_cache.sqlite'))
+CACHE_TTL_SECONDS = int(os.getenv("NDVI_CACHE_TTL_SECONDS", 6 * 60 * 60))
+CACHE_MAX_ENTRIES = int(os.getenv("NDVI_CACHE_MAX_ENTRIES", 512))
+# Threads that run blocking lookups and upstream fetches for get_ndvi_async
+FETCH_WORKERS = int(os.getenv("NDVI_FETCH_WORKERS", 16))
+
+DATE_FORMAT = '%Y-%m-%d'
+
+
+def make_cache_key(lat, lon, collection=DEFAULT_COLLECTION, max_cloud_pct=DEFAULT_MAX_CLOUD_PCT):
+    """
+    Builds the key for one NDVI series. The date window is deliberately not part
+    of the key: every window for the same point/collection/cloud filter is served
+    as a slice of a single cached series, so overlapping requests share one entry.
+    """
+    return f"{float(lat):.5f}|{float(lon):.5f}|{collection}|{max_cloud_pct}"
+
+
+# --- BACKENDS ---
+# An entry is a dict: {'start', 'end', 'fetched_at', 'records'} where [start, end)
+# is the date range that has been fetched and 'records' is the DataFrame returned
+# by get_ndvi_for_location, sorted by date.
+
+class MemoryCacheBackend:
+    """In-process LRU store. Fast, but emptied whenever the process restarts."""
+
+    def __init__(self, max_entries=CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key, entry):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class SQLiteCacheBackend:
+    """On-disk store that survives restarts. Evicts the least recently used rows."""
+
+    def __init__(self, path=CACHE_DB_PATH, max_entries=CACHE_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS ndvi_cache ("
+                " cache_key TEXT PRIMARY KEY, start TEXT, end TEXT,"
+                " fetched_at REAL, last_access REAL, records TEXT)"
+            )
+
+    @contextlib.contextmanager
+    def _connect(self):
+        # A short-lived connection per call keeps the backend safe to share across Flask threads.
+        # `with conn` only commits (or rolls back); the connection is closed here.
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def get(self, key):
+        with self._lock, self._connect() as conn:
+            row = conn.execute(
+                "SELECT start, end, fetched_at, records FROM ndvi_cache WHERE cache_key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute("UPDATE ndvi_cache SET last_access = ? WHERE cache_key = ?", (time.time(), key))
+        return {'start': row[0], 'end': row[1], 'fetched_at': row[2], 'records': _records_from_json(row[3])}
+
+    def set(self, key, entry):
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO ndvi_cache VALUES (?, ?, ?, ?, ?, ?)",
+                (key, entry['start'], entry['end'], entry['fetched_at'], time.time(),
+                 _records_to_json(entry['records'])),
+            )
+            conn.execute(
+                "DELETE FROM ndvi_cache WHERE cache_key NOT IN ("
+                " SELECT cache_key FROM ndvi_cache ORDER BY last_access DESC LIMIT ?)",
+                (self.max_entries,),
+            )
+
+    def clear(self):
+        with self._lock, self._connect() as conn:
+            conn.execute("DELETE FROM ndvi_cache")
+
+    def __len__(self):
+        with self._connect() as conn:
+            return conn.execute("SELECT COUNT(*) FROM ndvi_cache").fetchone()[0]
+
+
+# --- REQUEST COALESCING ---
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Collapses concurrent calls with the same key into one.
+
+    do(key, fn) runs fn() in the first caller's thread. Callers that arrive with
+    the same key while it runs wait for that call and get its result, or its
+    exception, instead of running fn() again. Once the call finishes the key is
+    released, so a later call runs fn() afresh.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, fn):
+        """Returns (result, shared), where shared is True if another caller's result was reused."""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result, False
+
+
+# --- CACHE ---
+
+class NDVICache:
+    """
+    Read-through cache in front of get_ndvi_for_location.
+
+    - A request inside the cached range is a hit while the entry is younger than
+      the TTL (or when the window ends before the last cached observation, since
+      those dates are settled).
+    - A request that runs past the cached range, or hits a stale entry, is an
+      extension: only dates after the last cached observation are fetched and
+      merged in, instead of refetching the whole season.
+    - A request starting before the cached range is a miss and refetches it all.
+
+    Concurrent requests for the same point and date window are coalesced
+    (`coalesce=True`): one of them does the lookup and any upstream fetch, and
+    the others wait for it and get a copy of its result. get_ndvi_async() does
+    the same for coroutines, which wait on the event loop instead of holding a
+    thread while a slow fetch runs.
+    """
+
+    def __init__(self, backend=None, ttl_seconds=CACHE_TTL_SECONDS, fetch_fn=get_ndvi_for_location,
+                 coalesce=True, fetch_workers=FETCH_WORKERS, clock=time.time):
+        self.backend = backend if backend is not None else MemoryCacheBackend()
+        self.ttl_seconds = ttl_seconds
+        self.fetch_fn = fetch_fn
+        self.coalesce = coalesce
+        self.fetch_workers = fetch_workers
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self.extensions = 0
+        self.coalesced = 0
+        self._lock = threading.Lock()
+        self._flights = SingleFlight()
+        self._async_flights = {}
+        self._executor = None
+
+    def _count(self, counter):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def get_ndvi(self, lat, lon, start_date, end_date,
+                 collection=DEFAULT_COLLECTION, max_cloud_pct=DEFAULT_MAX_CLOUD_PCT):
+        """Same contract as get_ndvi_for_location, served from the cache where possible."""
+        key = make_cache_key(lat, lon, collection, max_cloud_pct)
+        if not self.coalesce:
+            return self._get(key, lat, lon, start_date, end_date, collection, max_cloud_pct)
+        records, shared = self._flights.do(
+            (key, start_date, end_date),
+            partial(self._get, key, lat, lon, start_date, end_date, collection, max_cloud_pct))
+        if shared:
+            self._count('coalesced')
+            return records.copy()
+        return records
+
+    async def get_ndvi_async(self, lat, lon, start_date, end_date,
+                             collection=DEFAULT_COLLECTION, max_cloud_pct=DEFAULT_MAX_CLOUD_PCT):
+        """
+        Awaitable get_ndvi. The blocking lookup and fetch run on a pool of
+        `fetch_workers` threads; coroutines asking for the same point and window
+        while one is in flight await that one instead of taking another thread.
+        """
+        loop = asyncio.get_running_loop()
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(self.fetch_workers, thread_name_prefix='ndvi-fetch')
+        call = partial(self.get_ndvi, lat, lon, start_date, end_date, collection, max_cloud_pct)
+        if not self.coalesce:
+            return await loop.run_in_executor(self._executor, call)
+
+        flight_key = (loop, make_cache_key(lat, lon, collection, max_cloud_pct), start_date, end_date)
+        future = self._async_flights.get(flight_key)
+        if future is None:
+            future = self._async_flights[flight_key] = loop.run_in_executor(self._executor, call)
+            future.add_done_callback(lambda _: self._async_flights.pop(flight_key, None))
+            return await asyncio.shield(future)
+        self._count('coalesced')
+        # shield: a cancelled waiter must not cancel the fetch the others share
+        return (await asyncio.shield(future)).copy()
+
+    def _get(self, key, lat, lon, start_date, end_date, collection, max_cloud_pct):
+        entry = self.backend.get(key)
+        now = self.clock()
+
+        if entry is None or start_date < entry['start']:
+            self._count('misses')
+            fetch_end = max(end_date, entry['end']) if entry else end_date
+            records = self.fetch_fn(lat, lon, start_date, fetch_end,
+                                    collection=collection, max_cloud_pct=max_cloud_pct)
+            entry = {'start': start_date, 'end': fetch_end, 'fetched_at': now, 'records': records}
+            self.backend.set(key, entry)
+            return _slice(entry['records'], start_date, end_date)
+
+        records = entry['records']
+        last_obs = records['date'].iloc[-1].strftime(DATE_FORMAT) if not records.empty else None
+        fresh = now - entry['fetched_at'] < self.ttl_seconds
+        settled = last_obs is not None and end_date <= last_obs
+        if end_date <= entry['end'] and (fresh or settled):
+            self._count('hits')
+            return _slice(records, start_date, end_date)
+
+        self._count('extensions')
+        fetch_start = _next_day(last_obs) if last_obs else entry['start']
+        fetch_end = max(end_date, entry['end'])
+        if fetch_start < fetch_end:
+            new_records = self.fetch_fn(lat, lon, fetch_start, fetch_end,
+                                        collection=collection, max_cloud_pct=max_cloud_pct)
+            records = _merge(records, new_records)
+        entry = {'start': entry['start'], 'end': fetch_end, 'fetched_at': now, 'records': records}
+        self.backend.set(key, entry)
+        return _slice(records, start_date, end_date)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses + self.extensions
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'extensions': self.extensions,
+                'coalesced': self.coalesced,
+                'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0,
+                'entries': len(self.backend),
+            }
+
+
+def _next_day(date_str):
+    return (datetime.strptime(date_str, DATE_FORMAT) + timedelta(days=1)).strftime(DATE_FORMAT)
+
+
+def _merge(old_records, new_records):
+    """Appends newly fetched observations, which always start after the cached ones."""
+    if new_records.empty:
+        return old_records
+    if old_records.empty:
+        return new_records
+    return pd.concat([old_records, new_records], ignore_index=True)
+
+
+def _slice(records, start_date, end_date):
+    """Returns a copy of the records in [start_date, end_date), matching ee's filterDate."""
+    dates = records['date'].to_numpy()
+    lo, hi = np.searchsorted(dates, [np.datetime64(start_date), np.datetime64(end_date)])
+    return records.iloc[lo:hi].reset_index(drop=True)
+
+
+def _records_to_json(records):
+    return json.dumps({'date': records['date'].dt.strftime(DATE_FORMAT).tolist(),
+                       'ndvi': records['ndvi'].astype(float).tolist()})
+
+
+def _records_from_json(payload):
+    data = json.loads(payload)
+    return pd.DataFrame({'date': pd.to_datetime(pd.Series(data['date'], dtype=object), format=DATE_FORMAT),
+                         'ndvi': np.array(data['ndvi'], dtype=np.float32)})
+
+
+def build_ndvi_cache(backend=CACHE_BACKEND, provider=None):
+    """
+    Creates the cache configured through the NDVI_CACHE_* environment variables,
+    in front of `provider` (by default the one selected by NDVI_PROVIDER).
+    """
+    if backend == 'sqlite':
+        store = SQLiteCacheBackend(CACHE_DB_PATH, max_entries=CACHE_MAX_ENTRIES)
+    elif backend == 'memory':
+        store = MemoryCacheBackend(max_entries=CACHE_MAX_ENTRIES)
+    else:
+        raise ValueError(f"Unknown NDVI cache backend '{backend}'. Use 'memory' or 'sqlite'.")
+    return NDVICache(store, ttl_seconds=CACHE_TTL_SECONDS, fetch_fn=provider or get_provider())
@@ -0,0 +1,217 @@
+# ndvi_features.py
+
+import numpy as np
+import pandas as pd
+
+# --- SEASONS ---
+# Yield years are agricultural years ('2018 - 2019' -> 2018) starting in June.
+# Season windows are [start, end) in months after that June, matching the
+# notebook's month mapping: Kharif Jun-Oct, Rabi Nov-Mar, Summer Apr-May.
+AG_YEAR_START_MONTH = 6
+SEASON_WINDOWS = {
+    'Kharif': (0, 5),
+    'Rabi': (5, 10),
+    'Summer': (10, 12),
+    'Whole Year': (0, 12),
+}
+
+# 'ndvi' is the season mean (the model's original NDVI feature)
+FEATURE_COLUMNS = ['ndvi', 'ndvi_max', 'ndvi_std', 'ndvi_count',
+                   'ndvi_peak_day', 'ndvi_auc', 'ndvi_greenup_slope']
+
+
+def agricultural_year(dates):
+    """(agricultural year, months since that year's June) for each date."""
+    months = pd.to_datetime(np.asarray(dates)).to_numpy().astype('datetime64[M]').astype(np.int64)
+    since_june = months - (AG_YEAR_START_MONTH - 1)  # Months since 1970-06
+    return since_june // 12 + 1970, since_june % 12
+
+
+def season_start(year, season):
+    """First day of `season` in agricultural year `year`."""
+    first = np.datetime64(f'{int(year)}-{AG_YEAR_START_MONTH:02d}', 'M') + SEASON_WINDOWS[season][0]
+    return pd.Timestamp(first)
+
+
+def seasonal_ndvi_features(df, seasons=SEASON_WINDOWS):
+    """
+    Per-(District, Year, Season) NDVI aggregates from raw observations.
+
+    `df` needs 'District', 'date' and 'ndvi' columns. Returns one row per
+    district, agricultural year and season window with observations, holding
+    FEATURE_COLUMNS:
+      ndvi / ndvi_max / ndvi_std   mean, max and sample std (0 for a single reading)
+      ndvi_count                   number of readings
+      ndvi_peak_day                days from the window start to the (first) maximum
+      ndvi_auc                     trapezoidal area under the curve, NDVI x days
+      ndvi_greenup_slope           least-squares NDVI change per day up to the peak
+
+    Training and the live request path both call this function, so a season's
+    features are computed the same way whether the series comes from the
+    archive or a fresh fetch. Observations are sorted once and every aggregate
+    is a bincount/reduceat over group boundaries; the only Python loop is over
+    the (four) season windows.
+    """
+    df = df.dropna(subset=['District', 'date', 'ndvi']).drop_duplicates(subset=['District', 'date', 'ndvi'])
+    dates = pd.to_datetime(df['date']).to_numpy().astype('datetime64[D]')
+    districts, district_names = pd.factorize(df['District'].astype(str).str.strip().str.upper())
+    ndvi = df['ndvi'].to_numpy(dtype=np.float64)
+    year, month_offset = agricultural_year(dates)
+    year_start = (year - 1970) * 12 + (AG_YEAR_START_MONTH - 1)  # As months since 1970-01
+
+    # One entry per (observation, season window it falls in)
+    names = list(seasons)
+    parts = [(np.flatnonzero((month_offset >= lo) & (month_offset < hi)), code)
+             for code, (lo, hi) in enumerate(seasons.values())]
+    idx = np.concatenate([p for p, _ in parts])
+    season = np.concatenate([np.full(len(p), code) for p, code in parts])
+    lo = np.array([w[0] for w in seasons.values()])[season]
+    window_start = (year_start[idx] + lo).astype('datetime64[M]').astype('datetime64[D]')
+    day = (dates[idx] - window_start).astype(np.float64)
+    d, y, v = districts[idx], year[idx], ndvi[idx]
+
+    order = np.lexsort((day, season, y, d))
+    d, y, season, day, v = d[order], y[order], season[order], day[order], v[order]
+    if not len(v):
+        return pd.DataFrame(columns=['District', 'Year', 'Season'] + FEATURE_COLUMNS)
+    new_group = np.r_[True, (d[1:] != d[:-1]) | (y[1:] != y[:-1]) | (season[1:] != season[:-1])]
+    starts = np.flatnonzero(new_group)
+    g = np.cumsum(new_group) - 1
+    n_groups = len(starts)
+
+    count = np.bincount(g, minlength=n_groups).astype(np.float64)
+    mean = np.bincount(g, weights=v, minlength=n_groups) / count
+    with np.errstate(divide='ignore', invalid='ignore'):
+        std = np.sqrt(np.bincount(g, weights=(v - mean[g]) ** 2, minlength=n_groups) / (count - 1))
+    std[count < 2] = 0.0
+    vmax = np.maximum.reduceat(v, starts)
+
+    # First reading at the maximum (rows are in date order within a group)
+    position = np.arange(len(v))
+    peak = np.minimum.reduceat(np.where(v == vmax[g], position, len(v)), starts)
+    peak_day = day[peak]
+
+    same = g[1:] == g[:-1]
+    segment = np.diff(day) * (v[1:] + v[:-1]) / 2
+    auc = np.bincount(g[1:][same], weights=segment[same], minlength=n_groups)
+
+    # Ordinary least squares slope over the readings up to the peak
+    rising = day <= peak_day[g]
+    gr, x, yv = g[rising], day[rising], v[rising]
+    n = np.bincount(gr, minlength=n_groups).astype(np.float64)
+    sx, sy = np.bincount(gr, weights=x, minlength=n_groups), np.bincount(gr, weights=yv, minlength=n_groups)
+    sxx, sxy = np.bincount(gr, weights=x * x, minlength=n_groups), np.bincount(gr, weights=x * yv, minlength=n_groups)
+    denominator = n * sxx - sx ** 2
+    with np.errstate(divide='ignore', invalid='ignore'):
+        slope = np.where(denominator > 0, (n * sxy - sx * sy) / denominator, 0.0)
+
+    return pd.DataFrame({
+        'District': np.asarray(district_names)[d[starts]],
+        'Year': y[starts],
+        'Season': np.asarray(names, dtype=object)[season[starts]],
+        'ndvi': mean,
+        'ndvi_max': vmax,
+        'ndvi_std': std,
+        'ndvi_count': count,
+        'ndvi_peak_day': peak_day,
+        'ndvi_auc': auc,
+        'ndvi_greenup_slope': slope,
+    })
+
+
+# --- LIVE REQUESTS ---
+# The model is trained on complete season windows only. A window in progress
+# has fewer readings, a smaller area under the curve and an earlier (or no)
+# peak than any training row, so live requests are not scored on it: the
+# NDVI inputs are those of the most recent *complete* window of the season
+# (scoring_year), computed by the same function as in training, while the
+# readings of the window in progress are reported alongside (current_window_mean)
+# and drive the risk level and the anomaly z-score. When there are no readings
+# at all, or the caller supplies a single NDVI value, the inputs are the
+# district's typical features for that season (typical_season_features) rather
+# than those of one reading, which no training row resembles.
+
+def default_features(ndvi):
+    """
+    Features of a season with a single reading of `ndvi`. Out of the training
+    distribution (count 1, no area); only used for districts with no history.
+    """
+    return {'ndvi': ndvi, 'ndvi_max': ndvi, 'ndvi_std': 0.0, 'ndvi_count': 1.0,
+            'ndvi_peak_day': 0.0, 'ndvi_auc': 0.0, 'ndvi_greenup_slope': 0.0}
+
+
+def typical_season_features(satellite_df):
+    """{(District, Season): median of each feature over that district's complete historical windows}."""
+    features = seasonal_ndvi_features(satellite_df)
+    if features.empty:
+        return {}
+    medians = features.groupby(['District', 'Season'])[FEATURE_COLUMNS].median()
+    return {key: {col: float(v) for col, v in row.items()} for key, row in medians.iterrows()}
+
+
+def features_at_mean(typical, ndvi):
+    """
+    A typical season (from typical_season_features) moved to a mean NDVI of
+    `ndvi`: the max shifts by the same amount, the area and green-up slope
+    scale with the mean, and the number, spread and timing of readings stay.
+    """
+    ratio = ndvi / typical['ndvi'] if typical['ndvi'] > 0 else 1.0
+    return {**typical, 'ndvi': ndvi, 'ndvi_max': min(1.0, typical['ndvi_max'] + ndvi - typical['ndvi']),
+            'ndvi_auc': typical['ndvi_auc'] * ratio, 'ndvi_greenup_slope': typical['ndvi_greenup_slope'] * ratio}
+
+
+def serving_season(seasons, today):
+    """
+    The season to score a crop against on `today`: the season in progress if
+    the crop is grown in it, otherwise 'Whole Year', otherwise the crop's first
+    listed (most common) season.
+    """
+    _, offset = agricultural_year([today])
+    for name, (lo, hi) in SEASON_WINDOWS.items():
+        if name != 'Whole Year' and lo <= offset[0] < hi and name in seasons:
+            return name
+    if 'Whole Year' in seasons or not seasons:
+        return 'Whole Year'
+    return seasons[0]
+
+
+def live_fetch_start(today):
+    """Start of the series a live request needs: the previous agricultural year's June."""
+    year, _ = agricultural_year([today])
+    return season_start(year[0] - 1, 'Kharif')
+
+
+def season_year(season, today):
+    """Agricultural year of the most recent `season` window that has started by `today`."""
+    year, offset = agricultural_year([today])
+    return int(year[0]) - int(offset[0] < SEASON_WINDOWS[season][0])
+
+
+def scoring_year(season, today):
+    """Agricultural year of the most recent `season` window that has ended by `today`."""
+    year, offset = agricultural_year([today])
+    return int(year[0]) - int(offset[0] < SEASON_WINDOWS[season][1])
+
+
+def current_window_mean(ndvi_data, season, today):
+    """Mean NDVI of the season_year(season, today) window's readings so far, or None if it has none."""
+    start = season_start(season_year(season, today), season)
+    dates = pd.to_datetime(ndvi_data['date'])
+    readings = ndvi_data.loc[(dates >= start) & (dates <= pd.Timestamp(today)), 'ndvi'].dropna()
+    return float(readings.mean()) if len(readings) else None
+
+
+def live_seasonal_features(district, ndvi_data, season, today):
+    """
+    Features of the scoring_year(season, today) window, the latest complete
+    one (see the note above), computed by seasonal_ndvi_features from a live
+    series ('date', 'ndvi') that begins at live_fetch_start(today), which
+    always covers it. Returns None when that window has no readings.
+    """
+    year = scoring_year(season, today)
+    window = ndvi_data[pd.to_datetime(ndvi_data['date']) <= pd.Timestamp(today)]
+    features = seasonal_ndvi_features(window.assign(District=district), {season: SEASON_WINDOWS[season]})
+    row = features[features['Year'] == year]
+    if row.empty:
+        return None
+    return {col: float(row[col].iloc[0]) for col in FEATURE_COLUMNS}
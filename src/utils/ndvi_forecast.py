@@ -0,0 +1,287 @@
+# ndvi_forecast.py (Per-district NDVI forecasts, fitted in a process pool)
+
+import argparse
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+from src.utils.data_store import load_satellite_data, read_store, write_store
+
+# --- PATHS ---
+MODEL_DIR = 'models'
+FORECAST_DIR = os.path.join(MODEL_DIR, 'ndvi_forecast')
+
+# --- CONFIGURATION ---
+N_JOBS = max(1, (os.cpu_count() or 1) - 1)
+MAX_HORIZON_DAYS = int(os.getenv("NDVI_FORECAST_MAX_HORIZON_DAYS", 180))
+MIN_OBSERVATIONS = 30  # Districts with fewer readings are not forecast
+# How often the app checks for a newer set of forecasts
+CHECK_INTERVAL_SECONDS = float(os.getenv("NDVI_FORECAST_CHECK_INTERVAL_SECONDS", 30))
+# Same model as the forecasting notebook: trend plus yearly seasonality
+PROPHET_ARGS = {'yearly_seasonality': True, 'weekly_seasonality': False, 'daily_seasonality': False}
+
+
+def manifest_path(forecast_dir=FORECAST_DIR):
+    return os.path.join(forecast_dir, 'manifest.json')
+
+
+def forecasts_path(forecast_dir=FORECAST_DIR):
+    return os.path.join(forecast_dir, 'forecasts.parquet')
+
+
+def params_path(district, forecast_dir=FORECAST_DIR):
+    return os.path.join(forecast_dir, 'params', f"{district}.json")
+
+
+def _write_json(obj, path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(obj, f, indent=1)
+    os.replace(tmp_path, path)
+
+
+def load_manifest(forecast_dir=FORECAST_DIR):
+    """{'districts': {district: fit record}} of the last fit, or an empty manifest."""
+    path = manifest_path(forecast_dir)
+    if not os.path.exists(path):
+        return {'districts': {}}
+    with open(path) as f:
+        return json.load(f)
+
+
+# --- FITTING ---
+
+def district_series(satellite_df):
+    """{district: DataFrame(ds, y)} of daily mean NDVI, sorted by date (duplicate readings averaged)."""
+    df = satellite_df[['District', 'date', 'ndvi']].dropna()
+    # Averaged in float64 whatever the input dtype, so the fingerprints only change with the readings
+    df = df.assign(District=df['District'].astype(str), ndvi=df['ndvi'].astype(np.float64))
+    daily = df.groupby(['District', 'date'])['ndvi'].mean().reset_index()
+    return {district: group[['date', 'ndvi']].rename(columns={'date': 'ds', 'ndvi': 'y'})
+            .sort_values('ds', ignore_index=True)
+            for district, group in daily.groupby('District')}
+
+
+def series_fingerprint(series, horizon_days=MAX_HORIZON_DAYS):
+    """Changes whenever a district's readings, the horizon or the model settings change."""
+    h = hashlib.sha1()
+    h.update(series['ds'].to_numpy(dtype='datetime64[ns]').tobytes())
+    h.update(series['y'].to_numpy(dtype=np.float64).tobytes())
+    h.update(json.dumps([horizon_days, PROPHET_ARGS], sort_keys=True).encode())
+    return h.hexdigest()
+
+
+def fit_district(district, series, horizon_days=MAX_HORIZON_DAYS):
+    """
+    Fits one district's Prophet model and forecasts `horizon_days` days past
+    its last reading. Runs in a worker process. Returns the serialized model,
+    the forecast frame and the fit time.
+    """
+    import logging
+    from prophet import Prophet
+    from prophet.serialize import model_to_json
+    logging.getLogger('cmdstanpy').setLevel(logging.WARNING)
+
+    start = time.perf_counter()
+    model = Prophet(**PROPHET_ARGS).fit(series)
+    future = model.make_future_dataframe(periods=horizon_days, include_history=False)
+    predicted = model.predict(future)
+    forecast = pd.DataFrame({
+        'District': district,
+        'date': predicted['ds'],
+        'ndvi': predicted['yhat'].astype(np.float32),
+        'lower': predicted['yhat_lower'].astype(np.float32),
+        'upper': predicted['yhat_upper'].astype(np.float32),
+    })
+    return {'district': district, 'model_json': model_to_json(model), 'forecast': forecast,
+            'fit_seconds': time.perf_counter() - start}
+
+
+def fit_forecasts(satellite_df=None, n_jobs=N_JOBS, horizon_days=MAX_HORIZON_DAYS, force=False,
+                  forecast_dir=FORECAST_DIR):
+    """
+    Fits a model per district, in a pool of `n_jobs` processes, and saves
+    each fitted model's parameters (Prophet's JSON serialization) plus every
+    district's forecast for the next `horizon_days` days.
+
+    Districts whose readings haven't changed since the last fit (same
+    fingerprint in the manifest) keep their model and forecast; pass
+    force=True to refit everything. Returns a dict summarising the run.
+    """
+    satellite_df = load_satellite_data(columns=['date', 'District', 'ndvi']) if satellite_df is None else satellite_df
+    series = {d: s for d, s in district_series(satellite_df).items() if len(s) >= MIN_OBSERVATIONS}
+    manifest = load_manifest(forecast_dir)
+    previous = manifest['districts']
+    fingerprints = {d: series_fingerprint(s, horizon_days) for d, s in series.items()}
+    stale = [d for d in sorted(series) if force or previous.get(d, {}).get('fingerprint') != fingerprints[d]]
+    removed = sorted(set(previous) - set(series))
+
+    print(f"--- NDVI forecasts: {len(stale)} of {len(series)} districts to fit on {n_jobs} worker(s) ---")
+    start = time.perf_counter()
+    fitted, failed = {}, []
+    if n_jobs == 1:
+        outcomes = []
+        for d in stale:
+            try:
+                outcomes.append((d, fit_district(d, series[d], horizon_days), None))
+            except Exception as e:
+                outcomes.append((d, None, e))
+    else:
+        outcomes = []
+        with ProcessPoolExecutor(max_workers=n_jobs) as pool:
+            futures = {pool.submit(fit_district, d, series[d], horizon_days): d for d in stale}
+            for future in as_completed(futures):
+                try:
+                    outcomes.append((futures[future], future.result(), None))
+                except Exception as e:
+                    outcomes.append((futures[future], None, e))
+    for district, result, error in outcomes:
+        if error is not None:
+            failed.append(district)
+            print(f"  ❌ {district}: {error}")
+            continue
+        fitted[district] = result
+        print(f"  ✅ {district}: {len(series[district])} readings, fitted in {result['fit_seconds']:.2f}s")
+    wall = time.perf_counter() - start
+
+    if fitted or removed:
+        for district, result in fitted.items():
+            _write_json(json.loads(result['model_json']), params_path(district, forecast_dir))
+        for district in removed:
+            if os.path.exists(params_path(district, forecast_dir)):
+                os.remove(params_path(district, forecast_dir))
+        path = forecasts_path(forecast_dir)
+        kept = read_store(path) if os.path.exists(path) else None
+        frames = [r['forecast'] for r in fitted.values()]
+        if kept is not None:
+            kept['District'] = kept['District'].astype(str)
+            frames.insert(0, kept[~kept['District'].isin(list(fitted) + removed)])
+        forecasts = pd.concat(frames, ignore_index=True)
+        forecasts['District'] = forecasts['District'].astype('category')
+        write_store(forecasts, path, sort_by=['District', 'date'])
+
+        now = datetime.now(timezone.utc).isoformat(timespec='seconds')
+        districts = {d: rec for d, rec in previous.items() if d not in removed}
+        for district, result in fitted.items():
+            districts[district] = {
+                'fingerprint': fingerprints[district],
+                'observations': len(series[district]),
+                'last_observation': series[district]['ds'].iloc[-1].strftime('%Y-%m-%d'),
+                'horizon_days': horizon_days,
+                'fitted_at': now,
+                'fit_seconds': round(result['fit_seconds'], 3),
+            }
+        # Written last: it names what the forecasts file holds
+        _write_json({'model': 'prophet', 'updated_at': now, 'districts': districts}, manifest_path(forecast_dir))
+
+    fit_total = sum(r['fit_seconds'] for r in fitted.values())
+    print(f"✅ {len(fitted)} fitted, {len(series) - len(stale)} unchanged, {len(failed)} failed "
+          f"in {wall:.1f}s ({fit_total:.1f}s of fitting)")
+    return {'districts': len(series), 'fitted': len(fitted), 'unchanged': len(series) - len(stale),
+            'failed': failed, 'removed': removed, 'seconds': round(wall, 2), 'fit_seconds': round(fit_total, 2)}
+
+
+# --- SERVING ---
+
+class NDVIForecasts:
+    """
+    Serves the saved forecasts. Nothing is fitted here (Prophet is only
+    needed by fit_forecasts): the forecasts file is loaded into per-district
+    arrays, and each (district, horizon) response is built once and then
+    returned from a dictionary. The manifest is re-checked at most every
+    `check_interval` seconds, and a newer fit replaces everything with a
+    single assignment.
+    """
+
+    def __init__(self, forecast_dir=FORECAST_DIR, check_interval=CHECK_INTERVAL_SECONDS, clock=time.monotonic):
+        self.forecast_dir = forecast_dir
+        self.check_interval = check_interval
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._checked_at = None
+        self._state = None  # (manifest mtime, manifest, {district: arrays}, {(district, horizon): response})
+
+    def _load(self, mtime):
+        manifest = load_manifest(self.forecast_dir)
+        df = read_store(forecasts_path(self.forecast_dir))
+        series = {}
+        for district, group in df.groupby('District', observed=True):
+            group = group.sort_values('date')
+            series[str(district)] = (group['date'].dt.strftime('%Y-%m-%d').tolist(),
+                                     group[['ndvi', 'lower', 'upper']].to_numpy(dtype=np.float64).round(4))
+        return mtime, manifest, series, {}
+
+    def _current(self):
+        now = self.clock()
+        if self._checked_at is not None and now - self._checked_at < self.check_interval:
+            return self._state
+        with self._lock:
+            if self._checked_at is None or now - self._checked_at >= self.check_interval:
+                self._checked_at = now
+                try:
+                    mtime = os.path.getmtime(manifest_path(self.forecast_dir))
+                except OSError:
+                    mtime = None
+                if mtime is not None and (self._state is None or self._state[0] != mtime):
+                    try:
+                        self._state = self._load(mtime)
+                    except Exception as e:
+                        # Keep serving the previous forecasts rather than failing requests
+                        print(f"❌ Could not load NDVI forecasts: {e}")
+        return self._state
+
+    def available(self):
+        return self._current() is not None
+
+    def districts(self):
+        state = self._current()
+        return sorted(state[2]) if state else []
+
+    def get(self, district, horizon_days=MAX_HORIZON_DAYS):
+        """The forecast response for a district's next `horizon_days` days, or None if it has none."""
+        state = self._current()
+        if state is None:
+            return None
+        _, manifest, series, responses = state
+        key = (district, horizon_days)
+        response = responses.get(key)
+        if response is None:
+            if district not in series:
+                return None
+            dates, values = series[district]
+            record = manifest['districts'].get(district, {})
+            response = {
+                'district': district,
+                'model': manifest.get('model'),
+                'last_observation': record.get('last_observation'),
+                'fitted_at': record.get('fitted_at'),
+                'horizon_days': min(horizon_days, len(dates)),
+                'forecast': [{'date': d, 'ndvi': v[0], 'lower': v[1], 'upper': v[2]}
+                             for d, v in zip(dates[:horizon_days], values[:horizon_days].tolist())],
+            }
+            responses[key] = response  # Racing requests build the same value; either one is kept
+        return response
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fit per-district NDVI forecasting models in a process pool.")
+    parser.add_argument('--n-jobs', type=int, default=N_JOBS)
+    parser.add_argument('--horizon', type=int, default=MAX_HORIZON_DAYS, help="Days to forecast past the last reading")
+    parser.add_argument('--force', action='store_true', help="Refit every district, changed or not")
+    args = parser.parse_args(argv)
+    summary = fit_forecasts(n_jobs=args.n_jobs, horizon_days=args.horizon, force=args.force)
+    if summary['fitted']:
+        print(f"✅ Forecasts saved to '{FORECAST_DIR}'")
+    return summary
+
+
+if __name__ == '__main__':
+    main()
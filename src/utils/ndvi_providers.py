@@ -0,0 +1,170 @@
+# ndvi_providers.py
+
+import os
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from src.utils.satellite_data import (
+    get_ndvi_for_location, empty_ndvi_frame, DEFAULT_COLLECTION, DEFAULT_MAX_CLOUD_PCT
+)
+
+# --- CONFIGURATION ---
+# NDVI_PROVIDER picks where NDVI series come from: 'earthengine' (live),
+# 'local' (the batch-fetched file, no network) or 'synthetic' (generated, for
+# benchmarks and load tests). NDVI_OFFLINE=1 is kept as a shortcut for 'local'.
+NDVI_PROVIDER = os.getenv("NDVI_PROVIDER", "local" if os.getenv("NDVI_OFFLINE", "0") == "1" else "earthengine")
+
+DATA_DIR = 'data'
+LOCAL_NDVI_PATH = os.getenv("NDVI_LOCAL_PATH", os.path.join(DATA_DIR, 'satellite_data_all_districts.csv'))
+DISTRICTS_CSV_PATH = os.path.join(DATA_DIR, 'karnataka_districts.csv')
+
+
+class NDVIProvider:
+    """
+    Source of NDVI time series for a point and date range.
+
+    get_ndvi() has the same signature and return value as
+    satellite_data.get_ndvi_for_location: a DataFrame with 'date' (datetime64)
+    and 'ndvi' (float32) columns for [start_date, end_date), sorted by date.
+    """
+
+    name = 'base'
+
+    def get_ndvi(self, lat, lon, start_date, end_date,
+                 collection=DEFAULT_COLLECTION, max_cloud_pct=DEFAULT_MAX_CLOUD_PCT):
+        raise NotImplementedError
+
+    def __call__(self, *args, **kwargs):
+        # Lets a provider be passed anywhere a fetch function is expected
+        return self.get_ndvi(*args, **kwargs)
+
+
+class EarthEngineProvider(NDVIProvider):
+    """Live Sentinel-2 NDVI through the Earth Engine client."""
+
+    name = 'earthengine'
+
+    def get_ndvi(self, lat, lon, start_date, end_date,
+                 collection=DEFAULT_COLLECTION, max_cloud_pct=DEFAULT_MAX_CLOUD_PCT):
+        return get_ndvi_for_location(lat, lon, start_date, end_date,
+                                     collection=collection, max_cloud_pct=max_cloud_pct)
+
+
+class LocalFileProvider(NDVIProvider):
+    """
+    Serves the series of the district nearest to the requested point from a
+    local CSV or Parquet file with 'date', 'ndvi' and 'District' columns.
+    Collection and cloud filter are fixed by whatever produced the file.
+    The file is loaded once, on first use.
+    """
+
+    name = 'local'
+
+    def __init__(self, path=LOCAL_NDVI_PATH, districts_path=DISTRICTS_CSV_PATH):
+        self.path = path
+        self.districts_path = districts_path
+        self._store = None
+        self._lock = threading.Lock()
+
+    def _read_observations(self):
+        if self.path.endswith('.parquet'):
+            df = pd.read_parquet(self.path, columns=['date', 'ndvi', 'District'])
+            df['date'] = pd.to_datetime(df['date'])
+        else:
+            df = pd.read_csv(self.path, parse_dates=['date'])
+        df['District'] = df['District'].astype(str).str.strip().str.upper()
+        return df
+
+    def _load(self):
+        with self._lock:
+            if self._store is None:
+                ndvi_df = self._read_observations()
+                districts_df = pd.read_csv(self.districts_path)
+                districts_df['District'] = districts_df['District'].str.split('. ').str[-1].str.strip().str.upper()
+                series = {
+                    district: group[['date', 'ndvi']].astype({'ndvi': np.float32})
+                        .sort_values('date', kind='stable', ignore_index=True)
+                    for district, group in ndvi_df.groupby('District')
+                }
+                districts_df = districts_df[districts_df['District'].isin(series)]
+                self._store = {
+                    'series': series,
+                    'districts': districts_df['District'].to_numpy(),
+                    'coords': districts_df[['Latitude', 'Longitude']].to_numpy(dtype=np.float64),
+                }
+        return self._store
+
+    def get_ndvi(self, lat, lon, start_date, end_date,
+                 collection=DEFAULT_COLLECTION, max_cloud_pct=DEFAULT_MAX_CLOUD_PCT):
+        store = self._load()
+        if not len(store['districts']):
+            return empty_ndvi_frame()
+        nearest = np.argmin(((store['coords'] - [lat, lon]) ** 2).sum(axis=1))
+        series = store['series'][store['districts'][nearest]]
+        dates = series['date'].to_numpy()
+        lo, hi = np.searchsorted(dates, [np.datetime64(start_date), np.datetime64(end_date)])
+        return series.iloc[lo:hi].reset_index(drop=True)
+
+
+class SyntheticProvider(NDVIProvider):
+    """
+    Generates plausible NDVI series without any data files or network.
+
+    Observations fall on a fixed revisit grid (so overlapping windows agree),
+    follow a seasonal curve peaking after the monsoon, and carry deterministic
+    per-location noise. A fraction of dates is dropped to mimic cloud cover.
+    `latency_seconds` adds an artificial delay per call, to stand in for a slow
+    upstream in load tests.
+    """
+
+    name = 'synthetic'
+
+    def __init__(self, revisit_days=5, cloud_fraction=0.3, latency_seconds=0.0, seed=42):
+        self.revisit_days = revisit_days
+        self.cloud_fraction = cloud_fraction
+        self.latency_seconds = latency_seconds
+        self.seed = seed
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def get_ndvi(self, lat, lon, start_date, end_date,
+                 collection=DEFAULT_COLLECTION, max_cloud_pct=DEFAULT_MAX_CLOUD_PCT):
+        with self._lock:
+            self.calls += 1
+        if self.latency_seconds:
+            time.sleep(self.latency_seconds)
+
+        start = np.datetime64(start_date, 'D')
+        end = np.datetime64(end_date, 'D')
+        days = np.arange(start, end, dtype='datetime64[D]')
+        ordinal = days.astype(np.int64)
+        days, ordinal = days[ordinal % self.revisit_days == 0], ordinal[ordinal % self.revisit_days == 0]
+
+        # Deterministic pseudo-random values in [0, 1) per (location, date)
+        loc_key = int(round(lat * 1e4)) * 31 + int(round(lon * 1e4)) + self.seed
+        cloud = ((ordinal * 2654435761 + loc_key * 40503) % 100003) / 100003.0
+        noise = ((ordinal * 40503 + loc_key * 2654435761) % 99991) / 99991.0
+        keep = cloud >= self.cloud_fraction
+
+        doy = (days - days.astype('datetime64[Y]')).astype(np.int64) + 1
+        seasonal = 0.45 + 0.2 * np.sin(2 * np.pi * (doy - 170) / 365.25)
+        ndvi = seasonal + (noise - 0.5) * 0.1
+        return pd.DataFrame({
+            'date': pd.to_datetime(days[keep]),
+            'ndvi': np.round(ndvi[keep], 4).astype(np.float32),
+        })
+
+
+def get_provider(name=NDVI_PROVIDER, **kwargs):
+    """Creates the NDVI provider selected by name (defaults to the NDVI_PROVIDER setting)."""
+    providers = {
+        EarthEngineProvider.name: EarthEngineProvider,
+        LocalFileProvider.name: LocalFileProvider,
+        SyntheticProvider.name: SyntheticProvider,
+    }
+    if name not in providers:
+        raise ValueError(f"Unknown NDVI provider '{name}'. Use one of: {', '.join(providers)}.")
+    return providers[name](**kwargs)
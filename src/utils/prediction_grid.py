@@ -0,0 +1,157 @@
+# prediction_grid.py
+
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from types import MappingProxyType
+from typing import Mapping, NamedTuple, Optional
+
+# --- CONFIGURATION ---
+# How often the background thread rebuilds the grid (0 disables the thread and
+# the rebuilds stale lookups trigger; POST /api/prediction_grid/refresh still works).
+REFRESH_SECONDS = float(os.getenv("PREDICTION_GRID_REFRESH_SECONDS", 60 * 60))
+# Entries older than this are not served; requests fall back to a live prediction.
+MAX_AGE_SECONDS = float(os.getenv("PREDICTION_GRID_MAX_AGE_SECONDS", 3 * 60 * 60))
+
+
+class GridSnapshot(NamedTuple):
+    """One complete build of the grid. Never modified after it is published."""
+    entries: Mapping  # (district, crop) -> prediction result dict
+    errors: Mapping  # (district, crop) -> error message
+    model_version: str
+    built_at: float  # time.time() when the build finished
+    build_seconds: float
+
+
+class PredictionGrid:
+    """
+    Precomputed predictions for every (district, crop) pair the dashboard offers.
+
+    `build_fn()` computes the whole grid and returns (model_version, results),
+    where results maps (district, crop) to a result dict, or to a dict with an
+    'error' key. A daemon thread calls it every `refresh_interval` seconds, and
+    refresh() starts a build on demand. Only one build runs at a time.
+
+    A finished build is published by replacing a single reference, so readers
+    never see a half-built grid and need no lock. lookup() returns nothing
+    for entries that are older than `max_age` seconds or that were built
+    with a model version other than the one being served. In that case it
+    also starts a rebuild (only while the background thread runs: a grid
+    that was never start()ed, or has been stopped, builds only on refresh()),
+    and the caller computes the prediction live.
+
+    Each process (e.g. each gunicorn worker) keeps its own grid. Their NDVI
+    fetches go through the shared NDVI cache.
+    """
+
+    def __init__(self, build_fn, refresh_interval=REFRESH_SECONDS, max_age=MAX_AGE_SECONDS, clock=time.time):
+        self.build_fn = build_fn
+        self.refresh_interval = refresh_interval
+        self.max_age = max_age
+        self.clock = clock
+        self._snapshot: Optional[GridSnapshot] = None
+        self._building = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self.last_error = None
+
+    # --- BUILDING ---
+
+    def _build(self):
+        # Called with self._building held; releases it when done
+        start = self.clock()
+        try:
+            version, results = self.build_fn()
+            entries = {key: r for key, r in results.items() if 'error' not in r}
+            errors = {key: r['error'] for key, r in results.items() if 'error' in r}
+            end = self.clock()
+            self._snapshot = GridSnapshot(MappingProxyType(entries), MappingProxyType(errors), version,
+                                          end, end - start)
+            self.last_error = None
+            print(f"✅ Prediction grid refreshed: {len(entries)} predictions, {len(errors)} errors "
+                  f"({end - start:.1f}s, model {version})")
+        except Exception as e:
+            # Keep serving the previous snapshot (or live predictions) rather than failing
+            self.last_error = str(e)
+            print(f"❌ Prediction grid refresh failed: {e}")
+        finally:
+            self._building.release()
+
+    def refresh(self, wait=False):
+        """
+        Starts a rebuild unless one is already running. Returns True if this
+        call started it. With wait=True the build runs in the calling thread.
+        """
+        if not self._building.acquire(blocking=False):
+            return False
+        if wait:
+            self._build()
+        else:
+            threading.Thread(target=self._build, name='prediction-grid-refresh', daemon=True).start()
+        return True
+
+    def start(self):
+        """Builds the grid in the background now and then every `refresh_interval` seconds."""
+        if self.refresh_interval <= 0 or self._thread is not None:
+            return self
+
+        stop = self._stop = threading.Event()
+
+        def run():
+            while True:
+                if self._building.acquire(blocking=False):
+                    self._build()
+                if stop.wait(self.refresh_interval):
+                    return
+
+        self._thread = threading.Thread(target=run, name='prediction-grid', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Ends the background thread (after the build in progress, if any); start() may be called again."""
+        self._stop.set()
+        self._thread = None
+
+    # --- SERVING ---
+
+    @property
+    def snapshot(self) -> Optional[GridSnapshot]:
+        return self._snapshot
+
+    def age(self, snapshot=None):
+        snapshot = snapshot or self._snapshot
+        return None if snapshot is None else self.clock() - snapshot.built_at
+
+    def is_fresh(self, model_version, snapshot=None):
+        snapshot = snapshot or self._snapshot
+        return (snapshot is not None and snapshot.model_version == model_version
+                and self.age(snapshot) <= self.max_age)
+
+    def lookup(self, district, crop, model_version):
+        """(result dict, age in seconds) from a fresh snapshot, or (None, None)."""
+        snapshot = self._snapshot
+        if not self.is_fresh(model_version, snapshot):
+            if self._thread is not None:
+                self.refresh()
+            return None, None
+        entry = snapshot.entries.get((district, crop))
+        return (entry, self.age(snapshot)) if entry is not None else (None, None)
+
+    def status(self, model_version=None):
+        snapshot = self._snapshot
+        status = {'refreshing': self._building.locked(), 'refresh_interval_seconds': self.refresh_interval,
+                  'max_age_seconds': self.max_age, 'last_error': self.last_error, 'built_at': None}
+        if snapshot is not None:
+            age = self.age(snapshot)
+            status.update({
+                'built_at': datetime.fromtimestamp(snapshot.built_at, timezone.utc).isoformat(timespec='seconds'),
+                'age_seconds': round(age, 1),
+                'stale': not self.is_fresh(model_version or snapshot.model_version, snapshot),
+                'model_version': snapshot.model_version,
+                'build_seconds': round(snapshot.build_seconds, 2),
+                'predictions': len(snapshot.entries),
+                'errors': len(snapshot.errors),
+            })
+        return status
@@ -1,41 +1,152 @@
-# prepare_yield_data.py (Final Version)
+# prepare_yield_data.py (Streaming wide-to-long transform)
 import pandas as pd
+import numpy as np
 import os
+import re
+from itertools import islice
+
+from src.utils.data_store import clean_yield_frame, write_store, YIELD_STORE_PATH
 
 DATA_DIR = 'data'
 # Looks for the raw file inside the 'data' folder now
 INPUT_CSV_NAME = os.path.join(DATA_DIR, 'historical_data_2010-2020.csv')
+INPUT_XLSX_NAME = INPUT_CSV_NAME.replace('.csv', '.xlsx')
 TIDY_CSV_PATH = os.path.join(DATA_DIR, 'yield_data_tidy.csv')
 
-print(f"Reading and transforming '{INPUT_CSV_NAME}'...")
-try:
-    # Reads the first 3 rows as the headers
-    df = pd.read_excel(INPUT_CSV_NAME.replace('.csv', '.xlsx'), header=[0, 1, 2])
-    
-    # Flatten the multi-level headers
-    df.columns = ['_'.join(str(c) for c in col).strip() for col in df.columns]
-
-    # Select only the ID and Yield columns
-    id_cols = df.columns[:3].tolist()
-    yield_cols = [col for col in df.columns if 'Yield' in col]
-    df_yields = df[id_cols + yield_cols]
-    
-    # Transform from wide to long format
-    df_long = pd.melt(df_yields, id_vars=id_cols, var_name='Crop_Info', value_name='Yield')
-    
-    # Final Cleaning
-    df_long[['Crop', 'Season', 'Metric']] = df_long['Crop_Info'].str.split('_', expand=True)
-    df_long.rename(columns={id_cols[0]: 'State', id_cols[1]: 'District', id_cols[2]: 'Year'}, inplace=True)
-    df_final = df_long[['State', 'District', 'Year', 'Crop', 'Season', 'Yield']]
-    df_final['State'] = df_final['State'].ffill()
-    df_final['District'] = df_final['District'].ffill()
-    df_final['State'] = df_final['State'].str.split('. ').str[-1].str.strip()
-    df_final['District'] = df_final['District'].str.split('. ').str[-1].str.strip()
-    df_final.dropna(subset=['Yield'], inplace=True)
-    df_final = df_final[df_final['Yield'] != 0].copy()
-
-    # Save the final clean file
-    df_final.to_csv(TIDY_CSV_PATH, index=False)
-    print(f"\n✅✅✅ Success! Final clean file saved to '{TIDY_CSV_PATH}'")
-except Exception as e:
-    print(f"An unexpected error occurred: {e}")
\ No newline at end of file
+HEADER_ROWS = 3      # Crop, Season, Metric
+ID_COLUMNS = 3       # State, District, Year
+CHUNK_ROWS = 2000    # Sheet rows held in memory at a time
+OUTPUT_COLUMNS = ['State', 'District', 'Year', 'Crop', 'Season', 'Yield']
+
+
+def _iter_sheet_rows(path):
+    """Yields the raw sheet row by row (header rows included) as tuples of cell values."""
+    if path.endswith('.xlsx'):
+        from openpyxl import load_workbook
+        workbook = load_workbook(path, read_only=True, data_only=True)
+        try:
+            yield from workbook.active.iter_rows(values_only=True)
+        finally:
+            workbook.close()
+    else:
+        import csv
+        with open(path, newline='', encoding='utf-8-sig') as f:
+            yield from csv.reader(f)
+
+
+def _blank(value):
+    return value is None or (isinstance(value, float) and np.isnan(value)) or str(value).strip() == ''
+
+
+def parse_header(header_rows):
+    """
+    Reads the three header rows once and returns the column positions holding
+    yields, with the crop and season of each. Crop and season are written only
+    on the first column of their (merged) block, so they are carried forward.
+    """
+    crop = season = None
+    positions, crops, seasons = [], [], []
+    for i, (c, s, metric) in enumerate(zip(*header_rows)):
+        if i < ID_COLUMNS:
+            continue
+        if not _blank(c):
+            crop, season = str(c).strip(), None
+        if not _blank(s):
+            season = str(s).strip()
+        if not _blank(metric) and str(metric).strip().startswith('Yield'):
+            positions.append(i)
+            crops.append(crop)
+            seasons.append(season)
+    return np.array(positions), np.array(crops, dtype=object), np.array(seasons, dtype=object)
+
+
+def _to_numeric(values):
+    """Cell values (numbers, or strings like '11,231.00' from the CSV export) to float64."""
+    flat = pd.Series(values.ravel(), dtype=object)
+    as_text = flat.map(lambda v: v.replace(',', '') if isinstance(v, str) else v)
+    return pd.to_numeric(as_text, errors='coerce').to_numpy(dtype=np.float64).reshape(values.shape)
+
+
+def _id_name(value):
+    # '1. Bagalkot' -> 'Bagalkot'. Same regex split as pandas' str.split('. '),
+    # which the districts and satellite tables also go through, so names join.
+    return re.split('. ', str(value))[-1].strip()
+
+
+def tidy_yield_data(input_path=INPUT_CSV_NAME, output_path=TIDY_CSV_PATH,
+                    chunk_rows=CHUNK_ROWS, store_path=YIELD_STORE_PATH):
+    """
+    Converts the wide multi-header yield sheet (.xlsx or its .csv export) into
+    the tidy State/District/Year/Crop/Season/Yield table.
+
+    The sheet is streamed `chunk_rows` rows at a time: only the yield cells of
+    each chunk are parsed, empty and zero yields are dropped before any long
+    rows are built, and each chunk is appended to the output straight away, so
+    memory stays bounded by the chunk rather than by rows x crop columns.
+    State and District are carried forward across chunks. The output is written
+    to a temporary file and moved into place at the end. With `store_path`, the
+    typed columnar copy is written too. Returns a dict summarising the run.
+    """
+    rows = _iter_sheet_rows(input_path)
+    positions, crops, seasons = parse_header(list(islice(rows, HEADER_ROWS)))
+    if not len(positions):
+        raise ValueError(f"No yield columns found in the header of '{input_path}'.")
+
+    tmp_path = output_path + '.tmp'
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    summary = {'rows': 0, 'cells': 0, 'records': 0}
+    state = district = None
+    width = positions[-1] + 1  # Cells past the last yield column are never read
+
+    while True:
+        chunk = list(islice(rows, chunk_rows))
+        if not chunk:
+            break
+        cells = np.array([tuple(row[:width]) + (None,) * (width - len(row)) for row in chunk], dtype=object)
+
+        # Carry State/District forward (they are only written on a block's first row)
+        states, districts = np.empty(len(chunk), dtype=object), np.empty(len(chunk), dtype=object)
+        for i, (s, d) in enumerate(zip(cells[:, 0], cells[:, 1])):
+            state = state if _blank(s) else _id_name(s)
+            district = district if _blank(d) else _id_name(d)
+            states[i], districts[i] = state, district
+        years = np.array([None if _blank(y) else str(y).strip() for y in cells[:, 2]], dtype=object)
+
+        yields = _to_numeric(cells[:, positions])
+        row_idx, col_idx = np.nonzero(~np.isnan(yields) & (yields != 0))
+
+        out = pd.DataFrame({
+            'State': states[row_idx],
+            'District': districts[row_idx],
+            'Year': years[row_idx],
+            'Crop': crops[col_idx],
+            'Season': seasons[col_idx],
+            'Yield': yields[row_idx, col_idx],
+        }, columns=OUTPUT_COLUMNS)
+        out.to_csv(tmp_path, mode='a', header=not os.path.exists(tmp_path), index=False)
+
+        summary['rows'] += len(chunk)
+        summary['cells'] += yields.size
+        summary['records'] += len(out)
+
+    if not os.path.exists(tmp_path):
+        pd.DataFrame(columns=OUTPUT_COLUMNS).to_csv(tmp_path, index=False)
+    os.replace(tmp_path, output_path)
+
+    if store_path:
+        # The tidy table is small once empty cells are gone, so this reads it whole
+        write_store(clean_yield_frame(pd.read_csv(output_path)), store_path)
+    return summary
+
+
+if __name__ == '__main__':
+    input_path = INPUT_XLSX_NAME if os.path.exists(INPUT_XLSX_NAME) else INPUT_CSV_NAME
+    print(f"Reading and transforming '{input_path}'...")
+    try:
+        summary = tidy_yield_data(input_path)
+        print(f"   {summary['rows']} sheet rows, {summary['cells']} yield cells -> {summary['records']} records")
+        print(f"\n✅✅✅ Success! Final clean file saved to '{TIDY_CSV_PATH}'")
+        print(f"✅ Columnar copy saved to '{YIELD_STORE_PATH}'")
+    except Exception as e:
+        print(f"An unexpected error occurred: {e}")
@@ -0,0 +1,353 @@
+# reports.py (Downloadable PDF reports, rendered in a process pool and cached on disk)
+
+import hashlib
+import json
+import os
+import re
+import textwrap
+import threading
+import time
+import uuid
+import zipfile
+from concurrent.futures import Future, ProcessPoolExecutor, as_completed
+from datetime import datetime, timezone
+
+# --- PATHS ---
+DATA_DIR = 'data'
+REPORT_DIR = os.path.join(DATA_DIR, 'reports')
+
+# --- CONFIGURATION ---
+FORMAT_VERSION = 1  # Bump when the layout changes, so cached reports are rendered again
+WORKERS = int(os.getenv("REPORT_WORKERS", max(1, min(4, (os.cpu_count() or 1) - 1))))
+MAX_FILES = int(os.getenv("REPORT_CACHE_MAX_FILES", 2000))  # Oldest reports are deleted beyond this
+EXPORTS_KEPT = 3  # Bulk export archives kept on disk
+# How long GET /api/report waits for a render before answering 202
+WAIT_SECONDS = float(os.getenv("REPORT_WAIT_SECONDS", 10))
+
+RISK_COLORS = {'Low': '#16a34a', 'Medium': '#f59e0b', 'High': '#ef4444'}
+
+
+def report_key(data):
+    """
+    The content address of a report: a hash of everything printed in it
+    (prediction, model version, statistics, NDVI series, ...) and the layout
+    version. The same inputs always give the same key, and so the same file.
+    """
+    payload = json.dumps({'format_version': FORMAT_VERSION, 'data': data}, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(payload.encode()).hexdigest()[:32]
+
+
+def _write_json(obj, path):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(obj, f, indent=1)
+    os.replace(tmp_path, path)
+
+
+def _plain(text):
+    """The dashboard's markdown-ish text as plain text: no ** markers or emoji (the PDF font has none)."""
+    return re.sub(r'[\U0001F000-\U0001FAFF\u2600-\u27BF\uFE0F]', '', text.replace('**', '')).strip()
+
+
+# --- RENDERING (runs in the worker processes) ---
+
+def render_report(data, path):
+    """
+    Renders one report as a single A4 page PDF at `path` (written to a
+    temporary file and renamed, so a half-written report is never served).
+    `data` is the dict built by app.build_report_data. Returns the path.
+    """
+    from matplotlib.figure import Figure
+
+    prediction, stats, risk = data['prediction'], data['historical'], data['risk']
+    fig = Figure(figsize=(8.27, 11.69))
+    fig.text(0.06, 0.955, f"AgriSense Yield Report: {data['district']} / {data['crop']}", fontsize=17,
+             fontweight='bold')
+    fig.text(0.06, 0.935, f"{prediction['season']} season, as of {data['as_of']}, model {data['model_version']}",
+             fontsize=9, color='#6b7280')
+
+    # Headline numbers
+    z = prediction.get('ndvi_z_score')
+    cards = [
+        ('Predicted yield', f"{prediction['predicted_yield']:.2f} Kg/Ha", '#1f2937'),
+        ('Historical average', f"{stats['avg_yield']:.2f} Kg/Ha", '#1f2937'),
+        ('Risk level', risk['level'], RISK_COLORS.get(risk['level'], '#1f2937')),
+        ('Current NDVI', f"{prediction['current_avg_ndvi']:.3f}" + ('' if z is None else f" (z {z:+.2f})"), '#1f2937'),
+    ]
+    for i, (label, value, color) in enumerate(cards):
+        x = 0.06 + i * 0.225
+        fig.text(x, 0.9, label, fontsize=8.5, color='#6b7280')
+        fig.text(x, 0.877, value, fontsize=12.5, fontweight='bold', color=color)
+    fig.text(0.06, 0.855, f"Historical range {stats['min_yield']:.2f} to {stats['max_yield']:.2f} Kg/Ha "
+                          f"over {stats['records']} records", fontsize=8.5, color='#6b7280')
+
+    # NDVI series of the current agricultural year
+    ax = fig.add_axes([0.09, 0.6, 0.85, 0.21])
+    series = data['ndvi_series']
+    if series:
+        dates = [datetime.strptime(d, '%Y-%m-%d') for d, _ in series]
+        ax.plot(dates, [v for _, v in series], color='#17cf17', marker='o', markersize=2.5, linewidth=1.2)
+        fig.autofmt_xdate()
+    else:
+        ax.text(0.5, 0.5, 'No satellite readings yet this season', ha='center', va='center',
+                transform=ax.transAxes, color='#6b7280')
+    ax.axhline(risk['ndvi_threshold'], color='#ef4444', linestyle='--', linewidth=0.8)
+    ax.set_ylim(0, 1)
+    ax.set_ylabel('NDVI')
+    ax.set_title('Satellite vegetation index (NDVI)', fontsize=10, loc='left')
+    ax.grid(alpha=0.3)
+
+    # Risk breakdown: the prediction against the thresholds calculate_risk_level uses
+    ax = fig.add_axes([0.09, 0.47, 0.85, 0.06])
+    thresholds = risk['thresholds']
+    top = max(prediction['predicted_yield'], stats['max_yield'], thresholds['medium_below']) * 1.05 or 1.0
+    ax.barh(0, thresholds['high_below'], color=RISK_COLORS['High'], alpha=0.25)
+    ax.barh(0, thresholds['medium_below'] - thresholds['high_below'], left=thresholds['high_below'],
+            color=RISK_COLORS['Medium'], alpha=0.25)
+    ax.barh(0, top - thresholds['medium_below'], left=thresholds['medium_below'], color=RISK_COLORS['Low'], alpha=0.25)
+    ax.axvline(prediction['predicted_yield'], color='#1f2937', linewidth=2)
+    ax.set_xlim(0, top)
+    ax.set_yticks([])
+    ax.set_xlabel('Kg/Ha')
+    ax.set_title('Risk breakdown: predicted yield against the historical average', fontsize=10, loc='left')
+    y = 0.415
+    for factor in risk['factors']:
+        fig.text(0.06, y, f"- {factor}", fontsize=9)
+        y -= 0.02
+
+    # What moved the forecast, when the model supports attributions
+    explanation = prediction.get('explanation')
+    if explanation:
+        top_inputs = explanation['attributions'][:6][::-1]
+        ax = fig.add_axes([0.34, y - 0.15, 0.6, 0.13])
+        values = [a['contribution'] for a in top_inputs]
+        ax.barh(range(len(values)), values, color=['#16a34a' if v >= 0 else '#ef4444' for v in values])
+        ax.set_yticks(range(len(values)), [f"{a['label']} ({a['value']})" for a in top_inputs], fontsize=8)
+        ax.axvline(0, color='#1f2937', linewidth=0.8)
+        ax.set_xlabel(f"Kg/Ha, from an expected value of {explanation['expected_value']:.2f}", fontsize=8)
+        ax.set_title('Inputs that moved this forecast', fontsize=10, loc='left')
+        y -= 0.2
+
+    lines = []
+    for paragraph in _plain(data['credibility_statement']).split('\n'):
+        lines += textwrap.wrap(paragraph.strip(), 110) or ['']
+    fig.text(0.06, y, '\n'.join(lines), fontsize=8.5, va='top', linespacing=1.5)
+
+    tmp_path = os.path.join(os.path.dirname(path), f".{os.path.basename(path)}.tmp")
+    fig.savefig(tmp_path, format='pdf', metadata={'Title': f"AgriSense report {data['district']} {data['crop']}"})
+    os.replace(tmp_path, path)
+    return path
+
+
+def _start_worker():
+    """Imports matplotlib in a new worker, so the first report doesn't."""
+    import matplotlib.figure  # noqa: F401
+    return os.getpid()
+
+
+# --- SERVING ---
+
+class ReportRenderer:
+    """
+    Renders reports in a pool of `workers` processes and keeps them on disk
+    under their content address (report_key), so a report whose inputs
+    haven't changed is served from its file without rendering anything.
+    Concurrent requests for the same report share one render.
+
+    Nothing is created until start() is called: it makes the report
+    directories and forks the pool's processes, so call it before starting
+    other threads (e.g. the prediction grid's). stop() shuts the pool down;
+    until the renderer is started again, reports not already on disk raise
+    RuntimeError.
+
+    export() builds one ZIP archive of many reports in a background thread,
+    one export at a time per process. Its progress is kept in a JSON file
+    next to the archive, so any web worker process can report on it.
+    """
+
+    def __init__(self, report_dir=REPORT_DIR, workers=WORKERS, max_files=MAX_FILES):
+        self.report_dir = report_dir
+        self.export_dir = os.path.join(report_dir, 'exports')
+        self.workers = workers
+        self.max_files = max_files
+        self._pool = None
+        self._lock = threading.Lock()
+        self._rendering = {}  # key -> Future of its path
+        self._export = None  # Status dict of the export running in this process
+        self.rendered = 0
+        self.served_from_disk = 0
+
+    def start(self):
+        """Creates the report directories and forks the render workers."""
+        os.makedirs(self.export_dir, exist_ok=True)
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self.workers)
+                self._pool.submit(_start_worker)
+        return self
+
+    def stop(self):
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    def path(self, key):
+        return os.path.join(self.report_dir, f"{key}.pdf")
+
+    def submit(self, data):
+        """(key, Future of the report's path) for a report's data; already rendered reports complete at once."""
+        key = report_key(data)
+        path = self.path(key)
+        with self._lock:
+            future = self._rendering.get(key)
+            if future is not None:
+                return key, future
+            if os.path.exists(path):
+                self.served_from_disk += 1
+                future = Future()
+                future.set_result(path)
+                return key, future
+            if self._pool is None:
+                raise RuntimeError("The report renderer is not running.")
+            future = self._pool.submit(render_report, data, path)
+            self._rendering[key] = future
+        future.add_done_callback(lambda f: self._finished(key, f))
+        return key, future
+
+    def _finished(self, key, future):
+        with self._lock:
+            self._rendering.pop(key, None)
+            if future.exception() is None:
+                self.rendered += 1
+        if future.exception() is None:
+            self._prune()
+
+    def _prune(self):
+        """Deletes the least recently written reports beyond max_files."""
+        try:
+            entries = [e for e in os.scandir(self.report_dir) if e.is_file() and e.name.endswith('.pdf')]
+        except FileNotFoundError:
+            return
+        if len(entries) <= self.max_files:
+            return
+        entries.sort(key=lambda e: e.stat().st_mtime)
+        for entry in entries[:len(entries) - self.max_files]:
+            try:
+                os.remove(entry.path)
+            except FileNotFoundError:
+                pass  # Another process pruned it first
+
+    # --- BULK EXPORT ---
+
+    def job_path(self, job_id):
+        return os.path.join(self.export_dir, f"{job_id}.json")
+
+    def job(self, job_id):
+        """An export job's status dict, or None for unknown ids."""
+        if not re.fullmatch(r'[0-9a-f]{32}', job_id or ''):
+            return None
+        try:
+            with open(self.job_path(job_id)) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def export(self, build_reports):
+        """
+        Starts a bulk export and returns its job status dict at once. While
+        an export is running, returns that job's status instead of starting
+        another. Raises RuntimeError if the renderer is not running.
+
+        `build_reports()` runs in a background thread and yields
+        (archive name, report data) pairs, or (archive name, exception) for
+        reports that could not be built; every report is rendered in the
+        pool (or found on disk) and added to one ZIP archive, which is itself
+        named after its reports' keys, so an unchanged export is not zipped again.
+        """
+        with self._lock:
+            if self._pool is None:
+                raise RuntimeError("The report renderer is not running.")
+            if self._export is not None:
+                return dict(self._export, failed=list(self._export['failed']))
+            job = self._export = {
+                'job_id': uuid.uuid4().hex, 'status': 'running', 'total': None, 'done': 0, 'failed': [],
+                'archive': None, 'started_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+                'seconds': None, 'error': None}
+            _write_json(job, self.job_path(job['job_id']))
+        threading.Thread(target=self._run_export, args=(job, build_reports), name='report-export',
+                         daemon=True).start()
+        return dict(job)
+
+    def _run_export(self, job, build_reports):
+        start = time.perf_counter()
+        try:
+            futures = {}
+            for name, data in build_reports():
+                if isinstance(data, Exception):
+                    job['failed'].append({'name': name, 'error': str(data)})
+                    continue
+                try:
+                    key, future = self.submit(data)
+                except Exception as e:
+                    job['failed'].append({'name': name, 'error': str(e)})
+                    continue
+                futures[future] = (name, key)
+            job['total'] = len(futures) + len(job['failed'])
+            _write_json(job, self.job_path(job['job_id']))
+
+            rendered = []
+            for n, future in enumerate(as_completed(futures), 1):
+                name, key = futures[future]
+                try:
+                    rendered.append((name, future.result()))
+                except Exception as e:
+                    job['failed'].append({'name': name, 'error': str(e)})
+                job['done'] = n
+                if n % 25 == 0:
+                    _write_json(job, self.job_path(job['job_id']))
+
+            rendered.sort()
+            archive_key = hashlib.sha256(
+                json.dumps([(name, os.path.basename(path)) for name, path in rendered]).encode()).hexdigest()[:32]
+            archive = os.path.join(self.export_dir, f"reports-{archive_key}.zip")
+            if not os.path.exists(archive):
+                tmp_path = os.path.join(self.export_dir, f".{os.path.basename(archive)}.tmp")
+                with zipfile.ZipFile(tmp_path, 'w', zipfile.ZIP_STORED) as zf:  # PDFs are already compressed
+                    for name, path in rendered:
+                        zf.write(path, name)
+                os.replace(tmp_path, archive)
+            os.utime(archive)
+            job.update(status='done', archive=os.path.basename(archive))
+            self._prune_exports()
+            print(f"✅ Report export {job['job_id']}: {len(rendered)} reports, {len(job['failed'])} failed")
+        except Exception as e:
+            job.update(status='failed', error=str(e))
+            print(f"❌ Report export {job['job_id']} failed: {e}")
+        job['seconds'] = round(time.perf_counter() - start, 2)
+        try:
+            _write_json(job, self.job_path(job['job_id']))
+        finally:
+            with self._lock:
+                self._export = None  # Even if the status file can't be written, so exports aren't blocked
+
+    def _prune_exports(self):
+        archives = sorted((e for e in os.scandir(self.export_dir) if e.name.endswith('.zip')),
+                          key=lambda e: e.stat().st_mtime)
+        for entry in archives[:-EXPORTS_KEPT]:
+            try:
+                os.remove(entry.path)
+            except FileNotFoundError:
+                pass
+
+    def archive_path(self, job):
+        """Path of a finished job's archive, or None if it isn't finished or has been pruned since."""
+        if job.get('archive') is None:
+            return None
+        path = os.path.join(self.export_dir, job['archive'])
+        return path if os.path.exists(path) else None
+
+    def stats(self):
+        with self._lock:
+            return {'workers': self.workers, 'rendering': len(self._rendering), 'rendered': self.rendered,
+                    'served_from_disk': self.served_from_disk}
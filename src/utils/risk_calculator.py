@@ -1,6 +1,8 @@
 import numpy as np
 import pandas as pd
-from typing import Dict, Any
+from typing import Dict, Any, Union
+
+ArrayLike = Union[np.ndarray, pd.Series, list, float]
 
 # --- DYRS CALCULATION UTILITIES ---
 
@@ -76,6 +78,80 @@ def score_to_risk_level(score: float) -> str:
     else:
         return 'HIGH RISK'
 
+# --- VECTORIZED (PORTFOLIO) SCORING ---
+# Array versions of the two functions above, for scoring many plots in one pass.
+# They apply the same float64 operations in the same order, so every element
+# matches what the scalar functions return for that row.
+
+DYRS_INPUT_COLUMNS = ['predicted_yield', 'historical_avg_yield', 'historical_yield_cv', 'ndvi_z_score']
+
+
+def calculate_full_dyrs_array(
+    predicted_yield: ArrayLike,
+    historical_avg_yield: ArrayLike,
+    historical_yield_cv: ArrayLike,
+    ndvi_z_score: ArrayLike,
+    base_score: int = 50
+) -> Dict[str, np.ndarray]:
+    """
+    Vectorized calculate_full_dyrs. Inputs are broadcast together and the
+    result holds one float64 array per breakdown key.
+    """
+    predicted_yield = np.asarray(predicted_yield, dtype=np.float64)
+    historical_avg_yield = np.asarray(historical_avg_yield, dtype=np.float64)
+    historical_yield_cv = np.asarray(historical_yield_cv, dtype=np.float64)
+    ndvi_z_score = np.asarray(ndvi_z_score, dtype=np.float64)
+
+    # 1. YIELD ACCURACY INDEX (60% Weight)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        yield_dev_pct = (predicted_yield - historical_avg_yield) / historical_avg_yield
+    yield_accuracy_score = np.clip(yield_dev_pct, -0.2, 0.2) * 300
+
+    # 2. ANOMALY STRESS FACTOR (30% Weight)
+    anomaly_penalty = np.select([ndvi_z_score <= -2.0, ndvi_z_score <= -1.0], [30.0, 15.0], default=0.0)
+
+    # 3. HISTORICAL VOLATILITY PENALTY (10% Weight)
+    volatility_penalty = historical_yield_cv * 25
+
+    # 4. FINAL DYRS CALCULATION
+    dyrs = base_score + yield_accuracy_score - anomaly_penalty - volatility_penalty
+    final_dyrs = np.clip(dyrs, 0, 100)
+
+    shape = np.broadcast(yield_accuracy_score, anomaly_penalty, volatility_penalty).shape
+    return {
+        'Yield_Index_Points': np.broadcast_to(yield_accuracy_score, shape),
+        'Anomaly_Penalty': np.broadcast_to(anomaly_penalty, shape),
+        'Volatility_Penalty': np.broadcast_to(volatility_penalty, shape),
+        'Final_DYRS': final_dyrs,
+    }
+
+
+def scores_to_risk_levels(scores: ArrayLike) -> np.ndarray:
+    """Vectorized score_to_risk_level."""
+    scores = np.asarray(scores, dtype=np.float64)
+    return np.select([scores >= 75, scores >= 50], ['LOW RISK', 'MODERATE RISK'], default='HIGH RISK')
+
+
+def calculate_portfolio_dyrs(portfolio: pd.DataFrame, base_score: int = 50) -> pd.DataFrame:
+    """
+    Scores a whole portfolio at once.
+
+    Args:
+        portfolio (pd.DataFrame): One row per plot with the DYRS_INPUT_COLUMNS.
+        base_score (int): The neutral starting score (default 50).
+
+    Returns:
+        pd.DataFrame: The breakdown columns plus 'Risk_Level', on the portfolio's index.
+    """
+    missing = [col for col in DYRS_INPUT_COLUMNS if col not in portfolio.columns]
+    if missing:
+        raise KeyError(f"Portfolio is missing DYRS input columns: {missing}")
+    breakdown = calculate_full_dyrs_array(*(portfolio[col].to_numpy() for col in DYRS_INPUT_COLUMNS),
+                                          base_score=base_score)
+    result = pd.DataFrame(breakdown, index=portfolio.index)
+    result['Risk_Level'] = scores_to_risk_levels(result['Final_DYRS'].to_numpy())
+    return result
+
 if __name__ == '__main__':
     # Simple test case: A healthy farm with a good prediction.
     test_score = calculate_full_dyrs(
@@ -1,67 +1,129 @@
-import ee
-
-# This function initializes the Earth Engine API.
-# It's good practice to have it handle potential initialization errors.
-try:
-    ee.Initialize()
-    print("Earth Engine initialized successfully.")
-except Exception as e:
-    print(f"Warning: Could not initialize Earth Engine. Attempting authentication...")
-    try:
-        ee.Authenticate()
-        ee.Initialize()
-        print("Earth Engine authenticated and initialized successfully.")
-    except Exception as auth_e:
-        print(f"Fatal Error: Could not authenticate or initialize Earth Engine: {auth_e}")
+import os
+import sys
+import threading
+
+import numpy as np
+import pandas as pd
+
+# --- CONFIGURATION ---
+# The browser-based ee.Authenticate() flow would hang a web server, so it is only
+# attempted from an interactive terminal unless EE_INTERACTIVE_AUTH says otherwise.
+INTERACTIVE_AUTH = os.getenv("EE_INTERACTIVE_AUTH", "1" if sys.stdin and sys.stdin.isatty() else "0") == "1"
+
+
+class EarthEngineUnavailable(RuntimeError):
+    """Raised when the Earth Engine client cannot be initialized."""
 
 
-def get_ndvi_for_location(lat, lon, start_date, end_date):
+_ee_module = None
+_ee_lock = threading.Lock()
+
+
+def get_ee():
     """
-    Fetches a time series of NDVI values for a specific location and date range.
-    Returns a list of dictionaries, e.g., [{'date': 'YYYY-MM-DD', 'ndvi': 0.75}].
+    Returns the initialized `ee` module, importing and initializing it on first
+    use. Thread-safe: concurrent first calls initialize the client only once.
+    A failed initialization is retried on the next call.
     """
-    point = ee.Geometry.Point(lon, lat)
+    global _ee_module
+    if _ee_module is not None:
+        return _ee_module
+    with _ee_lock:
+        if _ee_module is not None:
+            return _ee_module
+        try:
+            import ee
+        except ImportError as e:
+            raise EarthEngineUnavailable("The earthengine-api package is not installed.") from e
+        try:
+            ee.Initialize()
+            print("Earth Engine initialized successfully.")
+        except Exception as e:
+            if not INTERACTIVE_AUTH:
+                raise EarthEngineUnavailable(f"Could not initialize Earth Engine: {e}") from e
+            print("Warning: Could not initialize Earth Engine. Attempting authentication...")
+            try:
+                ee.Authenticate()
+                ee.Initialize()
+                print("Earth Engine authenticated and initialized successfully.")
+            except Exception as auth_e:
+                raise EarthEngineUnavailable(
+                    f"Could not authenticate or initialize Earth Engine: {auth_e}") from auth_e
+        _ee_module = ee
+        return _ee_module
 
-    # Use the newer, harmonized Sentinel-2 dataset for better results
-    s2 = ee.ImageCollection('COPERNICUS/S2_SR_HARMONIZED') \
-        .filterBounds(point) \
-        .filterDate(start_date, end_date) \
-        .filter(ee.Filter.lt('CLOUDY_PIXEL_PERCENTAGE', 20)) # Filter for clear images
 
-    def add_ndvi(image):
-        """A function to calculate and add an NDVI band to an image."""
-        ndvi = image.normalizedDifference(['B8', 'B4']).rename('NDVI')
-        return image.addBands(ndvi)
+# Use the newer, harmonized Sentinel-2 dataset for better results
+DEFAULT_COLLECTION = 'COPERNICUS/S2_SR_HARMONIZED'
+DEFAULT_MAX_CLOUD_PCT = 20
 
-    ndvi_col = s2.map(add_ndvi)
 
-    # getInfo() returns a standard Python object (usually a list of lists)
-    ndvi_values = ndvi_col.select('NDVI').getRegion(point, 10).getInfo()
+def empty_ndvi_frame():
+    """The NDVI series returned when no observations are available."""
+    return pd.DataFrame({'date': np.array([], dtype='datetime64[ns]'),
+                         'ndvi': np.array([], dtype=np.float32)})
 
-    # --- THIS IS THE KEY FIX ---
-    # The error you saw happens when an 'if' statement is used on a whole table of data.
-    # The code below correctly checks if the returned list has any data rows before processing.
+
+def parse_region_response(ndvi_values):
+    """
+    Converts a getRegion() payload (a header row followed by data rows) into a
+    DataFrame with a datetime64 'date' column and a float32 'ndvi' column.
+    The 'time' column holds epoch milliseconds, so dates are derived locally
+    instead of asking Earth Engine to format each one.
+    """
+    # The code below checks that the returned list has any data rows before processing.
     if not ndvi_values or len(ndvi_values) < 2:
-        return []  # Return an empty list if no data was found
+        return empty_ndvi_frame()
 
-    # --- Robust Data Parsing ---
     header = ndvi_values[0]
     try:
         time_index = header.index('time')
         ndvi_index = header.index('NDVI')
     except ValueError:
         # This handles cases where the expected columns aren't in the data
-        return []
+        return empty_ndvi_frame()
+
+    rows = ndvi_values[1:]  # Skip the header row
+    times = np.array([row[time_index] for row in rows], dtype=np.int64)
+    ndvi = np.array([row[ndvi_index] for row in rows], dtype=np.float64)  # None becomes NaN
+
+    valid = ~np.isnan(ndvi)
+    # Truncate the UTC timestamps to calendar days, same as ee.Date(...).format('YYYY-MM-dd')
+    dates = times[valid].astype('datetime64[ms]').astype('datetime64[D]')
+    df = pd.DataFrame({
+        'date': pd.to_datetime(dates),
+        # Round the NDVI value for cleaner data
+        'ndvi': np.round(ndvi[valid], 4).astype(np.float32),
+    })
+    return df.sort_values('date', kind='stable', ignore_index=True)
 
-    ndvi_list = []
-    for row in ndvi_values[1:]:  # Skip the header row
-        date = ee.Date(row[time_index]).format('YYYY-MM-dd').getInfo()
-        ndvi = row[ndvi_index]
-        if ndvi is not None:
-            # Round the NDVI value for cleaner data
-            ndvi_list.append({'date': date, 'ndvi': round(ndvi, 4)})
 
-    return ndvi_list
+def get_ndvi_for_location(lat, lon, start_date, end_date,
+                          collection=DEFAULT_COLLECTION, max_cloud_pct=DEFAULT_MAX_CLOUD_PCT):
+    """
+    Fetches a time series of NDVI values for a specific location and date range.
+    Returns a DataFrame with 'date' (datetime64) and 'ndvi' (float32) columns,
+    sorted by date. The DataFrame is empty if no clear images were found.
+    """
+    ee = get_ee()
+    point = ee.Geometry.Point(lon, lat)
+
+    s2 = ee.ImageCollection(collection) \
+        .filterBounds(point) \
+        .filterDate(start_date, end_date) \
+        .filter(ee.Filter.lt('CLOUDY_PIXEL_PERCENTAGE', max_cloud_pct)) # Filter for clear images
+
+    def add_ndvi(image):
+        """A function to calculate and add an NDVI band to an image."""
+        ndvi = image.normalizedDifference(['B8', 'B4']).rename('NDVI')
+        return image.addBands(ndvi)
+
+    ndvi_col = s2.map(add_ndvi)
+
+    # getInfo() returns a standard Python object (a list of lists). This is the
+    # only network round trip; everything after it is parsed locally.
+    ndvi_values = ndvi_col.select('NDVI').getRegion(point, 10).getInfo()
+    return parse_region_response(ndvi_values)
 
 
 # This block allows you to test this file directly if you ever need to
@@ -75,9 +137,9 @@ if __name__ == "__main__":
     print(f"Fetching test data for Bengaluru between {test_start} and {test_end}...")
     data = get_ndvi_for_location(test_lat, test_lon, test_start, test_end)
     
-    if data:
+    if not data.empty:
         print(f"✅ Successfully fetched {len(data)} records for the test.")
         print("Sample data:")
-        print(data[:3])
+        print(data.head(3))
     else:
         print("❌ No data found for the test case.")
\ No newline at end of file
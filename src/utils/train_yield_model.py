@@ -1,4 +1,7 @@
-# train_yield_model.py (Final version with District name cleaning)
+# train_yield_model.py (Full or incremental training into the model registry)
+
+import argparse
+import hashlib
 
 import pandas as pd
 from sklearn.model_selection import train_test_split
@@ -7,91 +10,188 @@ from sklearn.metrics import mean_absolute_error, r2_score
 import joblib
 import os
 
-print("--- Starting Final District-Aware Model Training ---")
+from src.utils.feature_encoder import YieldFeatureEncoder, UnknownCategoryError
+from src.utils.data_store import load_yield_data, load_satellite_data
+from src.utils.model_registry import ModelRegistry
+from src.utils.ndvi_features import seasonal_ndvi_features, FEATURE_COLUMNS
 
 # --- PATHS ---
-DATA_DIR = 'data'
-SATELLITE_DATA_PATH = os.path.join(DATA_DIR, 'satellite_data_all_districts.csv')
-YIELD_DATA_PATH = os.path.join(DATA_DIR, 'yield_data_tidy.csv')
 MODEL_DIR = 'models'
-MODEL_PATH = os.path.join(MODEL_DIR, 'yield_prediction_model.joblib')
 MODEL_COLUMNS_PATH = os.path.join(MODEL_DIR, 'model_columns.pkl')
 
-os.makedirs(MODEL_DIR, exist_ok=True)
-
-# --- 1. LOAD DATA ---
-try:
-    satellite_df = pd.read_csv(SATELLITE_DATA_PATH)
-    yield_df = pd.read_csv(YIELD_DATA_PATH)
+# --- CONFIGURATION ---
+TARGET = 'Yield'
+NUMERIC_FEATURES = ['Year'] + FEATURE_COLUMNS
+FEATURES = NUMERIC_FEATURES + ['District', 'Crop']
+N_ESTIMATORS = 100
+NEW_TREES = 20  # Trees added per incremental run
+TEST_SIZE = 0.2
+RANDOM_STATE = 42
+
+
+class RemovedPartitionError(ValueError):
+    """Raised when Year partitions the parent version was trained on are gone from the data."""
+
+
+def load_master_frame():
+    """
+    Merges each yield record with the NDVI features of its own district,
+    agricultural year and season window (see ndvi_features.py). Both tables
+    come from the columnar store (or their CSVs if it hasn't been built),
+    already typed and cleaned: District upper-cased, Year as the season's
+    start year.
+    """
+    satellite_df = load_satellite_data(columns=['date', 'District', 'ndvi'])
+    yield_df = load_yield_data().astype({'District': str, 'Season': str})
     print("✅ Data loaded successfully.")
-except FileNotFoundError as e:
-    print(f"❌ Error: Missing data file. {e}")
-    exit()
-
-# --- 2. DATA PREPARATION & AGGREGATION ---
-satellite_df['date'] = pd.to_datetime(satellite_df['date'])
-satellite_df['Year'] = satellite_df['date'].dt.year
-
-yield_df.dropna(subset=['Year'], inplace=True)
-yield_df['Year'] = yield_df['Year'].astype(str).apply(lambda x: x.split('-')[0].strip())
-yield_df['Year'] = pd.to_numeric(yield_df['Year'], errors='coerce')
-yield_df.dropna(subset=['Year'], inplace=True)
-yield_df['Year'] = yield_df['Year'].astype(int)
-
-# Aggregate satellite data
-yearly_agg_df = satellite_df.groupby(['Year', 'District'])['ndvi'].mean().reset_index()
-
-# --- NEW FIX: Standardize the 'District' names in both dataframes before merging ---
-yield_df['District'] = yield_df['District'].str.strip().str.upper()
-yearly_agg_df['District'] = yearly_agg_df['District'].str.strip().str.upper()
-# --- End of Fix ---
-
-print("\nAggregated yearly NDVI data per district (sample):")
-print(yearly_agg_df.head())
-
-# Merge the two datasets
-master_df = pd.merge(yield_df, yearly_agg_df, on=['Year', 'District'], how='inner')
-master_df.dropna(inplace=True)
-
-# Check if the merge was successful
-if master_df.empty:
-    print("\n❌ CRITICAL ERROR: The master dataset is empty after merging.")
-    print("   This means there are still no matching 'Year' and 'District' pairs.")
-    print(f"   Sample Years in yield_df: {yield_df['Year'].unique()[:5]}")
-    print(f"   Sample Years in yearly_agg_df: {yearly_agg_df['Year'].unique()[:5]}")
-    exit()
-
-print("\nCreated master training dataset (sample):")
-print(master_df.head())
-
-# --- 3. FEATURE ENGINEERING ---
-target = 'Yield'
-features = ['Year', 'District', 'Crop', 'ndvi'] 
-
-X = pd.get_dummies(master_df[features], columns=['District', 'Crop'], drop_first=True)
-y = master_df[target]
-
-joblib.dump(X.columns.tolist(), MODEL_COLUMNS_PATH)
-print(f"\n✅ Model columns saved to {MODEL_COLUMNS_PATH}")
-
-# --- 4. MODEL TRAINING ---
-X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
-print(f"\nData split into {len(X_train)} training and {len(X_test)} testing records.")
-
-model = RandomForestRegressor(n_estimators=100, random_state=42)
-print("\nTraining the model...")
-model.fit(X_train, y_train)
-print("✅ Model training complete.")
-
-# --- 5. MODEL EVALUATION ---
-y_pred = model.predict(X_test)
-mae = mean_absolute_error(y_test, y_pred)
-r2 = r2_score(y_test, y_pred)
-
-print("\n--- Model Performance ---")
-print(f"R-squared (R²): {r2:.2%}")
-print(f"Mean Absolute Error (MAE): {mae:.4f} tonnes/hectare")
-
-# --- 6. SAVE THE TRAINED MODEL ---
-joblib.dump(model, MODEL_PATH)
-print(f"\n✅ Trained model saved to: {MODEL_PATH}")
\ No newline at end of file
+
+    season_df = seasonal_ndvi_features(satellite_df)
+    master_df = pd.merge(yield_df, season_df, on=['District', 'Year', 'Season'], how='inner')
+    master_df.dropna(inplace=True)
+    if master_df.empty:
+        print("\n❌ CRITICAL ERROR: The master dataset is empty after merging.")
+        print("   This means there are still no matching 'District', 'Year' and 'Season' triples.")
+        print(f"   Sample Years in yield_df: {yield_df['Year'].unique()[:5]}")
+        print(f"   Sample Years in season_df: {season_df['Year'].unique()[:5]}")
+    return master_df
+
+
+def data_fingerprint(master_df):
+    """
+    SHA-1 of the training rows per Year partition, plus one for the whole set.
+    Row order does not matter, so re-exports of the same data match.
+    """
+    cols = FEATURES + [TARGET]
+    partitions = {}
+    for year, part in master_df.groupby('Year'):
+        rows = part[cols].astype({'District': str, 'Crop': str}).sort_values(cols)
+        hashes = pd.util.hash_pandas_object(rows, index=False).to_numpy()
+        partitions[str(year)] = hashlib.sha1(hashes.tobytes()).hexdigest()
+    overall = hashlib.sha1(''.join(f"{y}:{h}" for y, h in sorted(partitions.items())).encode()).hexdigest()
+    return {'sha1': overall, 'rows': len(master_df), 'partitions': partitions}
+
+
+def evaluate(model, X_test, y_test, scope):
+    y_pred = model.predict(X_test)
+    metrics = {'r2': float(r2_score(y_test, y_pred)),
+               'mae': float(mean_absolute_error(y_test, y_pred)),
+               'n_test': int(len(y_test)), 'scope': scope}
+    print("\n--- Model Performance ---")
+    print(f"R-squared (R²): {metrics['r2']:.2%}")
+    print(f"Mean Absolute Error (MAE): {metrics['mae']:.4f} tonnes/hectare")
+    return metrics
+
+
+def train_full(master_df, n_estimators=N_ESTIMATORS):
+    """Fits the encoder and a fresh forest on all rows. Returns (model, encoder, metadata)."""
+    # The encoder reproduces pd.get_dummies(..., drop_first=True) and is stored next to
+    # the model so the web app encodes requests exactly the same way.
+    encoder = YieldFeatureEncoder(drop_first=True, numeric_features=NUMERIC_FEATURES)
+    X = encoder.fit_transform(master_df[FEATURES])
+    y = master_df[TARGET].to_numpy()
+    print(f"\n✅ Feature encoder fitted ({encoder.n_features} columns)")
+
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=TEST_SIZE, random_state=RANDOM_STATE)
+    print(f"\nData split into {len(X_train)} training and {len(X_test)} testing records.")
+
+    model = RandomForestRegressor(n_estimators=n_estimators, random_state=RANDOM_STATE)
+    print("\nTraining the model...")
+    model.fit(X_train, y_train)
+    print("✅ Model training complete.")
+
+    return model, encoder, {'mode': 'full', 'parent': None, 'n_estimators': model.n_estimators,
+                            'n_train': int(len(X_train)), 'metrics': evaluate(model, X_test, y_test, 'all')}
+
+
+def train_incremental(master_df, parent, fingerprint, new_trees=NEW_TREES):
+    """
+    Grows the parent version's forest by `new_trees` trees fitted only on the
+    Year partitions whose fingerprint changed since the parent was trained
+    (warm_start keeps the existing trees as they are). Returns
+    (model, encoder, metadata), or None when nothing changed. Raises
+    UnknownCategoryError if the new rows bring a District or Crop the parent's
+    encoder has never seen, since that changes the feature columns, and
+    RemovedPartitionError if a Year the parent was trained on is gone from the
+    data, since added trees can't undo what the old ones learnt from it.
+    """
+    old = parent.metadata.get('data_fingerprint', {}).get('partitions', {})
+    removed = sorted(set(old) - set(fingerprint['partitions']))
+    if removed:
+        raise RemovedPartitionError(', '.join(removed))
+    changed = sorted(y for y, h in fingerprint['partitions'].items() if old.get(y) != h)
+    if not changed:
+        return None
+    print(f"\nChanged partitions since {parent.version}: {', '.join(changed)}")
+
+    rows = master_df[master_df['Year'].astype(str).isin(changed)]
+    encoder = parent.encoder
+    X = encoder.transform_df(rows[FEATURES])
+    y = rows[TARGET].to_numpy()
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=TEST_SIZE, random_state=RANDOM_STATE)
+    print(f"Data split into {len(X_train)} training and {len(X_test)} testing records.")
+
+    model = parent.model
+    model.set_params(warm_start=True, n_estimators=model.n_estimators + new_trees)
+    print(f"\nAdding {new_trees} trees ({model.n_estimators} in total)...")
+    model.fit(X_train, y_train)
+    model.set_params(warm_start=False)
+    print("✅ Model training complete.")
+
+    return model, encoder, {'mode': 'incremental', 'parent': parent.version,
+                            'changed_partitions': changed, 'n_estimators': model.n_estimators,
+                            'n_train': int(len(X_train)),
+                            'metrics': evaluate(model, X_test, y_test, 'changed_partitions')}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Train the yield model and register it as a new version.")
+    parser.add_argument('--incremental', action='store_true',
+                        help="Add trees for changed Year partitions instead of retraining from scratch.")
+    parser.add_argument('--new-trees', type=int, default=NEW_TREES)
+    parser.add_argument('--no-activate', action='store_true', help="Register without switching the app to it.")
+    args = parser.parse_args(argv)
+
+    print("--- Starting Final District-Aware Model Training ---")
+    try:
+        master_df = load_master_frame()
+    except FileNotFoundError as e:
+        print(f"❌ Error: Missing data file. {e}")
+        return None
+    if master_df.empty:
+        return None
+    print("\nCreated master training dataset (sample):")
+    print(master_df.head())
+
+    registry = ModelRegistry()
+    fingerprint = data_fingerprint(master_df)
+    result = None
+    if args.incremental:
+        if registry.current_version() is None:
+            print("\nNo active model version to extend; training from scratch.")
+        elif registry.load().encoder.numeric_features != NUMERIC_FEATURES:
+            print("\nThe active version was trained on a different feature set; training from scratch.")
+        else:
+            try:
+                result = train_incremental(master_df, registry.load(), fingerprint, args.new_trees)
+            except UnknownCategoryError as e:
+                print(f"\nNew categories in the data ({e}); training from scratch.")
+            except RemovedPartitionError as e:
+                print(f"\nYear partitions removed from the data ({e}); training from scratch.")
+            else:
+                if result is None:
+                    print("\n✅ No Year partition changed since the active version; nothing to train.")
+                    return registry.current_version()
+    if result is None:
+        result = train_full(master_df)
+
+    model, encoder, metadata = result
+    metadata['data_fingerprint'] = fingerprint
+    version = registry.register(model, encoder, metadata, activate=not args.no_activate)
+    joblib.dump(encoder.columns, MODEL_COLUMNS_PATH)
+    print(f"\n✅ Model registered as {version} in '{registry.root}'"
+          f"{'' if args.no_activate else ' and activated'}")
+    return version
+
+
+if __name__ == '__main__':
+    main()
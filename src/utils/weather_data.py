@@ -3,14 +3,27 @@
 import os
 import pandas as pd
 import requests
+from requests.adapters import HTTPAdapter
 from dotenv import load_dotenv
-import time
 
 # --- SETUP ---
 # Load API key from .env file
 load_dotenv()
 API_KEY = os.getenv("OPENWEATHER_API_KEY")
 
+# Daily history for a whole date range in one request (Open-Meteo archive API,
+# no key needed). Point it at a local server to run the ingester offline.
+WEATHER_API_URL = os.getenv("WEATHER_API_URL", "https://archive-api.open-meteo.com/v1/archive")
+REQUEST_TIMEOUT_SECONDS = 30
+
+# API variable -> column name, matching the columns get_daily_weather returns
+DAILY_VARIABLES = {
+    'temperature_2m_mean': 'temperature',
+    'relative_humidity_2m_mean': 'humidity',
+    'surface_pressure_mean': 'pressure',
+    'precipitation_sum': 'precipitation',
+}
+
 # Define the output path
 SRC_DIR = os.path.dirname(os.path.abspath(__file__))
 PROJECT_ROOT = os.path.abspath(os.path.join(SRC_DIR, "../.."))
@@ -18,7 +31,54 @@ DATA_DIR = os.path.join(PROJECT_ROOT, "data")
 os.makedirs(DATA_DIR, exist_ok=True)
 WEATHER_PATH = os.path.join(DATA_DIR, "weather_data.csv")
 
-def get_daily_weather(lat, lon, date_unix):
+def make_session(pool_size=10):
+    """A requests.Session whose connection pool keeps up to `pool_size` connections per host alive."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+def empty_weather_frame():
+    return pd.DataFrame({'date': pd.Series(dtype='datetime64[ns]'),
+                         **{col: pd.Series(dtype='float32') for col in DAILY_VARIABLES.values()}})
+
+
+def parse_daily_response(payload):
+    """DataFrame with one row per day from an archive API response ('daily' block); missing values are NaN."""
+    daily = payload.get('daily') or {}
+    if not daily.get('time'):
+        return empty_weather_frame()
+    df = pd.DataFrame({'date': pd.to_datetime(daily['time'])})
+    for variable, col in DAILY_VARIABLES.items():
+        df[col] = pd.to_numeric(pd.Series(daily.get(variable, [None] * len(df)), dtype='object'),
+                                errors='coerce').astype('float32')
+    return df
+
+
+def get_weather_range(lat, lon, start_date, end_date, session=None, base_url=WEATHER_API_URL,
+                      timeout=REQUEST_TIMEOUT_SECONDS):
+    """
+    Daily weather for one location from start_date up to (not including)
+    end_date, in a single request. Raises requests.HTTPError on a failed
+    response, so callers can retry.
+    """
+    last_day = pd.Timestamp(end_date) - pd.Timedelta(days=1)
+    params = {
+        'latitude': lat,
+        'longitude': lon,
+        'start_date': pd.Timestamp(start_date).strftime('%Y-%m-%d'),
+        'end_date': last_day.strftime('%Y-%m-%d'),
+        'daily': ','.join(DAILY_VARIABLES),
+        'timezone': 'Asia/Kolkata',
+    }
+    response = (session or requests).get(base_url, params=params, timeout=timeout)
+    response.raise_for_status()
+    return parse_daily_response(response.json())
+
+
+def get_daily_weather(lat, lon, date_unix, session=None):
     """Fetches weather for a single day using the One Call API 1.0 (requires subscription)."""
     # Note: Free tier has limitations. This endpoint is for demonstration.
     # For a datathon, fetching the 'current' weather for each day might be a workaround if you don't have a paid key.
@@ -27,7 +87,7 @@ def get_daily_weather(lat, lon, date_unix):
     if not API_KEY:
         raise ValueError("❌ API key not found. Please add OPENWEATHER_API_KEY in .env")
 
-    response = requests.get(url)
+    response = (session or requests).get(url, timeout=REQUEST_TIMEOUT_SECONDS)
     if response.status_code == 200:
         data = response.json()
         weather_info = {
@@ -45,29 +105,7 @@ def get_daily_weather(lat, lon, date_unix):
         return None
 
 if __name__ == "__main__":
-    lat, lon = 12.9716, 77.5946  # Bengaluru
-
-    # --- NEW: Create a date range for the entire year ---
-    date_range = pd.date_range(start='2024-01-01', end='2024-12-31', freq='D')
-    all_weather_data = []
-
-    print(f"Fetching daily weather data for {len(date_range)} days in 2024...")
-
-    for single_date in date_range:
-        # We'll use the current weather endpoint as a stand-in for historical data.
-        # In a real-world scenario, you'd use a historical weather API.
-        unix_timestamp = int(single_date.timestamp())
-        daily_data = get_daily_weather(lat, lon, unix_timestamp)
-        if daily_data:
-            all_weather_data.append(daily_data)
-            print(f"  -> Fetched data for {daily_data['date']}")
-        time.sleep(0.1) # Small delay to be kind to the API
-
-    # --- NEW: Save all collected data to a DataFrame and then to CSV ---
-    if all_weather_data:
-        weather_df = pd.DataFrame(all_weather_data)
-        weather_df.to_csv(WEATHER_PATH, index=False)
-        print(f"\n✅ Successfully saved {len(weather_df)} weather records to:")
-        print(WEATHER_PATH)
-    else:
-        print("\n❌ No weather data was fetched. Please check your API key and network.")
\ No newline at end of file
+    # Fetching day by day is far too slow for every district over several years;
+    # the bulk ingester fetches each district-year in one pooled request.
+    from src.utils.fetch_weather_data_all import main
+    main()
@@ -0,0 +1,71 @@
+# yield_stats.py
+
+from types import MappingProxyType
+from typing import NamedTuple, Optional, Tuple
+
+import pandas as pd
+
+
+class YieldStats(NamedTuple):
+    """Historical yield statistics for one (District, Crop) pair."""
+    count: int
+    mean: float
+    min: float
+    max: float
+    std: float
+    cv: float  # Coefficient of Variation (std / mean); the volatility input to calculate_full_dyrs
+
+
+class YieldStatsIndex:
+    """
+    Immutable lookup of historical yield statistics, built once at startup.
+
+    Replaces per-request boolean masks over the whole yield table with O(1)
+    dictionary lookups keyed by (District, Crop), plus a precomputed
+    District -> sorted crops list for the crop dropdown and, when the table
+    has a Season column, the seasons each crop is grown in (most records first).
+    """
+
+    def __init__(self, yield_df: pd.DataFrame):
+        grouped = yield_df.dropna(subset=['District', 'Crop', 'Yield']) \
+            .groupby(['District', 'Crop'], observed=True)['Yield'] \
+            .agg(['count', 'mean', 'min', 'max', 'std'])
+        # std is undefined for a single season; treat such pairs as having no volatility
+        grouped['std'] = grouped['std'].fillna(0.0)
+        grouped['cv'] = (grouped['std'] / grouped['mean']).where(grouped['mean'] != 0, 0.0)
+
+        stats = {
+            key: YieldStats(int(row.count), float(row.mean), float(row.min), float(row.max),
+                            float(row.std), float(row.cv))
+            for key, row in zip(grouped.index, grouped.itertuples(index=False))
+        }
+        crops = {}
+        for district, crop in sorted(stats):
+            crops.setdefault(district, []).append(crop)
+
+        seasons = {}
+        if 'Season' in yield_df.columns:
+            counts = yield_df.dropna(subset=['District', 'Crop', 'Season', 'Yield']) \
+                .groupby(['District', 'Crop', 'Season'], observed=True).size()
+            for (district, crop, season), _ in counts.sort_values(ascending=False, kind='stable').items():
+                seasons.setdefault((district, crop), []).append(season)
+
+        self._stats = MappingProxyType(stats)
+        self._crops = MappingProxyType({d: tuple(c) for d, c in crops.items()})
+        self._seasons = MappingProxyType({k: tuple(v) for k, v in seasons.items()})
+
+    def get(self, district: str, crop: str) -> Optional[YieldStats]:
+        return self._stats.get((district, crop))
+
+    def crops_for(self, district: str) -> Tuple[str, ...]:
+        return self._crops.get(district, ())
+
+    def seasons_for(self, district: str, crop: str) -> Tuple[str, ...]:
+        return self._seasons.get((district, crop), ())
+
+    @property
+    def districts(self) -> Tuple[str, ...]:
+        return tuple(self._crops)
+
+    def __len__(self) -> int:
+        return len(self._stats)
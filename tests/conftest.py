@@ -0,0 +1,19 @@
+import pytest
+
+from tests.mock_weather import MockWeatherServer
+
+
+@pytest.fixture
+def weather_server():
+    """A running MockWeatherServer with no latency or failures; tests may change `fail_first`."""
+    with MockWeatherServer() as server:
+        yield server
+
+
+@pytest.fixture
+def districts_csv(tmp_path):
+    path = tmp_path / 'districts.csv'
+    path.write_text("District,Latitude,Longitude\n"
+                    "1. BAGALKOT,16.1772263,75.680838\n"
+                    "10. CHIKMAGALUR,13.318014,75.7738743\n")
+    return str(path)
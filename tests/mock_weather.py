@@ -0,0 +1,94 @@
+# mock_weather.py (A local stand-in for the weather archive API, for tests and benchmarks)
+
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+import numpy as np
+import pandas as pd
+
+
+class MockWeatherServer:
+    """
+    A local stand-in for the archive API, on a free port of 127.0.0.1:
+
+        with MockWeatherServer(latency=0.05) as server:
+            run_weather_fetch(base_url=server.url)
+
+    Any path answers with daily values for the requested latitude, longitude and
+    date range (or a single day when only `dt` is given, like the per-day API).
+    The first `fail_first` requests, and then a `fail_rate` fraction of them,
+    are answered with HTTP 503. `requests` counts the requests served,
+    including the failed ones, and `queries` keeps their query parameters.
+    """
+
+    def __init__(self, latency=0.0, fail_rate=0.0, seed=0, fail_first=0):
+        self.latency = latency
+        self.fail_rate = fail_rate
+        self.fail_first = fail_first
+        self.requests = 0
+        self.queries = []
+        self._rng = np.random.default_rng(seed)
+        self._lock = threading.Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'  # Keep-alive, so pooled connections are reused
+
+            def do_GET(self):
+                query = {k: v[0] for k, v in parse_qs(urlparse(self.path).query).items()}
+                status, body = server.respond(query)
+                payload = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.httpd.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}/v1/archive"
+
+    def reset(self):
+        """Clears the request counters (not the failure settings)."""
+        with self._lock:
+            self.requests = 0
+            self.queries = []
+
+    def respond(self, query):
+        with self._lock:
+            self.requests += 1
+            self.queries.append(query)
+            fail = self.requests <= self.fail_first or self._rng.random() < self.fail_rate
+        time.sleep(self.latency)
+        if fail:
+            return 503, {'error': True, 'reason': 'Mock outage'}
+        lat, lon = float(query.get('latitude', query.get('lat', 0))), float(query.get('longitude', query.get('lon', 0)))
+        if 'start_date' in query:
+            days = pd.date_range(query['start_date'], query['end_date'], freq='D')
+        else:
+            days = pd.DatetimeIndex([pd.to_datetime(int(query.get('dt', 0)), unit='s')])
+        doy = days.dayofyear.to_numpy()
+        temperature = 24 + 4 * np.sin(2 * np.pi * (doy - 100) / 365) + (lat - 14) * -0.5
+        rain = np.clip(12 * np.sin(2 * np.pi * (doy - 150) / 365), 0, None) + (lon - 76) * 0.3
+        daily = {
+            'time': [d.strftime('%Y-%m-%d') for d in days],
+            'temperature_2m_mean': np.round(temperature, 1).tolist(),
+            'relative_humidity_2m_mean': np.round(60 + 3 * rain, 0).tolist(),
+            'surface_pressure_mean': np.round(950 - 2 * np.cos(2 * np.pi * doy / 365), 1).tolist(),
+            'precipitation_sum': np.round(np.clip(rain, 0, None), 1).tolist(),
+        }
+        return 200, {'latitude': lat, 'longitude': lon, 'daily': daily}
+
+    def __enter__(self):
+        threading.Thread(target=self.httpd.serve_forever, name='mock-weather', daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
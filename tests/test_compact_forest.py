@@ -0,0 +1,79 @@
+import json
+import os
+
+import numpy as np
+import pytest
+from sklearn.ensemble import ExtraTreesRegressor, RandomForestRegressor
+
+from src.utils.compact_forest import CompactForest, META_FILE, is_exportable
+
+
+def make_data(n=600, n_features=6, missing=0.0, seed=0):
+    rng = np.random.default_rng(seed)
+    X = rng.normal(size=(n, n_features))
+    y = X[:, 0] * 3 + np.sin(X[:, 1] * 2) + X[:, 2] * X[:, 3] + rng.normal(scale=0.1, size=n)
+    if missing:
+        X[rng.random(X.shape) < missing] = np.nan
+    return X, y
+
+
+@pytest.fixture(scope='module')
+def forest_fitted_with_nan():
+    X, y = make_data(missing=0.2)
+    return RandomForestRegressor(n_estimators=30, random_state=0).fit(X, y)
+
+
+@pytest.fixture(scope='module')
+def forest_fitted_without_nan():
+    X, y = make_data()
+    return RandomForestRegressor(n_estimators=30, random_state=0).fit(X, y)
+
+
+@pytest.mark.parametrize('missing', [0.0, 0.3])
+@pytest.mark.parametrize('model_fixture', ['forest_fitted_with_nan', 'forest_fitted_without_nan'])
+def test_predict_matches_sklearn_exactly(request, model_fixture, missing):
+    model = request.getfixturevalue(model_fixture)
+    X, _ = make_data(n=500, missing=missing, seed=1)
+    compact = CompactForest.from_sklearn(model)
+    np.testing.assert_array_equal(compact.predict(X), model.predict(X))
+    np.testing.assert_array_equal(compact.leaves(X), model.apply(X.astype(np.float32))
+                                  + compact.roots[np.newaxis, :])
+
+
+def test_extra_trees_match_sklearn_exactly():
+    X, y = make_data(missing=0.1)
+    model = ExtraTreesRegressor(n_estimators=10, random_state=0).fit(X, y)
+    X_test, _ = make_data(n=300, missing=0.3, seed=2)
+    np.testing.assert_array_equal(CompactForest.from_sklearn(model).predict(X_test), model.predict(X_test))
+
+
+def test_contributions_add_up_to_the_prediction(forest_fitted_with_nan):
+    X, _ = make_data(n=200, missing=0.3, seed=3)
+    compact = CompactForest.from_sklearn(forest_fitted_with_nan)
+    contributions = compact.contributions(X)
+    assert contributions.shape == X.shape
+    np.testing.assert_allclose(contributions.sum(axis=1) + compact.expected_value, compact.predict(X), atol=1e-9)
+
+
+def test_save_load_round_trip(forest_fitted_with_nan, tmp_path):
+    X, _ = make_data(n=200, missing=0.3, seed=4)
+    path = CompactForest.from_sklearn(forest_fitted_with_nan).save(str(tmp_path / 'forest'))
+    loaded = CompactForest.load(path)
+    assert loaded.n_estimators == 30
+    np.testing.assert_array_equal(loaded.predict(X), forest_fitted_with_nan.predict(X))
+
+
+def test_old_format_is_rejected(forest_fitted_without_nan, tmp_path):
+    path = CompactForest.from_sklearn(forest_fitted_without_nan).save(str(tmp_path / 'forest'))
+    meta_path = os.path.join(path, META_FILE)
+    with open(meta_path) as f:
+        meta = json.load(f)
+    with open(meta_path, 'w') as f:
+        json.dump({**meta, 'format_version': 1}, f)
+    with pytest.raises(ValueError, match="export it again"):
+        CompactForest.load(path)
+
+
+def test_is_exportable(forest_fitted_without_nan):
+    assert is_exportable(forest_fitted_without_nan)
+    assert not is_exportable(RandomForestRegressor())  # Not fitted
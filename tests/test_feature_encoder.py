@@ -0,0 +1,71 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.utils.feature_encoder import YieldFeatureEncoder, UnknownCategoryError
+
+YIELD_CSV_PATH = os.path.join(os.path.dirname(__file__), '..', 'data', 'yield_data_tidy.csv')
+FEATURES = ['Year', 'ndvi', 'District', 'Crop']
+
+
+@pytest.fixture(scope='module')
+def yield_df():
+    df = pd.read_csv(YIELD_CSV_PATH)
+    df['District'] = df['District'].str.strip().str.upper()
+    df['Year'] = df['Year'].str[:4].astype(int)
+    df['ndvi'] = np.random.default_rng(0).uniform(0.1, 0.8, len(df))
+    return df[FEATURES]
+
+
+def dummies(df, drop_first):
+    return pd.get_dummies(df, columns=['District', 'Crop'], drop_first=drop_first, dtype=float)
+
+
+@pytest.mark.parametrize('drop_first', [True, False])
+def test_matches_get_dummies(yield_df, drop_first):
+    encoder = YieldFeatureEncoder(drop_first=drop_first)
+    X = encoder.fit_transform(yield_df)
+    expected = dummies(yield_df, drop_first)
+    assert encoder.columns == expected.columns.tolist()
+    np.testing.assert_array_equal(X, expected.to_numpy())
+
+
+def test_first_category_is_the_baseline(yield_df):
+    encoder = YieldFeatureEncoder().fit(yield_df)
+    first_district, first_crop = encoder.categories['District'][0], encoder.categories['Crop'][0]
+    assert f"District_{first_district}" not in encoder.columns
+    assert f"Crop_{first_crop}" not in encoder.columns
+    row = encoder.transform_row({'Year': 2015, 'ndvi': 0.5}, first_district, first_crop)
+    np.testing.assert_array_equal(row, [2015, 0.5] + [0.0] * (encoder.n_features - 2))
+
+
+def test_transform_row_matches_transform(yield_df):
+    encoder = YieldFeatureEncoder().fit(yield_df)
+    sample = yield_df.sample(50, random_state=0)
+    X = encoder.transform_df(sample)
+    for i, row in enumerate(sample.itertuples()):
+        np.testing.assert_array_equal(
+            encoder.transform_row({'Year': row.Year, 'ndvi': row.ndvi}, row.District, row.Crop), X[i])
+
+
+def test_unknown_categories_raise(yield_df):
+    encoder = YieldFeatureEncoder().fit(yield_df)
+    district, crop = yield_df['District'].iloc[0], yield_df['Crop'].iloc[0]
+    with pytest.raises(UnknownCategoryError, match="District 'ATLANTIS'"):
+        encoder.transform_row({'Year': 2015, 'ndvi': 0.5}, 'ATLANTIS', crop)
+    with pytest.raises(UnknownCategoryError, match="Crop 'Moonbeans'"):
+        encoder.transform({'Year': [2015], 'ndvi': [0.5]}, [district], ['Moonbeans'])
+    with pytest.raises(UnknownCategoryError):
+        encoder.check(district, 'Moonbeans')
+
+
+def test_save_load_round_trip(yield_df, tmp_path):
+    encoder = YieldFeatureEncoder(numeric_features=['Year', 'ndvi']).fit(yield_df)
+    path = str(tmp_path / 'encoder.joblib')
+    encoder.save(path)
+    loaded = YieldFeatureEncoder.load(path)
+    assert loaded.columns == encoder.columns
+    assert loaded.numeric_features == encoder.numeric_features
+    np.testing.assert_array_equal(loaded.transform_df(yield_df), encoder.transform_df(yield_df))
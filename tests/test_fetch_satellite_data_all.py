@@ -0,0 +1,168 @@
+import json
+import os
+import threading
+
+import pandas as pd
+import pytest
+
+from src.utils.fetch_satellite_data_all import (
+    TokenBucket, fetch_with_retry, load_checkpoint, part_path, run_batch_fetch, build_work_units
+)
+
+START_DATE, END_DATE = '2019-01-01', '2020-12-31'
+BAGALKOT_LAT = 16.1772263
+
+
+class StubFetch:
+    """Stands in for the ee client: an NDVI reading every 16 days. Fails for the latitudes in `failing`."""
+
+    def __init__(self, failing=()):
+        self.failing = set(failing)
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def __call__(self, lat, lon, start_date, end_date):
+        with self._lock:
+            self.calls.append((lat, start_date))
+        if lat in self.failing:
+            raise RuntimeError("Earth Engine quota exceeded")
+        dates = pd.date_range(start_date, end_date, freq='16D', inclusive='left')
+        return pd.DataFrame({'date': dates, 'ndvi': 0.4 + 0.001 * dates.dayofyear})
+
+
+@pytest.fixture
+def paths(tmp_path):
+    return {'output_path': str(tmp_path / 'satellite.csv'),
+            'checkpoint_path': str(tmp_path / 'checkpoint.jsonl'),
+            'parts_dir': str(tmp_path / 'parts'),
+            'store_path': str(tmp_path / 'store'),
+            'climatology_path': None}
+
+
+@pytest.fixture
+def fetch(districts_csv, paths):
+    def run(fetch_fn):
+        return run_batch_fetch(fetch_fn, districts_path=districts_csv, start_date=START_DATE, end_date=END_DATE,
+                               max_workers=2, limiter=TokenBucket(1000, 1000), max_retries=1, backoff_base=0,
+                               **paths)
+    return run
+
+
+@pytest.fixture
+def units(districts_csv):
+    return build_work_units(pd.read_csv(districts_csv), START_DATE, END_DATE)
+
+
+def expected_rows(units):
+    return sum(len(pd.date_range(u['start'], u['end'], freq='16D', inclusive='left')) for u in units)
+
+
+def test_failed_run_keeps_finished_units_and_leaves_the_output_alone(fetch, paths, units):
+    with open(paths['output_path'], 'w') as f:
+        f.write("date,ndvi,District\n2018-01-01,0.5,BAGALKOT\n")
+
+    stub = StubFetch(failing={BAGALKOT_LAT})
+    summary = fetch(stub)
+
+    assert summary['failed'] == 2 and summary['completed'] == 2  # Bagalkot's two years
+    assert len(stub.calls) == 4 + 2  # Each failing unit is tried once more
+    finished = {u['unit_id'] for u in units if u['District'] == 'CHIKMAGALUR'}
+    assert load_checkpoint(paths['checkpoint_path']) == finished
+    assert sorted(os.listdir(paths['parts_dir'])) == sorted(os.path.basename(part_path(u, paths['parts_dir']))
+                                                           for u in units if u['unit_id'] in finished)
+    with open(paths['output_path']) as f:
+        assert f.read() == "date,ndvi,District\n2018-01-01,0.5,BAGALKOT\n"
+    assert not os.path.exists(paths['store_path'])
+
+
+def test_rerun_fetches_only_the_failed_units(fetch, paths, units):
+    fetch(StubFetch(failing={BAGALKOT_LAT}))
+
+    stub = StubFetch()
+    summary = fetch(stub)
+
+    assert summary['skipped'] == 2 and summary['completed'] == 2 and summary['failed'] == 0
+    assert sorted(stub.calls) == [(BAGALKOT_LAT, '2019-01-01'), (BAGALKOT_LAT, '2020-01-01')]
+    assert load_checkpoint(paths['checkpoint_path']) == {u['unit_id'] for u in units}
+    output = pd.read_csv(paths['output_path'])
+    assert len(output) == expected_rows(units)
+    assert not output.duplicated(['District', 'date']).any()
+    assert sorted(output['District'].unique()) == ['BAGALKOT', 'CHIKMAGALUR']
+    assert os.path.exists(paths['store_path'])
+
+
+def test_complete_rerun_fetches_nothing(fetch, paths, units):
+    fetch(StubFetch())
+    first = pd.read_csv(paths['output_path'])
+
+    stub = StubFetch()
+    summary = fetch(stub)
+    assert stub.calls == []
+    assert summary['skipped'] == len(units)
+    pd.testing.assert_frame_equal(pd.read_csv(paths['output_path']), first)
+
+
+def test_checkpointed_unit_without_its_part_is_fetched_again(fetch, paths, units):
+    fetch(StubFetch())
+    os.remove(part_path(units[0], paths['parts_dir']))
+
+    stub = StubFetch()
+    fetch(stub)
+    assert stub.calls == [(units[0]['lat'], units[0]['start'])]
+    assert len(pd.read_csv(paths['output_path'])) == expected_rows(units)
+
+
+def test_unit_finished_twice_is_not_duplicated(fetch, paths, units):
+    fetch(StubFetch())
+    # A crash between writing the part and the checkpoint line fetches the unit again
+    with open(paths['checkpoint_path']) as f:
+        lines = f.readlines()
+    with open(paths['checkpoint_path'], 'w') as f:
+        f.writelines(line for line in lines if json.loads(line)['unit_id'] != units[1]['unit_id'])
+
+    stub = StubFetch()
+    fetch(stub)
+    assert len(stub.calls) == 1
+    output = pd.read_csv(paths['output_path'])
+    assert len(output) == expected_rows(units)
+    assert not output.duplicated(['District', 'date']).any()
+
+
+# --- RETRIES ---
+
+class CountingLimiter:
+    def __init__(self):
+        self.acquired = 0
+
+    def acquire(self):
+        self.acquired += 1
+
+
+def test_fetch_with_retry_retries_with_backoff(units):
+    attempts, sleeps = [], []
+
+    def flaky(lat, lon, start, end):
+        attempts.append(start)
+        if len(attempts) < 3:
+            raise RuntimeError("503")
+        return 'records'
+
+    limiter = CountingLimiter()
+    assert fetch_with_retry(units[0], flaky, limiter, max_retries=4, backoff_base=1.0, sleep=sleeps.append) == 'records'
+    assert len(attempts) == 3 and limiter.acquired == 3
+    # Exponential backoff with up to 25% jitter
+    assert len(sleeps) == 2
+    assert 1.0 <= sleeps[0] <= 1.25 and 2.0 <= sleeps[1] <= 2.5
+
+
+def test_fetch_with_retry_gives_up(units):
+    attempts, sleeps = [], []
+
+    def down(lat, lon, start, end):
+        attempts.append(start)
+        raise RuntimeError(f"attempt {len(attempts)} failed")
+
+    with pytest.raises(RuntimeError, match="attempt 3 failed"):
+        fetch_with_retry(units[0], down, CountingLimiter(), max_retries=2, backoff_base=1.0, sleep=sleeps.append)
+    assert len(attempts) == 3
+    assert len(sleeps) == 2  # No sleep after the last attempt
@@ -0,0 +1,67 @@
+import pandas as pd
+import pyarrow.parquet as pq
+import pytest
+
+from src.utils.data_store import weather_partition_path, load_weather_data
+from src.utils.fetch_satellite_data_all import TokenBucket
+from src.utils.fetch_weather_data_all import run_weather_fetch
+
+START_DATE, END_DATE = '2019-01-01', '2020-12-31'
+N_DAYS = len(pd.date_range(START_DATE, END_DATE))  # Per district
+
+
+@pytest.fixture
+def fetch(weather_server, districts_csv, tmp_path):
+    store_path = str(tmp_path / 'weather')
+
+    def run():
+        weather_server.reset()
+        summary = run_weather_fetch(districts_path=districts_csv, store_path=store_path,
+                                    start_date=START_DATE, end_date=END_DATE, max_workers=4,
+                                    limiter=TokenBucket(1000, 1000), backoff_base=0.01,
+                                    base_url=weather_server.url)
+        return summary, load_weather_data(store_path)
+
+    run.store_path = store_path
+    return run
+
+
+def test_cold_run_stores_every_day(fetch, weather_server):
+    summary, stored = fetch()
+    assert summary['failed'] == 0
+    assert weather_server.requests == 4  # One per district-year
+    assert summary['records'] == 2 * N_DAYS
+    assert len(stored) == 2 * N_DAYS
+    assert stored.groupby('District')['date'].nunique().tolist() == [N_DAYS, N_DAYS]
+    assert stored['temperature'].notna().all()
+
+
+def test_rerun_makes_no_requests(fetch, weather_server):
+    fetch()
+    summary, stored = fetch()
+    assert weather_server.requests == 0
+    assert summary['skipped'] == summary['units'] == 4
+    assert summary['records'] == 0
+    assert len(stored) == 2 * N_DAYS
+
+
+def test_truncated_partition_fetches_only_its_missing_days(fetch, weather_server):
+    fetch()
+    path = weather_partition_path('CHIKMAGALUR', 2020, fetch.store_path)
+    pq.write_table(pq.read_table(path).slice(0, 200), path)
+
+    summary, stored = fetch()
+    assert weather_server.requests == 1
+    query = weather_server.queries[0]
+    assert (query['start_date'], query['end_date']) == ('2020-07-19', '2020-12-31')  # Days 201..366 of 2020
+    assert summary['records'] == 366 - 200
+    assert len(stored) == 2 * N_DAYS
+    assert not stored.duplicated(['District', 'date']).any()
+
+
+def test_unavailable_responses_are_retried(fetch, weather_server):
+    weather_server.fail_first = 3
+    summary, stored = fetch()
+    assert summary['failed'] == 0
+    assert weather_server.requests == 4 + 3
+    assert len(stored) == 2 * N_DAYS
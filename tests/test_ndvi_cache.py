@@ -0,0 +1,251 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+import pytest
+
+from src.utils.ndvi_cache import (NDVICache, MemoryCacheBackend, SQLiteCacheBackend, SingleFlight,
+                                  make_cache_key)
+
+LAT, LON = 12.5, 76.9
+
+
+class FakeClock:
+    def __init__(self, now=1_000_000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class StubFetch:
+    """
+    A daily NDVI series for [start, end), with no observations from
+    `available_until` on (scenes not acquired yet). Records every call's window.
+    """
+
+    def __init__(self, available_until='2100-01-01'):
+        self.available_until = available_until
+        self.calls = []
+
+    def __call__(self, lat, lon, start_date, end_date, collection=None, max_cloud_pct=None):
+        self.calls.append((start_date, end_date))
+        dates = pd.date_range(start_date, min(end_date, self.available_until), inclusive='left')
+        return pd.DataFrame({'date': dates, 'ndvi': (0.3 + dates.dayofyear / 1000).astype('float32')})
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def backend(request, tmp_path):
+    if request.param == 'memory':
+        return MemoryCacheBackend(max_entries=2)
+    return SQLiteCacheBackend(str(tmp_path / 'ndvi_cache.sqlite'), max_entries=2)
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def fetch():
+    return StubFetch()
+
+
+@pytest.fixture
+def cache(backend, clock, fetch):
+    return NDVICache(backend, ttl_seconds=60, fetch_fn=fetch, coalesce=False, clock=clock)
+
+
+def test_fresh_entry_is_a_hit(cache, fetch):
+    first = cache.get_ndvi(LAT, LON, '2020-06-01', '2020-07-01')
+    again = cache.get_ndvi(LAT, LON, '2020-06-10', '2020-06-20')
+    assert fetch.calls == [('2020-06-01', '2020-07-01')]
+    assert len(first) == 30 and len(again) == 10
+    assert again['date'].iloc[0] == pd.Timestamp('2020-06-10')
+    assert (cache.hits, cache.misses, cache.extensions) == (1, 1, 0)
+
+
+def test_expired_entry_fetches_only_after_the_last_observation(cache, fetch, clock):
+    fetch.available_until = '2020-06-20'
+    assert len(cache.get_ndvi(LAT, LON, '2020-06-01', '2020-07-01')) == 19
+    clock.now += 30
+    cache.get_ndvi(LAT, LON, '2020-06-01', '2020-07-01')  # Still fresh
+    assert len(fetch.calls) == 1
+
+    fetch.available_until = '2020-07-01'
+    clock.now += 31
+    records = cache.get_ndvi(LAT, LON, '2020-06-01', '2020-07-01')
+    assert fetch.calls[1] == ('2020-06-20', '2020-07-01')
+    assert cache.extensions == 1
+    assert records['date'].tolist() == list(pd.date_range('2020-06-01', '2020-07-01', inclusive='left'))
+
+
+def test_expired_entry_serves_settled_windows(cache, fetch, clock):
+    cache.get_ndvi(LAT, LON, '2020-06-01', '2020-07-01')
+    clock.now += 61
+    cache.get_ndvi(LAT, LON, '2020-06-01', '2020-06-15')  # Ends before the last cached observation
+    assert len(fetch.calls) == 1
+    assert cache.hits == 1
+
+
+def test_later_window_extends_the_entry(cache, fetch):
+    cache.get_ndvi(LAT, LON, '2020-06-01', '2020-07-01')
+    records = cache.get_ndvi(LAT, LON, '2020-06-15', '2020-07-15')
+    assert fetch.calls == [('2020-06-01', '2020-07-01'), ('2020-07-01', '2020-07-15')]
+    assert cache.extensions == 1
+    assert records['date'].tolist() == list(pd.date_range('2020-06-15', '2020-07-15', inclusive='left'))
+    # The merged series now covers both windows
+    cache.get_ndvi(LAT, LON, '2020-06-01', '2020-07-15')
+    assert len(fetch.calls) == 2
+
+
+def test_earlier_window_refetches_the_whole_range(cache, fetch):
+    cache.get_ndvi(LAT, LON, '2020-06-01', '2020-07-01')
+    records = cache.get_ndvi(LAT, LON, '2020-05-01', '2020-06-01')
+    assert fetch.calls[1] == ('2020-05-01', '2020-07-01')
+    assert cache.misses == 2
+    assert len(records) == 31
+
+
+def test_least_recently_used_entry_is_evicted(cache, fetch, clock):
+    for lat in (10.0, 11.0):
+        cache.get_ndvi(lat, LON, '2020-06-01', '2020-07-01')
+        clock.now += 1
+    cache.get_ndvi(10.0, LON, '2020-06-01', '2020-07-01')  # 10.0 is now the most recently used
+    cache.get_ndvi(12.0, LON, '2020-06-01', '2020-07-01')  # Evicts 11.0
+    assert len(cache.backend) == 2
+    calls = len(fetch.calls)
+    cache.get_ndvi(10.0, LON, '2020-06-01', '2020-07-01')
+    assert len(fetch.calls) == calls
+    cache.get_ndvi(11.0, LON, '2020-06-01', '2020-07-01')
+    assert len(fetch.calls) == calls + 1
+
+
+# --- COALESCING ---
+
+class BlockingFetch(StubFetch):
+    """Holds every fetch until `release` is set, so concurrent callers overlap."""
+
+    def __init__(self, error=None):
+        super().__init__()
+        self.release = threading.Event()
+        self.error = error
+
+    def __call__(self, *args, **kwargs):
+        self.release.wait(5)
+        records = super().__call__(*args, **kwargs)
+        if self.error is not None:
+            raise self.error
+        return records
+
+
+def wait_for_flight(flights, key):
+    """Waits until a call for key is in flight, then gives the other submitted threads time to join it."""
+    deadline = time.monotonic() + 5
+    while time.monotonic() < deadline:
+        with flights._lock:
+            if key in flights._calls:
+                break
+        time.sleep(0.001)
+    time.sleep(0.1)
+
+
+def test_single_flight_shares_one_call():
+    flights = SingleFlight()
+    release, calls = threading.Event(), []
+
+    def fn():
+        calls.append(1)
+        release.wait(5)
+        return 'result'
+
+    with ThreadPoolExecutor(8) as pool:
+        futures = [pool.submit(flights.do, 'key', fn) for _ in range(8)]
+        wait_for_flight(flights, 'key')
+        release.set()
+        results = [f.result() for f in futures]
+    assert len(calls) == 1
+    assert sorted(shared for _, shared in results) == [False] + [True] * 7
+    assert {result for result, _ in results} == {'result'}
+    # Released once done: the next call runs fn() again
+    assert flights.do('key', fn) == ('result', False)
+    assert len(calls) == 2
+
+
+def test_single_flight_raises_the_error_in_every_waiter():
+    flights = SingleFlight()
+    release = threading.Event()
+
+    def fn():
+        release.wait(5)
+        raise RuntimeError("upstream down")
+
+    with ThreadPoolExecutor(4) as pool:
+        futures = [pool.submit(flights.do, 'key', fn) for _ in range(4)]
+        wait_for_flight(flights, 'key')
+        release.set()
+        for future in futures:
+            with pytest.raises(RuntimeError, match="upstream down"):
+                future.result()
+    assert flights._calls == {}
+
+
+def test_concurrent_misses_fetch_once(backend):
+    fetch = BlockingFetch()
+    cache = NDVICache(backend, fetch_fn=fetch)
+    with ThreadPoolExecutor(10) as pool:
+        futures = [pool.submit(cache.get_ndvi, LAT, LON, '2020-06-01', '2020-07-01') for _ in range(10)]
+        wait_for_flight(cache._flights, (make_cache_key(LAT, LON), '2020-06-01', '2020-07-01'))
+        fetch.release.set()
+        results = [f.result() for f in futures]
+    assert len(fetch.calls) == 1
+    assert cache.misses == 1 and cache.coalesced == 9
+    assert all(len(r) == 30 for r in results)
+    results[0].loc[0, 'ndvi'] = -1.0  # Every caller gets its own copy
+    assert results[1].loc[0, 'ndvi'] != -1.0
+
+
+def test_concurrent_misses_share_the_fetch_error(backend):
+    fetch = BlockingFetch(error=RuntimeError("quota exceeded"))
+    cache = NDVICache(backend, fetch_fn=fetch)
+    with ThreadPoolExecutor(5) as pool:
+        futures = [pool.submit(cache.get_ndvi, LAT, LON, '2020-06-01', '2020-07-01') for _ in range(5)]
+        wait_for_flight(cache._flights, (make_cache_key(LAT, LON), '2020-06-01', '2020-07-01'))
+        fetch.release.set()
+        for future in futures:
+            with pytest.raises(RuntimeError, match="quota exceeded"):
+                future.result()
+    assert len(fetch.calls) == 1
+    assert len(cache.backend) == 0
+
+
+def test_concurrent_async_misses_fetch_once(backend):
+    fetch = BlockingFetch()
+    fetch.release.set()
+    cache = NDVICache(backend, fetch_fn=fetch)
+
+    async def burst():
+        return await asyncio.gather(*[cache.get_ndvi_async(LAT, LON, '2020-06-01', '2020-07-01')
+                                      for _ in range(20)])
+
+    results = asyncio.run(burst())
+    assert len(fetch.calls) == 1
+    assert cache.coalesced == 19
+    assert all(len(r) == 30 for r in results)
+    assert cache._async_flights == {}
+
+
+def test_async_error_reaches_every_waiter(backend):
+    fetch = BlockingFetch(error=RuntimeError("quota exceeded"))
+    fetch.release.set()
+    cache = NDVICache(backend, fetch_fn=fetch)
+
+    async def burst():
+        return await asyncio.gather(*[cache.get_ndvi_async(LAT, LON, '2020-06-01', '2020-07-01')
+                                      for _ in range(5)], return_exceptions=True)
+
+    results = asyncio.run(burst())
+    assert len(fetch.calls) == 1
+    assert all(isinstance(r, RuntimeError) for r in results)
@@ -0,0 +1,100 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.utils.risk_calculator import (
+    calculate_full_dyrs, score_to_risk_level, calculate_full_dyrs_array, scores_to_risk_levels,
+    calculate_portfolio_dyrs, DYRS_INPUT_COLUMNS
+)
+
+BREAKDOWN = ['Yield_Index_Points', 'Anomaly_Penalty', 'Volatility_Penalty', 'Final_DYRS']
+
+
+def portfolio():
+    """Random plots spanning every branch, plus the boundary rows below."""
+    rng = np.random.default_rng(42)
+    avg = rng.uniform(0.5, 60.0, 2000)
+    random_rows = pd.DataFrame({
+        'predicted_yield': avg * rng.uniform(0.6, 1.4, len(avg)),
+        'historical_avg_yield': avg,
+        'historical_yield_cv': rng.uniform(0.0, 0.8, len(avg)),
+        'ndvi_z_score': rng.normal(-0.5, 1.2, len(avg)),
+    })
+    boundary_rows = pd.DataFrame([
+        # predicted, avg, cv, z
+        (1.0, 0.0, 0.1, 0.0),      # Zero average, positive prediction: +inf deviation
+        (-1.0, 0.0, 0.1, 0.0),     # Zero average, negative prediction: -inf deviation
+        (0.0, 0.0, 0.1, 0.0),      # 0 / 0: NaN deviation
+        (12.0, 10.0, 0.1, 0.0),    # Exactly +20%
+        (8.0, 10.0, 0.1, 0.0),     # Exactly -20%
+        (12.0001, 10.0, 0.1, 0.0),  # Just past the clip
+        (7.9999, 10.0, 0.1, 0.0),
+        (10.0, 10.0, 0.1, np.nan),  # NaN z-score: no anomaly penalty
+        (10.0, 10.0, 0.1, -2.0),   # Anomaly band edges
+        (10.0, 10.0, 0.1, -1.0),
+        (10.0, 10.0, 0.1, -0.999),
+        (10.0, 10.0, 0.0, 0.0),    # Final score exactly 50
+        (13.0, 10.0, 0.0, 0.0),    # Clipped to 100
+        (5.0, 10.0, 0.8, -3.0),    # Clipped to 0
+        (10.5, 10.0, 0.0, 0.0),    # 50 + 15 = 65
+        (10.0, 10.0, 0.0, 0.0),
+    ], columns=DYRS_INPUT_COLUMNS)
+    return pd.concat([random_rows, boundary_rows], ignore_index=True)
+
+
+def scalar_results(df):
+    # np.float64 inputs, so a zero average divides as it does in the array version
+    # (with Python floats the scalar version raises ZeroDivisionError instead)
+    rows = []
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for predicted, avg, cv, z in df[DYRS_INPUT_COLUMNS].to_numpy():
+            result = calculate_full_dyrs(predicted, avg, cv, z)
+            result['Risk_Level'] = score_to_risk_level(result['Final_DYRS'])
+            rows.append(result)
+    return pd.DataFrame(rows)
+
+
+def test_array_matches_scalar_elementwise():
+    df = portfolio()
+    expected = scalar_results(df)
+    got = calculate_full_dyrs_array(*(df[col].to_numpy() for col in DYRS_INPUT_COLUMNS))
+    for col in BREAKDOWN:
+        np.testing.assert_array_equal(got[col], expected[col].to_numpy(), err_msg=col)
+    np.testing.assert_array_equal(scores_to_risk_levels(got['Final_DYRS']), expected['Risk_Level'].to_numpy())
+
+
+def test_portfolio_matches_scalar():
+    df = portfolio()
+    df.index = df.index + 100  # The result keeps the portfolio's index
+    expected = scalar_results(df)
+    got = calculate_portfolio_dyrs(df)
+    assert got.index.equals(df.index)
+    for col in BREAKDOWN + ['Risk_Level']:
+        np.testing.assert_array_equal(got[col].to_numpy(), expected[col].to_numpy(), err_msg=col)
+
+
+def test_zero_average_with_python_floats_raises_in_the_scalar_version():
+    with pytest.raises(ZeroDivisionError):
+        calculate_full_dyrs(1.0, 0.0, 0.1, 0.0)
+
+
+def test_boundaries():
+    got = calculate_full_dyrs_array([1.0, 12.0, 8.0, 10.0, 10.0, 10.0],
+                                    [0.0, 10.0, 10.0, 10.0, 10.0, 10.0],
+                                    0.0,
+                                    [0.0, 0.0, 0.0, np.nan, -2.0, -1.0])
+    assert got['Yield_Index_Points'][:3].tolist() == pytest.approx([60.0, 60.0, -60.0])
+    assert got['Anomaly_Penalty'].tolist() == [0.0, 0.0, 0.0, 0.0, 30.0, 15.0]
+
+
+@pytest.mark.parametrize('score, level', [(100, 'LOW RISK'), (75, 'LOW RISK'), (74.999, 'MODERATE RISK'),
+                                          (50, 'MODERATE RISK'), (49.999, 'HIGH RISK'), (0, 'HIGH RISK'),
+                                          (np.nan, 'HIGH RISK')])
+def test_risk_levels(score, level):
+    assert score_to_risk_level(score) == level
+    assert scores_to_risk_levels([score]).tolist() == [level]
+
+
+def test_missing_columns():
+    with pytest.raises(KeyError, match='ndvi_z_score'):
+        calculate_portfolio_dyrs(portfolio().drop(columns='ndvi_z_score'))